@@ -0,0 +1,33 @@
+# common_libs/auth/internal.py
+# Shared-secret auth for service-to-service endpoints.
+#
+# Every service gets the same INTERNAL_SERVICE_TOKEN; callers send it in the
+# X-Internal-Token header (internal_headers()), or as "Authorization: Bearer
+# <token>" for tools that can only set that header (e.g. a Prometheus scrape
+# config). Endpoints depend on require_internal_token. Without a configured
+# token every call is rejected: internal endpoints fail closed.
+import hmac
+import os
+
+from fastapi import HTTPException, Request, status
+
+INTERNAL_SERVICE_TOKEN = os.getenv("INTERNAL_SERVICE_TOKEN", "")
+INTERNAL_TOKEN_HEADER = "X-Internal-Token"
+
+
+def internal_headers() -> dict:
+    return {INTERNAL_TOKEN_HEADER: INTERNAL_SERVICE_TOKEN} if INTERNAL_SERVICE_TOKEN else {}
+
+
+def _presented_token(request: Request) -> str:
+    token = request.headers.get(INTERNAL_TOKEN_HEADER)
+    if token:
+        return token
+    scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+    return credentials if scheme.lower() == "bearer" else ""
+
+
+async def require_internal_token(request: Request):
+    token = _presented_token(request)
+    if not INTERNAL_SERVICE_TOKEN or not token or not hmac.compare_digest(token, INTERNAL_SERVICE_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Internal endpoint")
@@ -0,0 +1,109 @@
+# common_libs/db/pool.py
+# Connection pool settings and instrumentation shared by the services' session.py
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+# Counters describing how a connection pool is being used
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0          # connections handed out
+        self.checkins = 0           # connections returned
+        self.connects = 0           # new physical DB connections opened
+        self.overflow_events = 0    # checkouts that had to open an overflow connection
+        self.timeouts = 0           # checkouts that gave up after pool_timeout
+        self.total_wait = 0.0       # seconds spent waiting for a connection
+        self.max_wait = 0.0         # longest single wait, in seconds
+
+    def record_checkout(self, wait: float, overflowed: bool):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            if overflowed:
+                self.overflow_events += 1
+
+    def record_timeout(self, wait: float):
+        with self._lock:
+            self.timeouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def record_checkin(self):
+        with self._lock:
+            self.checkins += 1
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def snapshot(self, pool=None) -> dict:
+        # Counters plus, when a pool is given, its live state
+        with self._lock:
+            data = {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "overflow_events": self.overflow_events,
+                "timeouts": self.timeouts,
+                "total_wait_ms": round(self.total_wait * 1000, 3),
+                "avg_wait_ms": round(self.total_wait * 1000 / max(self.checkouts + self.timeouts, 1), 3),
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+        if isinstance(pool, QueuePool):
+            data.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+            })
+        return data
+
+
+class _InstrumentedPoolMixin:
+    # Set on the per-engine subclass built by `instrumented_pool_class`
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        overflow_before = self.overflow()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_timeout(time.perf_counter() - start)
+            raise
+        # overflow() counts up from -pool_size; it only goes positive once
+        # connections beyond pool_size are opened
+        overflowed = self.overflow() > max(overflow_before, 0)
+        self.metrics.record_checkout(time.perf_counter() - start, overflowed)
+        return conn
+
+    def _do_return_conn(self, record):
+        self.metrics.record_checkin()
+        return super()._do_return_conn(record)
+
+    def _create_connection(self):
+        self.metrics.record_connect()
+        return super()._create_connection()
+
+
+def instrumented_pool_class(metrics: PoolMetrics, base=QueuePool):
+    # Build a pool class that reports into `metrics`.
+    # The metrics live on the class (not the instance) so they survive
+    # `pool.recreate()`, which SQLAlchemy calls on engine.dispose().
+    return type(f"Instrumented{base.__name__}", (_InstrumentedPoolMixin, base), {"metrics": metrics})
+
+
+def pool_options(settings) -> dict:
+    # create_engine() keyword arguments from a service's Settings
+    return {
+        "pool_size": int(settings.DB_POOL_SIZE),
+        "max_overflow": int(settings.DB_MAX_OVERFLOW),
+        "pool_timeout": float(settings.DB_POOL_TIMEOUT),
+        "pool_recycle": int(settings.DB_POOL_RECYCLE),
+        "pool_pre_ping": bool(settings.DB_POOL_PRE_PING),
+    }
@@ -1,17 +1,44 @@
 # common_libs/disbursement.py
-import requests
 import os
+from common_libs import http_client
+from common_libs.auth.internal import internal_headers
 
-DISBURSEMENT_URL = os.getenv("DISBURSEMENT_SERVICE_URL", "http://disbursement-service:8000")
+# disbursement_service listens on 8002 (see its Dockerfile) and mounts its
+# routes under /api/v1/disbursements
+DISBURSEMENT_URL = os.getenv("DISBURSEMENT_SERVICE_URL", "http://disbursement-service:8002")
+DISBURSE_PATH = "/api/v1/disbursements/"
 
-def disburse_funds(user_id: int, loan_id: int, amount: float):
+def disburse_funds(user_id: int, loan_id: int, amount: float, idempotency_key: str = None):
     payload = {
         "user_id": user_id,
         "loan_id": loan_id,
         "amount": amount
     }
+    # Lets the disbursement service drop duplicates when a call is retried;
+    # the endpoint is internal, so the service token goes along
+    headers = internal_headers()
+    if idempotency_key:
+        headers["Idempotency-Key"] = idempotency_key
     try:
-        response = requests.post(f"{DISBURSEMENT_URL}/disburse/", json=payload)
+        response = http_client.post(f"{DISBURSEMENT_URL}{DISBURSE_PATH}", json=payload, headers=headers)
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        raise RuntimeError(f"Disbursement failed: {str(e)}")
+
+async def disburse_funds_async(user_id: int, loan_id: int, amount: float, idempotency_key: str = None):
+    payload = {
+        "user_id": user_id,
+        "loan_id": loan_id,
+        "amount": amount
+    }
+    # Lets the disbursement service drop duplicates when a call is retried;
+    # the endpoint is internal, so the service token goes along
+    headers = internal_headers()
+    if idempotency_key:
+        headers["Idempotency-Key"] = idempotency_key
+    try:
+        response = await http_client.apost(f"{DISBURSEMENT_URL}{DISBURSE_PATH}", json=payload, headers=headers)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -0,0 +1,174 @@
+# common_libs/http_client.py
+# Shared HTTP clients for inter-service calls.
+#
+# - keep-alive connection pooling: one pool per target host, each capped at
+#   HTTP_MAX_CONNECTIONS_PER_HOST, so a slow downstream can only tie up its
+#   own connections, never the ones used to reach the other services
+# - default connect/read timeouts on every request
+# - retries with exponential backoff on connection errors and 5xx/429
+#   (non-idempotent methods such as POST are only retried when the request
+#   never reached the server)
+# - a sync client (requests) and an async client (httpx) with the same policy
+# - every call (retries included) is timed into http_client_request_duration_seconds,
+#   labelled with the target host (user-service, disbursement-service, ...)
+import asyncio
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from common_libs.metrics.registry import registry
+
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "2"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "5"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.2"))
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+MAX_HOSTS = int(os.getenv("HTTP_MAX_HOSTS", "10"))  # host pools kept by the sync session (LRU)
+
+RETRY_STATUSES = (429, 502, 503, 504)
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+_session = None
+_session_lock = threading.Lock()
+_async_clients = {}  # (scheme, host, port) -> httpx.AsyncClient
+
+CALL_SECONDS = registry.histogram(
+    "http_client_request_duration_seconds", "Outbound HTTP call time, retries included", ["host", "method", "status"]
+)
+
+
+def _record(method: str, url: str, started: float, status):
+    CALL_SECONDS.observe(time.perf_counter() - started, host=urlsplit(url).hostname or "", method=method, status=status)
+
+
+# ----------------------------------------
+# Sync client (requests)
+# ----------------------------------------
+def _build_session() -> requests.Session:
+    retry = Retry(
+        total=MAX_RETRIES,
+        connect=MAX_RETRIES,
+        read=MAX_RETRIES,
+        status=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=IDEMPOTENT_METHODS,  # read/status retries only for these
+        raise_on_status=False,
+    )
+    # urllib3 keeps one pool per host (up to MAX_HOSTS of them), each with at
+    # most MAX_CONNECTIONS_PER_HOST connections
+    adapter = HTTPAdapter(
+        pool_connections=MAX_HOSTS,
+        pool_maxsize=MAX_CONNECTIONS_PER_HOST,
+        pool_block=True,  # wait for a free connection instead of opening unbounded extras
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    # Process-wide pooled session, created on first use
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    started, status = time.perf_counter(), "error"
+    try:
+        response = get_session().request(method, url, **kwargs)
+        status = str(response.status_code)
+        return response
+    finally:
+        _record(method.upper(), url, started, status)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+# ----------------------------------------
+# Async client (httpx)
+# ----------------------------------------
+def _origin(url: str) -> tuple:
+    parts = urlsplit(url)
+    return parts.scheme, parts.hostname or "", parts.port
+
+
+def get_async_client(url: str) -> httpx.AsyncClient:
+    # One pooled client per target host (httpx limits apply per client, not per
+    # host), created on first use inside the running event loop
+    origin = _origin(url)
+    client = _async_clients.get(origin)
+    if client is None or client.is_closed:
+        client = _async_clients[origin] = httpx.AsyncClient(
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS_PER_HOST,
+                max_keepalive_connections=MAX_CONNECTIONS_PER_HOST,
+            ),
+        )
+    return client
+
+
+async def arequest(method: str, url: str, **kwargs) -> httpx.Response:
+    method = method.upper()
+    started, status = time.perf_counter(), "error"
+    try:
+        response = await _arequest(method, url, **kwargs)
+        status = str(response.status_code)
+        return response
+    finally:
+        _record(method, url, started, status)
+
+
+async def _arequest(method: str, url: str, **kwargs) -> httpx.Response:
+    client = get_async_client(url)
+    for attempt in range(MAX_RETRIES + 1):
+        last_attempt = attempt == MAX_RETRIES
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.ConnectError:
+            # The request never reached the server, safe to retry any method
+            if last_attempt:
+                raise
+        except httpx.TransportError:
+            if last_attempt or method not in IDEMPOTENT_METHODS:
+                raise
+        else:
+            if last_attempt or response.status_code not in RETRY_STATUSES or method not in IDEMPOTENT_METHODS:
+                return response
+        await asyncio.sleep(BACKOFF_FACTOR * (2 ** attempt))
+
+
+async def aget(url: str, **kwargs) -> httpx.Response:
+    return await arequest("GET", url, **kwargs)
+
+
+async def apost(url: str, **kwargs) -> httpx.Response:
+    return await arequest("POST", url, **kwargs)
+
+
+async def aclose():
+    # Close the async clients' connections (call on application shutdown)
+    clients = list(_async_clients.values())
+    _async_clients.clear()
+    for client in clients:
+        await client.aclose()
@@ -0,0 +1,62 @@
+# common_libs/metrics/sql.py
+# Query count and time, through SQLAlchemy cursor events.
+#
+# Every statement is timed into db_query_duration_seconds. While a request is
+# being tracked (see middleware.py) the statements are also added to that
+# request's RequestStats, which is shared through a contextvar: the threadpool
+# (run_in_threadpool) and AsyncSession.run_sync both run in a copy of the
+# request's context, so they update the same object.
+import contextvars
+import time
+
+from sqlalchemy import event
+
+from common_libs.metrics.registry import registry
+
+DB_QUERY_SECONDS = registry.histogram(
+    "db_query_duration_seconds", "Time spent executing SQL statements", ["engine"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+
+class RequestStats:
+    __slots__ = ("queries", "query_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+current_request_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def instrument_engine(engine, name: str = "primary"):
+    # Pass `async_engine.sync_engine` for an async engine
+    if getattr(engine, "_metrics_instrumented", False):
+        return
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_started")
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        DB_QUERY_SECONDS.observe(elapsed, engine=name)
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_seconds += elapsed
+
+    def handle_error(context):
+        # A failed statement never reaches after_cursor_execute
+        connection = context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+    engine._metrics_instrumented = True
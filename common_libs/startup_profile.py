@@ -0,0 +1,126 @@
+# common_libs/startup_profile.py
+# Startup-time instrumentation, enabled with STARTUP_PROFILE=true.
+#
+# Import this module first in a service's main.py. When enabled it:
+# - times every module imported afterwards (self and cumulative time, like
+#   `python -X importtime` but available from inside the app)
+# - times named phases such as DB schema work: `with profiler.phase("..."):`
+# - prints a report once the app has started (`profiler.report()`)
+# When disabled, `phase` is a no-op and nothing is hooked.
+import importlib.abc
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+ENABLED = os.getenv("STARTUP_PROFILE", "false").lower() == "true"
+TOP_MODULES = int(os.getenv("STARTUP_PROFILE_TOP", "25"))
+
+
+class _TimedLoader(importlib.abc.Loader):
+    # Wraps a module's real loader and times its execution
+    def __init__(self, loader, profiler, name):
+        self._loader = loader
+        self._profiler = profiler
+        self._name = name
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        with self._profiler._timed_import(self._name):
+            self._loader.exec_module(module)
+
+    def __getattr__(self, attr):
+        # get_data, is_package, get_resource_reader, ... go to the real loader
+        return getattr(self._loader, attr)
+
+
+class _TimingFinder(importlib.abc.MetaPathFinder):
+    def __init__(self, profiler):
+        self._profiler = profiler
+        self._local = threading.local()
+
+    def find_spec(self, name, path, target=None):
+        if getattr(self._local, "busy", False):
+            return None
+        self._local.busy = True
+        try:
+            # Let the regular finders locate the module, then wrap its loader
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(name, path, target)
+                if spec is not None:
+                    if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                        spec.loader = _TimedLoader(spec.loader, self._profiler, name)
+                    return spec
+            return None
+        finally:
+            self._local.busy = False
+
+
+class StartupProfiler:
+    def __init__(self, enabled: bool = ENABLED):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.imports = {}  # module -> (self seconds, cumulative seconds)
+        self.phases = []   # (name, seconds)
+        self._stack = []   # [start, time spent in nested imports]
+        self._finder = None
+        if enabled:
+            self._finder = _TimingFinder(self)
+            sys.meta_path.insert(0, self._finder)
+
+    @contextmanager
+    def _timed_import(self, name):
+        self._stack.append([time.perf_counter(), 0.0])
+        try:
+            yield
+        finally:
+            start, nested = self._stack.pop()
+            total = time.perf_counter() - start
+            self.imports[name] = (total - nested, total)
+            if self._stack:
+                self._stack[-1][1] += total
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def summary(self) -> dict:
+        top = sorted(self.imports.items(), key=lambda item: item[1][0], reverse=True)[:TOP_MODULES]
+        return {
+            "since_profiler_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "imports_ms": round(sum(s for s, _ in self.imports.values()) * 1000, 1),
+            "modules_imported": len(self.imports),
+            "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in self.phases},
+            "top_imports_ms": {
+                name: {"self": round(s * 1000, 1), "cumulative": round(c * 1000, 1)} for name, (s, c) in top
+            },
+        }
+
+    def report(self):
+        # Print the report and stop timing imports
+        if not self.enabled:
+            return
+        if self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+        summary = self.summary()
+        print(f"⏱ Startup profile: {summary['since_profiler_ms']} ms since profiler import, "
+              f"{summary['imports_ms']} ms in {summary['modules_imported']} module imports")
+        for name, ms in summary["phases_ms"].items():
+            print(f"   phase  {ms:9.1f} ms  {name}")
+        for name, times in summary["top_imports_ms"].items():
+            print(f"   import {times['self']:9.1f} ms  (cumulative {times['cumulative']:9.1f} ms)  {name}")
+
+
+profiler = StartupProfiler()
@@ -1,13 +1,220 @@
-import requests
+import asyncio
+import contextvars
 import os
+from contextlib import contextmanager
+from typing import Dict, Iterable, List
+
+from common_libs import http_client
+from common_libs.auth.internal import internal_headers
+from common_libs.cache import cache_from_env
 
 USER_SERVICE_URL = os.getenv("USER_SERVICE_URL", "http://user-service:8000")
 
+# Cache of user_id -> email, in front of user_service
+# - found users are cached for USER_CACHE_TTL seconds
+# - 404s are cached (negative caching) for the shorter USER_CACHE_NEGATIVE_TTL
+# - USER_CACHE_BACKEND=redis shares the cache between pods/services, which
+#   also lets user_service invalidate entries when a user changes
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+USER_CACHE_NEGATIVE_TTL = float(os.getenv("USER_CACHE_NEGATIVE_TTL", "30"))
+# Batched lookups (POST /api/v1/users/batch) send at most this many IDs per
+# request; user_service accepts up to 1000
+USER_BATCH_SIZE = int(os.getenv("USER_BATCH_SIZE", "500"))
+_NOT_FOUND = "\0not-found"  # cached marker for users that don't exist
+
+user_cache = cache_from_env("USER")
+
+class UserNotFound(LookupError):
+    # The user doesn't exist (404): retrying the lookup won't help
+    def __init__(self, user_id: int):
+        super().__init__(f"User {user_id} not found")
+        self.user_id = user_id
+
+def _cache_key(user_id: int) -> str:
+    return f"user_email:{user_id}"
+
+def _cached_email(user_id: int):
+    # Returns (hit, email); a cached 404 raises UserNotFound
+    value = user_cache.get(_cache_key(user_id))
+    if value is None:
+        return False, None
+    if value == _NOT_FOUND:
+        raise UserNotFound(user_id)
+    return True, value
+
+def _store_response(user_id: int, status_code: int, email: str = None):
+    if status_code == 404:
+        user_cache.set(_cache_key(user_id), _NOT_FOUND, USER_CACHE_NEGATIVE_TTL)
+    elif email:
+        user_cache.set(_cache_key(user_id), email, USER_CACHE_TTL)
+
+def _store_batch(user_ids: List[int], users: list):
+    # Users missing from a batch response don't exist: cache them as 404s
+    found = {user["id"]: user["email"] for user in users}
+    for user_id in user_ids:
+        _store_response(user_id, 200 if user_id in found else 404, found.get(user_id))
+    return found
+
+def _split_cached(user_ids: Iterable[int]):
+    # Returns ({user_id: email} for cache hits, [user_ids to fetch]); users
+    # cached as not found are in neither
+    emails, missing = {}, []
+    for user_id in dict.fromkeys(user_ids):
+        try:
+            hit, email = _cached_email(user_id)
+        except UserNotFound:
+            continue
+        if hit:
+            emails[user_id] = email
+        else:
+            missing.append(user_id)
+    return emails, missing
+
+def _chunks(user_ids: List[int]):
+    for i in range(0, len(user_ids), USER_BATCH_SIZE):
+        yield user_ids[i:i + USER_BATCH_SIZE]
+
+def invalidate_user(user_id: int):
+    # Drop a cached lookup, e.g. after the user's email changed or the user was deleted
+    user_cache.delete(_cache_key(user_id))
+
+def _email_from_response(user_id: int, resp) -> str:
+    # 404 -> UserNotFound (cached); transport errors and 5xx propagate (not
+    # cached), so callers such as the outbox worker retry them later
+    if resp.status_code == 404:
+        _store_response(user_id, 404)
+        raise UserNotFound(user_id)
+    resp.raise_for_status()
+    email = resp.json()["email"]
+    _store_response(user_id, resp.status_code, email)
+    return email
+
 def get_user_email(user_id: int) -> str:
-    try:
-        resp = requests.get(f"{USER_SERVICE_URL}/api/v1/users/{user_id}")
+    hit, email = _cached_email(user_id)
+    if hit:
+        return email
+    return _email_from_response(user_id, http_client.get(f"{USER_SERVICE_URL}/api/v1/users/{user_id}"))
+
+async def get_user_email_async(user_id: int) -> str:
+    hit, email = _cached_email(user_id)
+    if hit:
+        return email
+    loader = _current_loader.get()
+    if loader is not None:
+        return await loader.load(user_id)
+    return _email_from_response(user_id, await http_client.aget(f"{USER_SERVICE_URL}/api/v1/users/{user_id}"))
+
+# ----------------------------------------
+# Batched lookups: one round trip per USER_BATCH_SIZE IDs instead of one per user
+# ----------------------------------------
+def get_user_emails(user_ids: Iterable[int]) -> Dict[int, str]:
+    # {user_id: email} for the users that exist; unknown users (left out of
+    # the batch response) are left out here too. Transport errors and non-2xx
+    # responses raise, and nothing is cached for them.
+    emails, missing = _split_cached(user_ids)
+    for chunk in _chunks(missing):
+        resp = http_client.post(f"{USER_SERVICE_URL}/api/v1/users/batch", json={"ids": chunk}, headers=internal_headers())
         resp.raise_for_status()
-        return resp.json()["email"]
-    except Exception as e:
-        print(f"Failed to fetch user email: {e}")
-        return "unknown@example.com"
+        emails.update(_store_batch(chunk, resp.json()))
+    return emails
+
+async def get_user_emails_async(user_ids: Iterable[int]) -> Dict[int, str]:
+    emails, missing = _split_cached(user_ids)
+
+    async def fetch(chunk):
+        resp = await http_client.apost(
+            f"{USER_SERVICE_URL}/api/v1/users/batch", json={"ids": chunk}, headers=internal_headers()
+        )
+        resp.raise_for_status()
+        return _store_batch(chunk, resp.json())
+
+    for found in await asyncio.gather(*(fetch(chunk) for chunk in _chunks(missing))):
+        emails.update(found)
+    return emails
+
+
+# ----------------------------------------
+# Dataloader: coalesces concurrent single lookups into batched ones
+# ----------------------------------------
+# Every `load(user_id)` made in the same event-loop tick (e.g. by handlers
+# started together with asyncio.gather) is collected and sent as one batch
+# lookup. Results are kept for the loader's lifetime, so scope a loader to one
+# request or one worker batch:
+#
+#     with user_loader_scope():
+#         await asyncio.gather(*(notify(m) for m in messages))
+#
+# Inside a scope, get_user_email_async goes through the loader automatically.
+# A user missing from the batch response raises UserNotFound in its caller;
+# a failed batch (user_service down, 5xx) raises the error in every caller
+# of that batch, and the next load() of those IDs tries again.
+class UserEmailLoader:
+    def __init__(self):
+        self._futures = {}   # user_id -> future with the email
+        self._queue = []     # user_ids waiting for the next dispatch
+        self._scheduled = False
+        self.batches = 0     # batch lookups sent (for tests and logging)
+
+    async def load(self, user_id: int) -> str:
+        future = self._futures.get(user_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._futures[user_id] = loop.create_future()
+            self._queue.append(user_id)
+            if not self._scheduled:
+                # Dispatch after the other tasks ready in this tick had a chance to queue their IDs
+                self._scheduled = True
+                loop.call_soon(self._dispatch)
+        # shield: one cancelled caller must not cancel the lookup the others wait on
+        return await asyncio.shield(future)
+
+    async def load_many(self, user_ids: Iterable[int]) -> Dict[int, str]:
+        # Like get_user_emails: unknown users are left out, other errors raise
+        user_ids = list(dict.fromkeys(user_ids))
+        results = await asyncio.gather(*(self.load(user_id) for user_id in user_ids), return_exceptions=True)
+        emails = {}
+        for user_id, result in zip(user_ids, results):
+            if isinstance(result, UserNotFound):
+                continue
+            if isinstance(result, BaseException):
+                raise result
+            emails[user_id] = result
+        return emails
+
+    def _dispatch(self):
+        user_ids, self._queue, self._scheduled = self._queue, [], False
+        self.batches += 1
+        asyncio.ensure_future(self._fetch(user_ids))
+
+    async def _fetch(self, user_ids: List[int]):
+        try:
+            emails = await get_user_emails_async(user_ids)
+        except Exception as e:
+            print(f"Failed to fetch user emails: {e}")
+            for user_id in user_ids:
+                # Forget the failed lookup so a later load() retries it
+                future = self._futures.pop(user_id)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for user_id in user_ids:
+            future = self._futures[user_id]
+            if future.done():
+                continue
+            if user_id in emails:
+                future.set_result(emails[user_id])
+            else:
+                future.set_exception(UserNotFound(user_id))
+
+
+_current_loader = contextvars.ContextVar("user_email_loader", default=None)
+
+@contextmanager
+def user_loader_scope():
+    # Tasks created inside the block inherit the loader (contextvars)
+    loader = UserEmailLoader()
+    token = _current_loader.set(loader)
+    try:
+        yield loader
+    finally:
+        _current_loader.reset(token)
@@ -1,11 +1,31 @@
-import boto3
 from fastapi import UploadFile
 import uuid
 from app.core.config import settings
 
-s3 = boto3.client("s3", region_name=settings.AWS_REGION)
+# Same streaming multipart pipeline as common_libs/s3.py, for async callers
+from common_libs.s3 import iter_upload_file, upload_stream
+
+# boto3 client, created on first upload rather than at import
+_s3 = None
+
+def get_s3():
+    global _s3
+    if _s3 is None:
+        import boto3
+
+        _s3 = boto3.client("s3", region_name=settings.AWS_REGION)
+    return _s3
 
 def upload_file_to_s3(file: UploadFile):
     file_key = f"documents/{uuid.uuid4()}_{file.filename}"
-    s3.upload_fileobj(file.file, settings.S3_BUCKET_NAME, file_key)
+    get_s3().upload_fileobj(file.file, settings.S3_BUCKET_NAME, file_key)
+    return f"https://{settings.S3_BUCKET_NAME}.s3.amazonaws.com/{file_key}"
+
+# Async variant: streamed in parallel parts, same bucket, region and key layout
+async def upload_file_to_s3_async(file: UploadFile):
+    file_key = f"documents/{uuid.uuid4()}_{file.filename}"
+    await upload_stream(
+        iter_upload_file(file), file_key, file.content_type,
+        bucket=settings.S3_BUCKET_NAME, region_name=settings.AWS_REGION,
+    )
     return f"https://{settings.S3_BUCKET_NAME}.s3.amazonaws.com/{file_key}"
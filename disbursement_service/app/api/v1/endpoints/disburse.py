@@ -1,39 +1,80 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+from fastapi import APIRouter, Depends, Header, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.db.session import get_db
-from app.db.models.disbursement import Disbursement
-from app.schemas.disbursement import DisbursementCreate, DisbursementOut
-from datetime import datetime
-import uuid
-from typing import List
+from app.db.session import get_db, get_read_db, run_db, db_session, replicas
+from app.schemas.disbursement import DisbursementCreate, DisbursementOut, DisbursementBatch
+from app.services import disbursement_service
+from common_libs.auth.internal import require_internal_token
+from typing import List, Optional
 
 router = APIRouter()
 
-@router.post("/", response_model=DisbursementOut)
-def create_disbursement(data: DisbursementCreate, db: Session = Depends(get_db)):
-    disbursement = Disbursement(
-        loan_id=data.loan_id,
-        user_id=data.user_id,
-        amount=data.amount,
-        status="completed",
-        reference=str(uuid.uuid4()),
-        completed_at=datetime.utcnow()
-    )
-    db.add(disbursement)
-    db.commit()
-    db.refresh(disbursement)
-    return disbursement
+# Records written per INSERT/commit in a batch request
+BATCH_CHUNK_SIZE = 1000
 
-router = APIRouter()
+# Creating disbursements moves money: both POSTs are internal only and need the
+# shared service token (X-Internal-Token), which common_libs/disbursement.py sends
+
+# `Idempotency-Key` makes retries safe: the same key returns the existing disbursement
+@router.post("/", response_model=DisbursementOut, dependencies=[Depends(require_internal_token)])
+async def disburse_funds(
+    disb: DisbursementCreate,
+    idempotency_key: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    return await run_db(db, disbursement_service.create_disbursement, disb, idempotency_key)
+
+# Ingest many disbursements in one request (e.g. catch-up after an outage).
+# Records are inserted in chunks; each chunk is one INSERT and one commit.
+# The response is streamed as newline-delimited JSON, one line per record:
+#   {"index": 0, "loan_id": 1, "reference": "...", "outcome": "created" | "duplicate", "id": 7}
+# Records whose reference (default "disburse:<loan_id>") already exists, in the
+# database or earlier in the same batch, are reported as duplicates, so an
+# interrupted batch can simply be sent again.
+@router.post("/batch", dependencies=[Depends(require_internal_token)])
+async def disburse_batch(batch: DisbursementBatch, request: Request):
+    replicas.note_request(request)  # writes through db_session(), not get_db
+    return StreamingResponse(_ingest_batch(batch.items), media_type="application/x-ndjson")
+
+async def _ingest_batch(items):
+    seen = {}  # reference -> id, for references handled in earlier chunks
+    async with db_session() as db:
+        for start in range(0, len(items), BATCH_CHUNK_SIZE):
+            chunk = items[start:start + BATCH_CHUNK_SIZE]
+            references = [item.reference or disbursement_service.default_reference(item.loan_id) for item in chunk]
+
+            rows = {}
+            for item, reference in zip(chunk, references):
+                if reference not in seen and reference not in rows:
+                    rows[reference] = {
+                        "loan_id": item.loan_id,
+                        "user_id": item.user_id,
+                        "amount": item.amount,
+                        "reference": reference,
+                    }
+            created, existing = {}, {}
+            if rows:
+                created, existing = await run_db(db, disbursement_service.create_disbursements, list(rows.values()))
 
-@router.post("/", response_model=DisbursementOut)
-def disburse_funds(disb: DisbursementCreate, db: Session = Depends(get_db)):
-    new_disbursement = Disbursement(**disb.dict())
-    db.add(new_disbursement)
-    db.commit()
-    db.refresh(new_disbursement)
-    return new_disbursement
+            lines = []
+            for index, (item, reference) in enumerate(zip(chunk, references), start=start):
+                if reference in created:
+                    id_ = seen[reference] = created.pop(reference)
+                    outcome = "created"
+                else:
+                    id_ = seen.get(reference) or existing.get(reference)
+                    outcome = "duplicate"
+                lines.append(json.dumps({
+                    "index": index,
+                    "loan_id": item.loan_id,
+                    "reference": reference,
+                    "outcome": outcome,
+                    "id": id_,
+                }) + "\n")
+            seen.update(existing)
+            yield "".join(lines)
 
 @router.get("/loan/{loan_id}", response_model=List[DisbursementOut])
-def get_disbursements_by_loan(loan_id: int, db: Session = Depends(get_db)):
-    return db.query(Disbursement).filter(Disbursement.loan_id == loan_id).all()
+async def get_disbursements_by_loan(loan_id: int, db: Session = Depends(get_read_db)):
+    return await run_db(db, disbursement_service.get_disbursements_by_loan, loan_id)
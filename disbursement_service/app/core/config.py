@@ -0,0 +1,34 @@
+# Load environment variables into a typed settings object
+from pydantic_settings import BaseSettings
+from typing import Optional
+
+# Configuration for the disbursement service, read from the environment / .env
+class Settings(BaseSettings):
+    # Database connection settings
+    DB_HOST: Optional[str] = None
+    DB_PORT: int = 5432
+    DB_USER: Optional[str] = None
+    DB_PASSWORD: Optional[str] = None
+    DB_NAME: Optional[str] = None
+    DATABASE_URL: Optional[str] = None  # Full connection URL, overrides the DB_* values
+    DB_ASYNC: bool = False              # Use the asyncio database stack (asyncpg)
+    DB_CREATE_TABLES: bool = True       # Run create_all on startup
+
+    # Connection pool tuning (applies to the sync and async engines)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # Read replicas (see common_libs/db/replicas.py)
+    DB_REPLICA_URLS: str = ""                  # Comma-separated replica URLs; empty = primary only
+    DB_REPLICA_MAX_LAG: float = 5.0            # Max replication lag (seconds) for a replica to get reads
+    DB_REPLICA_CHECK_INTERVAL: float = 5.0     # Seconds between replica health checks
+    DB_READ_YOUR_WRITES_SECONDS: float = 10.0  # After a write, the client reads from the primary this long
+
+    class Config:
+        extra = "allow"
+        env_file = ".env"
+
+settings = Settings()
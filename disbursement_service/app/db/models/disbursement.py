@@ -2,7 +2,6 @@ from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.session import Base
-from app.db.base_class import Base
 
 class Disbursement(Base):
     __tablename__ = "disbursements"
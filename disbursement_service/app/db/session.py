@@ -1,22 +1,123 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-import os
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from app.core.config import settings
+from common_libs.db.pool import PoolMetrics, instrumented_pool_class, pool_options
+from common_libs.db.replicas import ReplicaSet
 
-DATABASE_URL = (
-    f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
-    f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+DATABASE_URL = settings.DATABASE_URL or (
+    f"postgresql://{settings.DB_USER}:{settings.DB_PASSWORD}"
+    f"@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
 )
 
-engine = create_engine(DATABASE_URL)
+# Pool tuning from the DB_POOL_* settings, instrumented for /internal/pool
+pool_metrics = PoolMetrics()
+engine = create_engine(
+    DATABASE_URL,
+    poolclass=instrumented_pool_class(pool_metrics),
+    **pool_options(settings),
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Swap the sync driver for its asyncio counterpart
+# (postgresql -> postgresql+asyncpg, sqlite -> sqlite+aiosqlite)
+def to_async_url(url: str):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    driver = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}.get(backend)
+    return url.set(drivername=f"{backend}+{driver}") if driver else url
+
+# Async engine/session factory, only created when DB_ASYNC is enabled
+async_pool_metrics = PoolMetrics()
+async_engine = create_async_engine(
+    to_async_url(DATABASE_URL),
+    poolclass=instrumented_pool_class(async_pool_metrics, AsyncAdaptedQueuePool),
+    **pool_options(settings),
+) if settings.DB_ASYNC else None
+AsyncSessionLocal = (
+    async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+    if settings.DB_ASYNC else None
+)
+
+# Read replicas from DB_REPLICA_URLS (none by default); health checks start with the app
+replicas = ReplicaSet(
+    settings.DB_REPLICA_URLS,
+    engine_options=pool_options(settings),
+    async_url=to_async_url if settings.DB_ASYNC else None,
+    max_lag=settings.DB_REPLICA_MAX_LAG,
+    check_interval=settings.DB_REPLICA_CHECK_INTERVAL,
+    read_your_writes=settings.DB_READ_YOUR_WRITES_SECONDS,
+)
+
+# Current pool metrics for the /internal/pool endpoint
+def pool_status() -> dict:
+    status = {"sync": pool_metrics.snapshot(engine.pool)}
+    if async_engine is not None:
+        status["async"] = async_pool_metrics.snapshot(async_engine.sync_engine.pool)
+    if replicas.replicas:
+        status["replicas"] = replicas.status()
+    return status
+
 # ✅ Add this function (used as dependency in FastAPI)
-def get_db():
+# Always the primary; write requests also send the client's next reads there
+def get_sync_db(request: Request):
+    replicas.note_request(request)
     db: Session = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db(request: Request):
+    replicas.note_request(request)
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Dependency used by the routers, selected by the DB_ASYNC setting
+get_db = get_async_db if settings.DB_ASYNC else get_sync_db
+
+# Read-only variants: a healthy replica, or the primary when there is none or
+# the client needs its own recent writes
+def get_sync_read_db(request: Request):
+    replica = replicas.pick(request)
+    db: Session = (replica.SessionLocal if replica else SessionLocal)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db(request: Request):
+    replica = replicas.pick(request)
+    async with (replica.AsyncSessionLocal if replica else AsyncSessionLocal)() as db:
+        yield db
+
+get_read_db = get_async_read_db if settings.DB_ASYNC else get_sync_read_db
+
+# Run `fn(session, *args, **kwargs)` on the async connection (AsyncSession)
+# or in the threadpool (Session), so handlers never block the event loop
+async def run_db(db, fn, *args, **kwargs):
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+# Session for work that outlives the request's dependencies, e.g. a
+# StreamingResponse that keeps writing while the body is being sent
+@asynccontextmanager
+async def db_session():
+    if settings.DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
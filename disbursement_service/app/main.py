@@ -1,13 +1,43 @@
-from fastapi import FastAPI
+from common_libs.startup_profile import profiler  # first import: times the imports below (STARTUP_PROFILE=true)
+from fastapi import Depends, FastAPI
 from app.api.v1.endpoints import disburse
 from app.db.models.disbursement import Base
-from app.db.session import engine
-
-Base.metadata.create_all(bind=engine)
+from app.db.session import async_engine, engine, pool_status, replicas
+from common_libs.metrics.middleware import install_metrics  # Prometheus-format metrics at /metrics
+from common_libs.auth.internal import require_internal_token  # shared service token for /internal/*, /metrics
+from common_libs.db.profiler import install_sql_profiler  # SQL_PROFILE=true: per-request SQL profile (development)
+from app.core.config import settings
 
 app = FastAPI()
+
+# Create tables on startup rather than at import (DB_CREATE_TABLES=false skips it)
+@app.on_event("startup")
+def create_tables():
+    if settings.DB_CREATE_TABLES:
+        with profiler.phase("db: create_all"):
+            Base.metadata.create_all(bind=engine)
 app.include_router(disburse.router, prefix="/api/v1/disbursements", tags=["Disbursements"])
 
+# Per-route latency, SQL count and time per request, pool usage
+install_metrics(
+    app, "disbursement_service", engines={"primary": engine, "primary_async": async_engine},
+    replicas=replicas, pool_status=pool_status,
+)
+install_sql_profiler(app, engines={"primary": engine, "primary_async": async_engine}, replicas=replicas)
+
+@app.get("/internal/pool", include_in_schema=False, dependencies=[Depends(require_internal_token)])
+def get_pool_status():
+    return pool_status()
+
+# Replica health checks (no-op without DB_REPLICA_URLS)
+@app.on_event("startup")
+def start_replica_health_checks():
+    replicas.start_health_checks()
+
+@app.on_event("startup")
+def report_startup_profile():
+    profiler.report()
+
 @app.get("/")
 def root():
     return {"message": "Disbursement service is running"}
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class DisbursementCreate(BaseModel):
     loan_id: int
@@ -17,3 +17,14 @@ class DisbursementOut(DisbursementCreate):
 
     class Config:
         orm_mode = True
+
+# Maximum number of records accepted by one batch request
+MAX_BATCH_DISBURSEMENTS = 10000
+
+# One record of a batch; `reference` is the client's idempotency key and
+# defaults to "disburse:<loan_id>" (one disbursement per loan)
+class DisbursementBatchItem(DisbursementCreate):
+    reference: Optional[str] = Field(None, max_length=255)
+
+class DisbursementBatch(BaseModel):
+    items: List[DisbursementBatchItem] = Field(..., min_length=1, max_length=MAX_BATCH_DISBURSEMENTS)
@@ -0,0 +1,69 @@
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.db.models.disbursement import Disbursement
+from app.schemas.disbursement import DisbursementCreate
+
+# Idempotency key used when the client doesn't send its own reference:
+# at most one disbursement per loan (same key the loan service's outbox sends)
+def default_reference(loan_id: int) -> str:
+    return f"disburse:{loan_id}"
+
+def create_disbursement(db: Session, disb: DisbursementCreate, reference: str = None):
+    # A repeated request with the same reference returns the original disbursement
+    if reference:
+        existing = db.query(Disbursement).filter(Disbursement.reference == reference).first()
+        if existing:
+            return existing
+    new_disbursement = Disbursement(**disb.dict(), reference=reference)
+    db.add(new_disbursement)
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request with the same reference won the race
+        db.rollback()
+        return db.query(Disbursement).filter(Disbursement.reference == reference).one()
+    db.refresh(new_disbursement)
+    return new_disbursement
+
+# INSERT that skips rows whose reference already exists
+def _insert_ignoring_duplicates(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(Disbursement).on_conflict_do_nothing(index_elements=["reference"])
+    if dialect == "sqlite":
+        return sqlite.insert(Disbursement).on_conflict_do_nothing(index_elements=["reference"])
+    return None
+
+# Insert one chunk of a batch (rows with unique references) in a single
+# multi-row INSERT ... ON CONFLICT DO NOTHING RETURNING and one commit.
+# Returns ({reference: id} of new rows, {reference: id} of rows that already existed)
+def create_disbursements(db: Session, rows: list):
+    references = [row["reference"] for row in rows]
+    stmt = _insert_ignoring_duplicates(db)
+    if stmt is None:
+        # No ON CONFLICT support: filter out known references first
+        known = set(db.execute(
+            select(Disbursement.reference).where(Disbursement.reference.in_(references))
+        ).scalars())
+        rows = [row for row in rows if row["reference"] not in known]
+        stmt = insert(Disbursement)
+
+    created = {}
+    if rows:
+        result = db.execute(stmt.returning(Disbursement.id, Disbursement.reference), rows)
+        created = {reference: id_ for id_, reference in result}
+
+    duplicates = [reference for reference in references if reference not in created]
+    existing = {}
+    if duplicates:
+        existing = dict(db.execute(
+            select(Disbursement.reference, Disbursement.id).where(Disbursement.reference.in_(duplicates))
+        ).all())
+
+    db.commit()
+    return created, existing
+
+def get_disbursements_by_loan(db: Session, loan_id: int):
+    return db.query(Disbursement).filter(Disbursement.loan_id == loan_id).all()
@@ -1,144 +1,286 @@
 # Import FastAPI tools for routing, dependencies, and query handling
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
 # SQLAlchemy tools to interact with the database
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
 
 # Typing and time libraries
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
 
 # Import local modules and functions
-from app.db.session import get_db  # DB session provider
-from app.schemas.loan import LoanCreate, LoanOut, PaginatedLoans  # Pydantic schemas
-from app.db.models.loan import Loan  # Loan model
+from app.db.session import get_db, get_read_db, read_sessionmaker, run_db  # DB sessions (primary / replica) and sync/async runner
+from app.schemas.loan import (  # Pydantic schemas
+    DocumentOut,
+    DocumentPresignRequest,
+    LoanCreate,
+    LoanOut,
+    LoanStats,
+    PaginatedLoans,
+    PresignedDocumentUpload,
+    RepaymentSchedule,
+)
 from common_libs.auth.dependencies import get_current_user  # Get authenticated user info
-from app.core.loan_logic import calculate_monthly_payment  # Business logic
 from common_libs.auth.roles import require_role  # Role-based access decorator
+from app.services.loan_service import (  # Business logic (runs against a sync Session)
+    check_loan_access,
+    check_loan_visible,
+    create_loan,
+    get_loan_out,
+    get_loan_schedule as build_loan_schedule,
+    list_loans,
+)
+from app.services.loan_export import stream_loan_export  # Streaming admin export
+from app.services.loan_stats import get_loan_stats  # Portfolio aggregates from the summary table
+from app.services.loan_documents import presign_loan_document, upload_loan_document  # Document uploads to S3
+from app.services.loan_cache import (  # ETags / 304s and the loan response cache
+    etag_matches,
+    get_cached_loan,
+    not_modified,
+    page_etag,
+    remember_loan,
+    set_cache_headers,
+)
 
 # Define a router for loan-related endpoints
+# Handlers are async; DB work goes through `run_db`, which uses the async
+# engine or the threadpool depending on the DB_ASYNC setting.
+# Read-only endpoints use `get_read_db` (a read replica when one is healthy),
+# and loan reads answer If-None-Match with 304 when nothing changed
 router = APIRouter()
 
+# Documented extra response of the conditional GETs
+NOT_MODIFIED = {304: {"description": "Not modified since the ETag sent in If-None-Match"}}
+
 # -----------------------------
 # Endpoint: Apply for a loan
 # -----------------------------
 @router.post("/apply", response_model=LoanOut, operation_id="submit_loan_application")
-def apply_for_loan(
+async def apply_for_loan(
     loan: LoanCreate,
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    user_id = current_user["user_id"]
-    new_loan = Loan(user_id=user_id, **loan.dict())
-    db.add(new_loan)
-    db.commit()
-    db.refresh(new_loan)
-    return LoanOut.from_orm(new_loan)
+    return await run_db(db, create_loan, current_user["user_id"], loan)
 
 # ---------------------------------------------------------
 # Endpoint: Get current user's loans with filtering/paging
 # ---------------------------------------------------------
-@router.get("/me", response_model=PaginatedLoans)
-def get_my_loans(
+@router.get("/me", response_model=PaginatedLoans, responses=NOT_MODIFIED)
+async def get_my_loans(
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(10, le=100),
     status: Optional[str] = None,
     created_after: Optional[datetime] = None,
     created_before: Optional[datetime] = None,
-    sort_by: Optional[str] = Query("created_at", pattern="^(created_at|amount|status)$"),
-    sort_order: Optional[str] = Query("desc", pattern="^(asc|desc)$")
+    min_monthly_payment: Optional[float] = None,
+    max_monthly_payment: Optional[float] = None,
+    sort_by: Optional[str] = Query("created_at", pattern="^(created_at|amount|status|monthly_payment)$"),
+    sort_order: Optional[str] = Query("desc", pattern="^(asc|desc)$"),
+    cursor: Optional[str] = None,  # Opaque `next_cursor` from the previous page (keyset mode)
+    total_mode: Optional[str] = Query("exact", pattern="^(exact|approximate|none)$")
+):
+    page = await run_db(
+        db,
+        list_loans,
+        user_id=current_user["user_id"],
+        skip=skip,
+        limit=limit,
+        status=status,
+        created_after=created_after,
+        created_before=created_before,
+        min_monthly_payment=min_monthly_payment,
+        max_monthly_payment=max_monthly_payment,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        cursor=cursor,
+        total_mode=total_mode,
+    )
+    etag = page_etag(page)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_cache_headers(response, etag)
+    return page
+
+# ---------------------------------------------------------
+# Admin-only: Stream all matching loans as NDJSON or CSV
+# ---------------------------------------------------------
+# Declared before "/{loan_id}" so "export" isn't parsed as a loan ID.
+# Rows are streamed in constant memory (see app/services/loan_export.py),
+# ordered by loan ID, with the stored monthly payment and total cost.
+# Read from a replica when one is healthy.
+@router.get("/export")
+async def export_loans(
+    request: Request,
+    current_user: dict = Depends(require_role("admin")),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    status: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    user_id: Optional[int] = None
+):
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_loan_export(
+            format,
+            read_sessionmaker(request),
+            status=status,
+            created_after=created_after,
+            created_before=created_before,
+            user_id=user_id,
+        ),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="loans.{format}"'},
+    )
+
+# ---------------------------------------------------------
+# Admin-only: Portfolio aggregates
+# ---------------------------------------------------------
+# Totals, pending backlog, approved amount and average rate, grouped by
+# status, application day or week, optionally for a date range or one user.
+# Read from the incrementally maintained summary table (see loan_stats.py),
+# never from a scan of all loans. Declared before "/{loan_id}".
+@router.get("/stats", response_model=LoanStats)
+async def get_stats(
+    current_user: dict = Depends(require_role("admin")),
+    db: Session = Depends(get_read_db),
+    group_by: str = Query("status", pattern="^(status|day|week)$"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    user_id: Optional[int] = None
 ):
-    filters = [Loan.user_id == current_user["user_id"]]
-    if status:
-        filters.append(Loan.status == status)
-    if created_after:
-        filters.append(Loan.created_at >= created_after)
-    if created_before:
-        filters.append(Loan.created_at <= created_before)
-
-    query = db.query(Loan).filter(and_(*filters))
-    order_column = getattr(Loan, sort_by)
-    order_column = order_column.desc() if sort_order == "desc" else order_column.asc()
-    query = query.order_by(order_column)
-
-    total = query.count()
-    loans = query.offset(skip).limit(limit).all()
-
-    items = []
-    for loan in loans:
-        loan_data = LoanOut.from_orm(loan)
-        loan_data.monthly_payment = calculate_monthly_payment(
-            loan.amount, loan.term_months, loan.interest_rate
-        )
-        items.append(loan_data)
-
-    return {"total": total, "items": items}
+    return await run_db(
+        db, get_loan_stats, group_by=group_by, date_from=date_from, date_to=date_to, user_id=user_id
+    )
 
 # ----------------------------
 # Endpoint: Get specific loan
 # ----------------------------
-@router.get("/{loan_id}", response_model=LoanOut)
-def get_loan_by_id(
+# Served from the response cache when possible (no query, no serialization);
+# only the access check runs against the cached owner
+@router.get("/{loan_id}", response_model=LoanOut, responses=NOT_MODIFIED)
+async def get_loan_by_id(
     loan_id: int,
+    request: Request,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    loan = db.query(Loan).filter(Loan.id == loan_id).first()
-    if not loan:
-        raise HTTPException(status_code=404, detail="Loan not found")
+    cached = get_cached_loan(loan_id)
+    if cached is not None:
+        check_loan_access(cached["user_id"], current_user)
+    else:
+        cached = remember_loan(await run_db(db, get_loan_out, loan_id, current_user))
 
-    # Only the loan owner or admin can view
-    if loan.user_id != current_user["user_id"] and current_user.get("role") != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized")
+    if etag_matches(request, cached["etag"]):
+        return not_modified(cached["etag"])
+    response = Response(cached["body"], media_type="application/json")
+    set_cache_headers(response, cached["etag"])
+    return response
 
-    loan_data = LoanOut.from_orm(loan)
-    loan_data.monthly_payment = calculate_monthly_payment(
-        loan.amount, loan.term_months, loan.interest_rate
+# ---------------------------------------------
+# Endpoint: Full repayment schedule for a loan
+# ---------------------------------------------
+@router.get("/{loan_id}/schedule", response_model=RepaymentSchedule)
+async def get_loan_schedule(
+    loan_id: int,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    return await run_db(db, build_loan_schedule, loan_id, current_user)
+
+# Owner or admin only; the cached loan answers when it can, and a DB check
+# releases its connection before the upload starts
+async def check_document_access(loan_id: int, current_user: dict, db):
+    cached = get_cached_loan(loan_id)
+    if cached is not None:
+        check_loan_access(cached["user_id"], current_user)
+    else:
+        await run_db(db, check_loan_visible, loan_id, current_user)
+
+# ---------------------------------------------------------
+# Endpoint: Upload a document for a loan (streamed to S3)
+# ---------------------------------------------------------
+# The raw file is the request body (not multipart form data), so it is never
+# spooled to disk: it goes to S3 in parallel parts as it arrives, with bounded
+# memory (see common_libs/s3.py). 413 above S3_MAX_UPLOAD_BYTES.
+@router.post("/{loan_id}/documents", response_model=DocumentOut, status_code=201)
+async def upload_document(
+    loan_id: int,
+    request: Request,
+    filename: str = Query(..., max_length=255),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    await check_document_access(loan_id, current_user, db)
+    content_length = request.headers.get("content-length")
+    return await upload_loan_document(
+        loan_id,
+        request.stream(),
+        filename,
+        content_type=request.headers.get("content-type"),
+        content_length=int(content_length) if content_length and content_length.isdigit() else None,
     )
-    return loan_data
+
+# ---------------------------------------------------------------------
+# Endpoint: Presigned upload, the client sends the document to S3 itself
+# ---------------------------------------------------------------------
+@router.post("/{loan_id}/documents/presign", response_model=PresignedDocumentUpload)
+async def presign_document(
+    loan_id: int,
+    data: DocumentPresignRequest,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    await check_document_access(loan_id, current_user, db)
+    # Signing is local, but the first call builds the boto3 client
+    return await run_in_threadpool(presign_loan_document, loan_id, data.filename, data.content_type)
 
 # --------------------------------------------
 # Admin-only: Get loans for a specific user
 # --------------------------------------------
-@router.get("/user/{user_id}", response_model=PaginatedLoans)
-def get_loans_by_user_id(
+@router.get("/user/{user_id}", response_model=PaginatedLoans, responses=NOT_MODIFIED)
+async def get_loans_by_user_id(
     user_id: int,
+    request: Request,
+    response: Response,
     current_user: dict = Depends(require_role("admin")),  # ✅ Secured
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(10, le=100),
     status: Optional[str] = None,
     created_after: Optional[datetime] = None,
     created_before: Optional[datetime] = None,
-    sort_by: Optional[str] = Query("created_at", pattern="^(created_at|amount|status)$"),
-    sort_order: Optional[str] = Query("desc", pattern="^(asc|desc)$")
+    min_monthly_payment: Optional[float] = None,
+    max_monthly_payment: Optional[float] = None,
+    sort_by: Optional[str] = Query("created_at", pattern="^(created_at|amount|status|monthly_payment)$"),
+    sort_order: Optional[str] = Query("desc", pattern="^(asc|desc)$"),
+    cursor: Optional[str] = None,  # Opaque `next_cursor` from the previous page (keyset mode)
+    total_mode: Optional[str] = Query("exact", pattern="^(exact|approximate|none)$")
 ):
-    filters = [Loan.user_id == user_id]
-    if status:
-        filters.append(Loan.status == status)
-    if created_after:
-        filters.append(Loan.created_at >= created_after)
-    if created_before:
-        filters.append(Loan.created_at <= created_before)
-
-    query = db.query(Loan).filter(and_(*filters))
-    order_column = getattr(Loan, sort_by)
-    order_column = order_column.desc() if sort_order == "desc" else order_column.asc()
-    query = query.order_by(order_column)
-
-    total = query.count()
-    loans = query.offset(skip).limit(limit).all()
-
-    items = []
-    for loan in loans:
-        loan_data = LoanOut.from_orm(loan)
-        loan_data.monthly_payment = calculate_monthly_payment(
-            loan.amount, loan.term_months, loan.interest_rate
-        )
-        items.append(loan_data)
-
-    return {"total": total, "items": items}
-
+    page = await run_db(
+        db,
+        list_loans,
+        user_id=user_id,
+        skip=skip,
+        limit=limit,
+        status=status,
+        created_after=created_after,
+        created_before=created_before,
+        min_monthly_payment=min_monthly_payment,
+        max_monthly_payment=max_monthly_payment,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        cursor=cursor,
+        total_mode=total_mode,
+    )
+    etag = page_etag(page)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_cache_headers(response, etag)
+    return page
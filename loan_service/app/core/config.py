@@ -1,6 +1,10 @@
 # Import the BaseSettings class from pydantic_settings.
 # This is used to load environment variables into a Python class.
 from pydantic_settings import BaseSettings
+from typing import Optional
+
+# Shared secrets loader (AWS Secrets Manager, local stand-in, file or env)
+from common_libs.config_loader import SettingsLoader, provider_from_env
 
 # Define a configuration class that reads environment variables
 class Settings(BaseSettings):
@@ -10,13 +14,45 @@ class Settings(BaseSettings):
     DB_PASSWORD: str           # Password for the database user
     DB_NAME: str               # Name of the database
     DB_PORT: int = 5432        # Port number for PostgreSQL (default is 5432)
+    DATABASE_URL: Optional[str] = None  # Full connection URL, overrides the DB_* values (e.g. sqlite for local runs)
+    DB_ASYNC: bool = False     # Use the asyncio database stack (asyncpg) instead of the sync driver
+    DB_MIGRATE_ON_STARTUP: bool = True  # Run the Alembic migrations on startup (disable when migrating as a deploy step)
+
+    # Read replicas (read-only endpoints are routed to them, see common_libs/db/replicas.py)
+    DB_REPLICA_URLS: str = ""              # Comma-separated replica URLs; empty = primary only
+    DB_REPLICA_MAX_LAG: float = 5.0        # Replicas lagging more than this (seconds) get no reads
+    DB_REPLICA_CHECK_INTERVAL: float = 5.0  # Seconds between replica health checks
+    DB_READ_YOUR_WRITES_SECONDS: float = 10.0  # After a write, the client reads from the primary this long
+
+    # Connection pool tuning (applies to the sync and async engines)
+    DB_POOL_SIZE: int = 5          # Connections kept open in the pool
+    DB_MAX_OVERFLOW: int = 10      # Extra connections allowed above the pool size during bursts
+    DB_POOL_TIMEOUT: float = 30    # Seconds to wait for a free connection before failing
+    DB_POOL_RECYCLE: int = 1800    # Reopen connections older than this many seconds (-1 = never)
+    DB_POOL_PRE_PING: bool = True  # Test connections on checkout and replace dead ones
+
+    # Outbox worker (delivers approval/rejection side effects)
+    OUTBOX_BATCH_SIZE: int = 100       # Messages claimed per batch
+    OUTBOX_MAX_ATTEMPTS: int = 8       # Attempts before a message is moved to "dead"
+    OUTBOX_POLL_INTERVAL: float = 1.0  # Seconds to sleep when the outbox is empty
+    OUTBOX_LEASE_SECONDS: int = 60     # How long a claimed message stays reserved for a worker
+    OUTBOX_RETRY_BASE_SECONDS: float = 2.0  # Retry backoff: base * 2^(attempts - 1)
+
+    # Admin loan export (GET /api/v1/loans/export)
+    EXPORT_BATCH_SIZE: int = 5000      # Rows fetched per server-side cursor batch
+
+    # Cached GET /api/v1/loans/{loan_id} responses (app/services/loan_cache.py)
+    LOAN_RESPONSE_CACHE_TTL: float = 60.0  # Seconds an entry lives; 0 disables the cache
+
+    # Backfill of the stored loan payment columns (migration 0003, app/db/backfill.py)
+    BACKFILL_BATCH_SIZE: int = 5000    # Loans read and updated per batch
 
     # Secret key used for things like JWT signing
     SECRET_KEY: str
 
     # AWS-related configurations
-    aws_region: str            # AWS region (e.g., eu-central-1)
-    aws_secret_name: str       # Name of the AWS Secrets Manager secret
+    aws_region: Optional[str] = None       # AWS region (e.g., eu-central-1)
+    aws_secret_name: Optional[str] = None  # Name of the AWS Secrets Manager secret (SETTINGS_PROVIDER=aws)
 
     # Internal service URL
     user_service_url: str      # URL of the user service for inter-service communication
@@ -28,6 +64,20 @@ class Settings(BaseSettings):
         # Specify that environment variables should be read from a file named `.env`
         env_file = ".env"
 
+    # Sources in priority order: explicit values, environment, .env, then the
+    # secret from SETTINGS_PROVIDER (default "env": no secret is fetched)
+    @classmethod
+    def settings_customise_sources(cls, settings_cls, init_settings, env_settings, dotenv_settings, file_secret_settings):
+        return init_settings, env_settings, dotenv_settings, secret_settings, file_secret_settings
+
+# Secret values (through the local settings cache), matched to fields case-insensitively
+secrets_loader = SettingsLoader(provider_from_env(default="env"), cache_name="loan_service")
+
+def secret_settings() -> dict:
+    fields = {name.lower(): name for name in Settings.model_fields}
+    values = secrets_loader.load()
+    return {fields[key.lower()]: value for key, value in values.items() if key.lower() in fields}
+
 # Create an instance of the Settings class to load all environment variables
 settings = Settings()
 
@@ -1,3 +1,7 @@
+# NumPy powers the batch (vectorized) amortization engine below
+import numpy as np
+
+
 # Function to calculate the monthly loan repayment amount
 def calculate_monthly_payment(amount: float, term: int, interest_rate: float) -> float:
     # Convert the annual interest rate to a monthly rate
@@ -16,3 +20,124 @@ def calculate_monthly_payment(amount: float, term: int, interest_rate: float) ->
     # r = monthly interest rate
     # n = total number of months
     return round((amount * monthly_rate) / (1 - (1 + monthly_rate) ** -term), 2)
+
+
+# -------------------------------------------------------------------
+# Vectorized amortization engine
+# -------------------------------------------------------------------
+# The functions below take NumPy arrays (or anything array-like) of
+# amounts, terms and annual interest rates and compute the results for
+# every loan in one pass, instead of calling the scalar function once
+# per row. Results match `calculate_monthly_payment` element-wise.
+
+def calculate_monthly_payments(amounts, terms, interest_rates) -> np.ndarray:
+    # Normalise inputs to float arrays of the same shape
+    amounts = np.asarray(amounts, dtype=np.float64)
+    terms = np.asarray(terms, dtype=np.float64)
+    monthly_rates = np.asarray(interest_rates, dtype=np.float64) / 100 / 12
+
+    # Evaluate the amortization formula only where the rate is non-zero,
+    # so zero-interest loans don't trigger a division by zero warning
+    has_interest = monthly_rates != 0
+    safe_rates = np.where(has_interest, monthly_rates, 1.0)
+    amortized = np.round(
+        (amounts * safe_rates) / (1 - (1 + safe_rates) ** -terms), 2
+    )
+
+    # Zero-interest loans are a simple division (unrounded, like the scalar path)
+    return np.where(has_interest, amortized, amounts / terms)
+
+
+def build_repayment_schedules(amounts, terms, interest_rates) -> dict:
+    # Build month-by-month schedules for many loans at once.
+    # Every schedule is padded to the longest term in the batch; months past
+    # a loan's own term are masked out (all values are zero there).
+    amounts = np.asarray(amounts, dtype=np.float64)
+    terms = np.asarray(terms, dtype=np.int64)
+    monthly_rates = np.asarray(interest_rates, dtype=np.float64) / 100 / 12
+    payments = calculate_monthly_payments(amounts, terms, interest_rates)
+
+    # Month numbers 1..max_term as a row vector, broadcast against each loan
+    max_term = int(terms.max()) if terms.size else 0
+    months = np.arange(1, max_term + 1)
+    active = months[None, :] <= terms[:, None]
+
+    # Remaining balance after k payments (closed form):
+    # B_k = P * (1 + r)^k - M * ((1 + r)^k - 1) / r    (or P - M * k when r == 0)
+    r = monthly_rates[:, None]
+    growth = (1 + r) ** (months[None, :] - 1)
+    has_interest = r != 0
+    safe_r = np.where(has_interest, r, 1.0)
+    opening = np.where(
+        has_interest,
+        amounts[:, None] * growth - payments[:, None] * (growth - 1) / safe_r,
+        amounts[:, None] - payments[:, None] * (months[None, :] - 1),
+    )
+
+    # Interest accrues on the opening balance; the final instalment clears
+    # whatever is left so rounding of the payment never leaves a residue
+    interest = opening * r
+    is_last = months[None, :] == terms[:, None]
+    payment = np.where(is_last, opening + interest, payments[:, None])
+    principal = payment - interest
+    closing = opening - principal
+
+    return {
+        "month": np.where(active, months[None, :], 0),
+        "payment": np.where(active, np.round(payment, 2), 0.0),
+        "principal": np.where(active, np.round(principal, 2), 0.0),
+        "interest": np.where(active, np.round(interest, 2), 0.0),
+        "balance": np.where(active, np.round(np.abs(closing), 2), 0.0),
+        "mask": active,
+    }
+
+
+def calculate_total_interest(amounts, terms, interest_rates) -> np.ndarray:
+    # Total interest paid over the life of each loan.
+    # Uses the closed form instead of materialising full schedules, so it stays
+    # O(number of loans) in memory: (n - 1) regular payments plus the final
+    # instalment (opening balance of the last month plus its interest), minus P.
+    amounts = np.asarray(amounts, dtype=np.float64)
+    terms = np.asarray(terms, dtype=np.float64)
+    monthly_rates = np.asarray(interest_rates, dtype=np.float64) / 100 / 12
+    payments = calculate_monthly_payments(amounts, terms, interest_rates)
+
+    has_interest = monthly_rates != 0
+    safe_rates = np.where(has_interest, monthly_rates, 1.0)
+    growth = (1 + monthly_rates) ** (terms - 1)
+    last_opening = np.where(
+        has_interest,
+        amounts * growth - payments * (growth - 1) / safe_rates,
+        amounts - payments * (terms - 1),
+    )
+    final_payment = last_opening * (1 + monthly_rates)
+    return np.round(payments * (terms - 1) + final_payment - amounts, 2)
+
+
+def calculate_stored_costs(amounts, terms, interest_rates) -> list:
+    # Values of the stored Loan.monthly_payment / Loan.total_cost columns for
+    # many loans, as a list of (monthly_payment, total_cost) float pairs.
+    # Loans without a defined payment (missing or zero term) get (None, None).
+    amounts = np.asarray(amounts, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        payments = calculate_monthly_payments(amounts, terms, interest_rates)
+        total_costs = np.round(amounts + calculate_total_interest(amounts, terms, interest_rates), 2)
+    return [
+        (float(payment), float(total_cost)) if np.isfinite(payment) and np.isfinite(total_cost) else (None, None)
+        for payment, total_cost in zip(payments, total_costs)
+    ]
+
+
+def build_repayment_schedule(amount: float, term: int, interest_rate: float) -> list:
+    # Convenience wrapper: a single loan's schedule as a list of dict rows
+    schedules = build_repayment_schedules([amount], [term], [interest_rate])
+    return [
+        {
+            "month": int(schedules["month"][0, i]),
+            "payment": float(schedules["payment"][0, i]),
+            "principal": float(schedules["principal"][0, i]),
+            "interest": float(schedules["interest"][0, i]),
+            "balance": float(schedules["balance"][0, i]),
+        }
+        for i in range(term)
+    ]
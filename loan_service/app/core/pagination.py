@@ -0,0 +1,56 @@
+# Helpers for keyset (cursor) pagination
+#
+# Instead of OFFSET, which makes the database walk and discard every skipped
+# row, keyset pagination remembers the (sort_key, id) of the last row on the
+# page and asks for rows strictly "after" it. With a matching composite index
+# every page costs the same no matter how deep it is.
+#
+# The cursor also records the ordering it was issued for: a position in one
+# ordering means nothing in another (and its value may not even have the
+# type of the other sort column), so a cursor reused with a different
+# sort_by/sort_order is rejected.
+import base64
+import json
+from datetime import datetime
+from typing import Any, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+
+# Encode the ordering and the last row's sort value and id into an opaque,
+# URL-safe string
+def encode_cursor(sort_by: str, sort_order: str, sort_value: Any, row_id: int) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_by, sort_order, sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+# Decode a cursor back into (sort_value, id), parsing timestamps when needed
+def decode_cursor(cursor: str, sort_by: str, sort_order: str) -> Tuple[Any, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort_by, cursor_sort_order, sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if (cursor_sort_by, cursor_sort_order) != (sort_by, sort_order):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cursor was issued for sort_by={cursor_sort_by}&sort_order={cursor_sort_order}",
+        )
+    try:
+        if sort_by == "created_at":
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# Build the WHERE clause that selects rows after the cursor position
+# - desc: (col < value) OR (col == value AND id < last_id)
+# - asc:  (col > value) OR (col == value AND id > last_id)
+def keyset_filter(sort_column, id_column, sort_value: Any, row_id: int, sort_order: str):
+    if sort_order == "desc":
+        return or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < row_id))
+    return or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > row_id))
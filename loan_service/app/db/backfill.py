@@ -0,0 +1,77 @@
+# Batched backfill of the stored payment columns (Loan.monthly_payment, Loan.total_cost)
+#
+# Walks the loans table in primary key order, BACKFILL_BATCH_SIZE rows at a
+# time, computes the values for the whole batch with the vectorized engine and
+# writes them back with one executemany UPDATE per batch.
+#
+# Migration 0003 runs it once for existing rows. Run it by hand after
+# `alembic upgrade --sql` (offline migrations can't read rows), or to fill in
+# rows written by bulk Core inserts, which skip the ORM events on Loan:
+#   python -m app.db.backfill             # recompute every loan
+#   python -m app.db.backfill --missing   # only loans with no stored payment
+import argparse
+
+from sqlalchemy import bindparam, column, inspect, select, table, update
+from sqlalchemy.engine import Connection
+
+from app.core.config import settings
+from app.core.loan_logic import calculate_stored_costs
+
+# Only the columns the backfill touches, independent of the current model
+loans = table(
+    "loans",
+    column("id"), column("amount"), column("term_months"), column("interest_rate"),
+    column("monthly_payment"), column("total_cost"), column("version"),
+)
+
+
+def backfill_costs(connection: Connection, batch_size: int = settings.BACKFILL_BATCH_SIZE,
+                   missing_only: bool = False, commit_each_batch: bool = False) -> int:
+    set_costs = (
+        update(loans)
+        .where(loans.c.id == bindparam("b_id"))
+        .values(monthly_payment=bindparam("b_monthly_payment"), total_cost=bindparam("b_total_cost"))
+    )
+    # From migration 0004 on, changed rows also get a new version (and ETag)
+    if "version" in {col["name"] for col in inspect(connection).get_columns("loans")}:
+        set_costs = set_costs.values(version=loans.c.version + 1)
+
+    last_id, updated = 0, 0
+    while True:
+        query = (
+            select(loans.c.id, loans.c.amount, loans.c.term_months, loans.c.interest_rate)
+            .where(loans.c.id > last_id)
+            .order_by(loans.c.id)
+            .limit(batch_size)
+        )
+        if missing_only:
+            query = query.where(loans.c.monthly_payment.is_(None))
+        rows = connection.execute(query).all()
+        if not rows:
+            return updated
+
+        costs = calculate_stored_costs(
+            [row.amount for row in rows], [row.term_months for row in rows], [row.interest_rate for row in rows]
+        )
+        connection.execute(set_costs, [
+            {"b_id": row.id, "b_monthly_payment": payment, "b_total_cost": total_cost}
+            for row, (payment, total_cost) in zip(rows, costs)
+        ])
+        if commit_each_batch:
+            connection.commit()  # keep row locks short on a live table
+
+        updated += len(rows)
+        last_id = rows[-1].id
+
+
+if __name__ == "__main__":
+    from app.db.session import engine
+
+    parser = argparse.ArgumentParser(description="Backfill Loan.monthly_payment and Loan.total_cost")
+    parser.add_argument("--missing", action="store_true", help="only loans with no stored payment")
+    parser.add_argument("--batch-size", type=int, default=settings.BACKFILL_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with engine.connect() as connection:
+        count = backfill_costs(connection, args.batch_size, args.missing, commit_each_batch=True)
+    print(f"Backfilled {count} loans")
@@ -0,0 +1,29 @@
+# Run the Alembic migrations in migrations/ (replaces Base.metadata.create_all)
+#
+#   python -m app.db.migrate            # upgrade to the latest revision
+#   python -m app.db.migrate 0001       # upgrade to a given revision
+# (use `alembic downgrade <rev>` to go back)
+#
+# The app also calls `upgrade()` on startup when DB_MIGRATE_ON_STARTUP is true.
+import os
+import sys
+
+from alembic import command
+from alembic.config import Config
+
+ALEMBIC_INI = os.path.join(os.path.dirname(__file__), "..", "..", "alembic.ini")
+
+
+def alembic_config(configure_logger: bool = True) -> Config:
+    config = Config(os.path.abspath(ALEMBIC_INI))
+    config.set_main_option("script_location", os.path.join(os.path.dirname(os.path.abspath(ALEMBIC_INI)), "migrations"))
+    config.attributes["configure_logger"] = configure_logger
+    return config
+
+
+def upgrade(revision: str = "head", configure_logger: bool = False):
+    command.upgrade(alembic_config(configure_logger), revision)
+
+
+if __name__ == "__main__":
+    upgrade(sys.argv[1] if len(sys.argv) > 1 else "head", configure_logger=True)
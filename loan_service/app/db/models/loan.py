@@ -1,7 +1,8 @@
 # Import column types and utilities from SQLAlchemy
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Index, event, inspect
 from sqlalchemy.orm import relationship  # Used to define relationships between tables
 from app.db.session import Base  # Import the Base class from your session config
+from app.core.loan_logic import calculate_stored_costs  # Computes the stored payment columns
 import datetime  # Used to set default timestamps
 
 # Define a model class for the "loans" table in the database
@@ -9,6 +10,25 @@ class Loan(Base):
     # Name of the table in the database
     __tablename__ = "loans"
 
+    # Composite indexes backing keyset pagination of a user's loans.
+    # One per allowed `sort_by` column, each ending in `id` as the tie-breaker,
+    # so "WHERE user_id = ? AND (col, id) < (?, ?) ORDER BY col, id" is a range scan.
+    # (user_id, created_at, id) also serves plain (user_id, created_at) lookups,
+    # (user_id, monthly_payment, id) also serves payment range filters.
+    # Plus:
+    # - (user_id, status, created_at, id): a user's loans filtered by status,
+    #   in the default created_at order
+    # - (status, created_at): admin queries across users (pending queue, export)
+    # Indexes are created by the migrations in migrations/versions/.
+    __table_args__ = (
+        Index("ix_loans_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_loans_user_id_amount_id", "user_id", "amount", "id"),
+        Index("ix_loans_user_id_monthly_payment_id", "user_id", "monthly_payment", "id"),
+        Index("ix_loans_user_id_status_id", "user_id", "status", "id"),
+        Index("ix_loans_user_id_status_created_at_id", "user_id", "status", "created_at", "id"),
+        Index("ix_loans_status_created_at", "status", "created_at"),
+    )
+
     # Unique identifier for each loan (Primary Key)
     id = Column(Integer, primary_key=True, index=True)
 
@@ -33,3 +53,34 @@ class Loan(Base):
     # Timestamp showing when the loan was created
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
+    # Monthly repayment and amount plus total interest, computed on write
+    # (see the events below) so reads don't recompute them and queries can
+    # sort and filter on them. NULL when the loan has no defined payment.
+    monthly_payment = Column(Float, nullable=True)
+    total_cost = Column(Float, nullable=True)
+
+    # Row version, incremented on every UPDATE (by the ORM through
+    # version_id_col, by hand in bulk Core updates). Drives the ETags of the
+    # read endpoints, and concurrent ORM updates of the same loan fail with
+    # StaleDataError instead of silently overwriting each other.
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
+
+
+# Fill in the stored payment columns whenever a loan is inserted, or updated
+# with a new amount, term or rate. Rows written with bulk Core statements skip
+# ORM events; `python -m app.db.backfill --missing` fills those in.
+@event.listens_for(Loan, "before_insert")
+def _set_costs_on_insert(mapper, connection, target):
+    target.monthly_payment, target.total_cost = calculate_stored_costs(
+        [target.amount], [target.term_months], [target.interest_rate]
+    )[0]
+
+
+@event.listens_for(Loan, "before_update")
+def _set_costs_on_update(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if any(attrs[name].history.has_changes() for name in ("amount", "term_months", "interest_rate")):
+        _set_costs_on_insert(mapper, connection, target)
+
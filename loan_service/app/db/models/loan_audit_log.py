@@ -1,5 +1,5 @@
 # Import SQLAlchemy column types and utilities
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 
 # Import the Base class for model declaration
 from app.db.session import Base
@@ -12,6 +12,12 @@ class LoanAuditLog(Base):
     # Name of the table in the database
     __tablename__ = "loan_audit_log"
 
+    # History of one loan, and of one admin's actions, in time order
+    __table_args__ = (
+        Index("ix_loan_audit_log_loan_id_timestamp", "loan_id", "timestamp"),
+        Index("ix_loan_audit_log_actor_id_timestamp", "actor_id", "timestamp"),
+    )
+
     # Primary key - unique ID for each audit log entry
     id = Column(Integer, primary_key=True, index=True)
 
@@ -0,0 +1,25 @@
+# Import SQLAlchemy column types
+from sqlalchemy import Column, Date, Float, Integer, String
+
+# Import the Base class for model declaration
+from app.db.session import Base
+
+
+# Portfolio summary: one row per application day and loan status.
+# Kept up to date by the loan service in the same transaction as the loan
+# change (apply moves a loan into (day, "pending"), a decision moves it to
+# (day, "approved"/"rejected")), so GET /stats never scans the loans table.
+class LoanDailyStats(Base):
+    __tablename__ = "loan_daily_stats"
+
+    # Day the loans were applied for (UTC) and their current status
+    day = Column(Date, primary_key=True)
+    status = Column(String, primary_key=True)
+
+    # Number of loans and sum of their amounts
+    loan_count = Column(Integer, nullable=False, default=0)
+    amount_total = Column(Float, nullable=False, default=0.0)
+
+    # Sum and count of the interest rates that are set, for the average rate
+    interest_rate_total = Column(Float, nullable=False, default=0.0)
+    interest_rate_count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,51 @@
+# Import SQLAlchemy column types and utilities
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index
+
+# Import the Base class for model declaration
+from app.db.session import Base
+
+# Import datetime to set default timestamps
+from datetime import datetime
+
+# Define a model for the transactional outbox.
+# Side effects of a status change (emails, disbursements) are written here in
+# the same transaction as the change itself, then delivered by the outbox
+# worker (app/workers/outbox_worker.py). Nothing is lost if the request, the
+# worker or a downstream service fails midway.
+class OutboxMessage(Base):
+    # Name of the table in the database
+    __tablename__ = "loan_outbox"
+
+    # Index used by the worker to find due messages
+    __table_args__ = (
+        Index("ix_loan_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    # Primary key - also gives messages a stable processing order
+    id = Column(Integer, primary_key=True, index=True)
+
+    # What to do ("notify_approval", "notify_rejection", "disburse")
+    topic = Column(String, nullable=False)
+
+    # Arguments for the handler (user_id, loan_id, amount, reason, ...)
+    payload = Column(JSON, nullable=False)
+
+    # Unique key per side effect (e.g. "disburse:42"), also sent downstream
+    # so retries can't disburse the same loan twice
+    idempotency_key = Column(String, unique=True, nullable=False)
+
+    # pending -> processing -> done, or dead after too many failed attempts
+    status = Column(String, nullable=False, default="pending")
+
+    # Number of delivery attempts so far
+    attempts = Column(Integer, nullable=False, default=0)
+
+    # Earliest time of the next attempt; while processing, the lease expiry
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # Error message of the last failed attempt
+    last_error = Column(String, nullable=True)
+
+    # Timestamps of creation and successful delivery
+    created_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
@@ -1,15 +1,28 @@
+# Startup profiling (STARTUP_PROFILE=true); imported first so it times every import below
+from common_libs.startup_profile import profiler
+
 # Import FastAPI to create the web application
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
+
+# Internal endpoints (/internal/*, /metrics) require the shared service token
+from common_libs.auth.internal import require_internal_token
 
 # Import routers (route definitions) for loan-related endpoints
 from app.api.v1.endpoints import loan        # Routes for applying, viewing, and listing loans
 from app.api.v1.endpoints import approval    # Routes for approving or rejecting loans
 
-# Import the audit log model (not directly used here but often triggers table creation)
-from app.db.models.loan_audit_log import LoanAuditLog
+# Shared HTTP client for inter-service calls (closed on shutdown)
+from common_libs import http_client
+
+# Connection pool metrics, settings and schema migrations
+from app.db.session import async_engine, engine, pool_status, replicas
 
-# Import database base class and engine for schema creation
-from app.db.session import Base, engine
+# Request latency, DB and outbound-call metrics served at /metrics
+from common_libs.metrics.middleware import install_metrics
+
+# Per-request SQL profiler, N+1 and slow-query detection (SQL_PROFILE=true, development only)
+from common_libs.db.profiler import install_sql_profiler
+from app.core.config import settings
 
 # Create the FastAPI application instance
 app = FastAPI(title="Loan Service")  # Title will appear in Swagger UI
@@ -22,6 +35,47 @@ app.include_router(loan.router, prefix="/api/v1/loans", tags=["loans"])
 # Routes from approval.py will also be available as /api/v1/loans/...
 app.include_router(approval.router, prefix="/api/v1/loans", tags=["approval"])
 
-# Create all database tables defined in your models
-# This runs only once at startup and ensures tables exist in the database
-Base.metadata.create_all(bind=engine)
+# Per-route latency (by path template and operation_id), SQL count and time per
+# request, outbound HTTP timing and pool usage, in Prometheus format at /metrics
+install_metrics(
+    app, "loan_service", engines={"primary": engine, "primary_async": async_engine},
+    replicas=replicas, pool_status=pool_status,
+)
+
+# Development only: every statement of every request, repeated statements
+# (N+1) and slow ones with their EXPLAIN plan. Adds X-SQL-* and Server-Timing
+# response headers and /internal/sql-profile; does nothing unless SQL_PROFILE=true
+install_sql_profiler(app, engines={"primary": engine, "primary_async": async_engine}, replicas=replicas)
+
+# Close pooled connections to the other services when the app stops
+@app.on_event("shutdown")
+async def close_http_client():
+    await http_client.aclose()
+
+# Internal endpoint exposing connection pool metrics
+# (checked-out connections, wait time, overflow events, timeouts, replica URLs)
+@app.get("/internal/pool", include_in_schema=False, dependencies=[Depends(require_internal_token)])
+def get_pool_status():
+    return pool_status()
+
+# Bring the schema up to date with the Alembic migrations (migrations/versions)
+# Runs in the startup hook rather than at import, so importing the app (tests,
+# tooling, workers) never touches the database. Set DB_MIGRATE_ON_STARTUP=false
+# when migrations run as a separate deploy step (`python -m app.db.migrate`).
+@app.on_event("startup")
+def run_migrations():
+    if settings.DB_MIGRATE_ON_STARTUP:
+        from app.db.migrate import upgrade  # alembic is only imported when needed
+
+        with profiler.phase("db: migrations"):
+            upgrade()
+
+# Start checking the read replicas (no-op without DB_REPLICA_URLS)
+@app.on_event("startup")
+def start_replica_health_checks():
+    replicas.start_health_checks()
+
+# Print the startup profile once everything above has run
+@app.on_event("startup")
+def report_startup_profile():
+    profiler.report()
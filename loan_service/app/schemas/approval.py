@@ -1,7 +1,31 @@
 # Import the base class for creating data models from Pydantic
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+# Typing helpers for lists and fixed values
+from typing import List, Literal
 
 # Define a schema (data validation model) for loan approval input
 class LoanApproval(BaseModel):
     # The ID of the admin who approved the loan
     approved_by: int
+
+# Maximum number of loans accepted by one bulk request
+MAX_BULK_LOANS = 5000
+
+# Schema for bulk approval input (PUT /bulk/approve)
+class BulkApproval(BaseModel):
+    loan_ids: List[int] = Field(..., min_length=1, max_length=MAX_BULK_LOANS)
+
+# Schema for bulk rejection input (PUT /bulk/reject)
+class BulkRejection(BulkApproval):
+    reason: str
+
+# Outcome for a single loan in a bulk request
+class BulkDecisionItem(BaseModel):
+    loan_id: int
+    outcome: Literal["approved", "rejected", "not_found", "not_pending"]
+
+# Response of a bulk approve/reject request
+class BulkDecisionResult(BaseModel):
+    processed: int                # Number of loans whose status was changed
+    results: List[BulkDecisionItem]
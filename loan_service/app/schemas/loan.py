@@ -1,8 +1,8 @@
 # Import Pydantic's base model for data validation
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 # Import utilities for optional fields, fixed values, and lists
-from typing import Optional, Literal, List
+from typing import Dict, Optional, Literal, List
 
 # Import datetime to represent timestamps
 from datetime import datetime
@@ -27,8 +27,10 @@ class LoanOut(BaseModel):
     interest_rate: float        # Annual interest rate for the loan
     status: Literal["pending", "approved", "rejected"]  # Loan status (limited to 3 values)
     approved_by: Optional[int] = None  # ID of the admin who approved/rejected the loan
-    created_at: datetime        # Timestamp when the loan was created
-    monthly_payment: Optional[float] = None  # Calculated monthly payment (set manually)
+    created_at: Optional[datetime] = None  # Timestamp when the loan was created (NULL on some old rows)
+    monthly_payment: Optional[float] = None  # Monthly payment (stored, computed when the loan is written)
+    total_cost: Optional[float] = None       # Amount plus total interest (stored alongside)
+    version: int = 1                         # Row version, changes whenever the loan does (see the ETag header)
 
     class Config:
         # Enable compatibility with SQLAlchemy models (ORM mode)
@@ -39,5 +41,71 @@ class LoanOut(BaseModel):
 # Schema for paginated list of loans (used in GET /me)
 # -------------------------------------------------------
 class PaginatedLoans(BaseModel):
-    total: int                  # Total number of loans available
+    total: Optional[int] = None  # Total number of loans available (null when total_mode=none)
     items: List[LoanOut]        # List of loan records returned on the current page
+    next_cursor: Optional[str] = None  # Pass as `cursor` to fetch the next page (null on the last page)
+
+
+# -------------------------------------------------------------
+# Schemas for a loan's repayment schedule (GET /{id}/schedule)
+# -------------------------------------------------------------
+class ScheduleItem(BaseModel):
+    month: int                  # Instalment number (1-based)
+    payment: float              # Amount paid this month
+    principal: float            # Portion of the payment that reduces the balance
+    interest: float             # Portion of the payment that is interest
+    balance: float              # Remaining balance after this payment
+
+
+class RepaymentSchedule(BaseModel):
+    loan_id: int                # ID of the loan the schedule belongs to
+    monthly_payment: float      # Regular monthly payment
+    total_interest: float       # Interest paid over the life of the loan
+    total_cost: float           # Amount plus total interest
+    items: List[ScheduleItem]   # Month-by-month breakdown
+
+
+# ------------------------------------------------------
+# Schemas for portfolio stats (GET /stats)
+# ------------------------------------------------------
+class StatsBucket(BaseModel):
+    key: Optional[str] = None   # Status, day or week start (ISO date); null for the totals
+    loan_count: int             # Loans applied for
+    total_amount: float         # Sum of their amounts
+    pending_count: int          # Pending backlog
+    pending_amount: float
+    approved_count: int
+    approved_amount: float      # Approved amount
+    rejected_count: int
+    rejected_amount: float
+    average_interest_rate: Optional[float] = None  # Mean rate of the loans that have one
+
+
+class LoanStats(BaseModel):
+    group_by: Literal["status", "day", "week"]
+    totals: StatsBucket         # Everything matching the filters
+    groups: List[StatsBucket]   # One bucket per status / day / week, in key order
+
+
+# ------------------------------------------------------
+# Schemas for loan documents (POST /{loan_id}/documents)
+# ------------------------------------------------------
+class DocumentOut(BaseModel):
+    key: str                    # Object key in the documents bucket
+    url: str
+    size: int                   # Bytes received
+    sha256: str                 # Hex SHA-256 of the uploaded body
+    parts: int                  # Parts of the multipart upload (1 = single PUT)
+
+
+class DocumentPresignRequest(BaseModel):
+    filename: str = Field(..., max_length=255)
+    content_type: Optional[str] = None
+
+
+class PresignedDocumentUpload(BaseModel):
+    key: str                    # Where the document will be stored
+    url: str                    # POST the file here, as multipart form data...
+    fields: Dict[str, str]      # ...with these form fields before the file field
+    expires_in: int             # Seconds the URL stays valid
+    max_bytes: int              # Larger files are refused by S3
@@ -1,5 +1,5 @@
-# Import List type for declaring lists in Pydantic models
-from typing import List
+# Import List and Optional types for declaring fields in Pydantic models
+from typing import List, Optional
 
 # Import BaseModel for creating data schemas
 from pydantic import BaseModel
@@ -9,5 +9,6 @@ from app.schemas.loan import LoanOut
 
 # Schema for paginated loan responses (used in endpoints like GET /me or /user/{id})
 class PaginatedLoans(BaseModel):
-    total: int                 # Total number of loan records available (across all pages)
+    total: Optional[int] = None  # Total number of loan records available (across all pages)
     items: List[LoanOut]       # List of loan records on the current page
+    next_cursor: Optional[str] = None  # Cursor for the next page (keyset pagination)
@@ -0,0 +1,93 @@
+# Conditional GETs and the loan response cache
+#
+# ETags come from the loan row version (Loan.version), so they change exactly
+# when the loan does:
+# - GET /{loan_id}: "<id>-<version>"; responses are also cached (serialized)
+#   for LOAN_RESPONSE_CACHE_TTL seconds, so polling an unchanged loan costs
+#   neither a query nor serialization. Approve/reject write the decided loans
+#   through to the cache after their commit, so a poll never sees the old status
+#   from the cache (or re-caches it from a lagging read replica).
+# - list endpoints: a hash of the page's (id, version) pairs, total and cursor.
+# A matching If-None-Match gets 304 Not Modified with no body.
+#
+# The cache is per process by default; set LOAN_RESPONSE_CACHE_BACKEND=redis
+# (and LOAN_RESPONSE_CACHE_REDIS_URL) to share it, and its invalidation, across pods.
+import hashlib
+import json
+from typing import Iterable, Optional
+
+from fastapi import Request, Response
+
+from app.core.config import settings
+from app.schemas.loan import LoanOut
+from common_libs.cache import cache_from_env
+
+loan_responses = cache_from_env("LOAN_RESPONSE")
+
+# Clients must revalidate every time, and shared caches must not store loans
+CACHE_CONTROL = "private, no-cache"
+
+
+# ---------------------------------------------------------
+# ETags
+# ---------------------------------------------------------
+def loan_etag(loan_id: int, version: int) -> str:
+    return f'"{loan_id}-{version}"'
+
+
+def page_etag(page: dict) -> str:
+    digest = hashlib.sha256(
+        f"{page['total']}|{page['next_cursor']}|".encode()
+        + ",".join(f"{item.id}:{item.version}" for item in page["items"]).encode()
+    ).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    # If-None-Match may list several tags, use weak tags (W/"...") or be "*"
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag in tags
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def set_cache_headers(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+# ---------------------------------------------------------
+# Response cache for single loans
+# ---------------------------------------------------------
+# Entries: {"user_id", "version", "etag", "body"} with body the LoanOut JSON
+def get_cached_loan(loan_id: int) -> Optional[dict]:
+    if settings.LOAN_RESPONSE_CACHE_TTL <= 0:
+        return None
+    cached = loan_responses.get(f"loan:{loan_id}")
+    return json.loads(cached) if cached else None
+
+
+def remember_loan(loan: LoanOut) -> dict:
+    entry = {
+        "user_id": loan.user_id,
+        "version": loan.version,
+        "etag": loan_etag(loan.id, loan.version),
+        "body": loan.model_dump_json(),
+    }
+    if settings.LOAN_RESPONSE_CACHE_TTL > 0:
+        # Never replace a newer entry (e.g. one written by an approval) with an
+        # older read, which can come from a lagging replica
+        current = get_cached_loan(loan.id)
+        if current is None or current["version"] <= loan.version:
+            loan_responses.set(f"loan:{loan.id}", json.dumps(entry), settings.LOAN_RESPONSE_CACHE_TTL)
+    return entry
+
+
+def remember_loans(loans: Iterable[LoanOut]):
+    for loan in loans:
+        remember_loan(loan)
@@ -0,0 +1,39 @@
+# Loan document uploads (identity documents, payslips, ...)
+#
+# Two ways in, both ending up under documents/loans/<loan_id>/ in S3_BUCKET_NAME:
+# - through the API: the raw request body is streamed to a multipart upload
+#   in parallel parts (common_libs/s3.py), so a 50 MB document costs a few
+#   parts of memory and never blocks a worker thread for the transfer
+# - presigned: the client gets a short-lived POST policy and sends the file to
+#   S3 directly, the API only signs it
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException
+
+from common_libs import s3
+
+
+def document_folder(loan_id: int) -> str:
+    return f"documents/loans/{loan_id}"
+
+
+def _check_configured():
+    if not s3.BUCKET_NAME:
+        raise HTTPException(status_code=503, detail="Document storage is not configured")
+
+
+async def upload_loan_document(loan_id: int, chunks: AsyncIterator[bytes], filename: str,
+                               content_type: Optional[str] = None, content_length: Optional[int] = None) -> dict:
+    _check_configured()
+    # Refuse oversized bodies before reading them when the client declares the size
+    if content_length is not None and content_length > s3.S3_MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Documents are limited to {s3.S3_MAX_UPLOAD_BYTES} bytes")
+    try:
+        return await s3.upload_stream(chunks, s3.document_key(filename, document_folder(loan_id)), content_type)
+    except s3.UploadTooLarge:
+        raise HTTPException(status_code=413, detail=f"Documents are limited to {s3.S3_MAX_UPLOAD_BYTES} bytes")
+
+
+def presign_loan_document(loan_id: int, filename: str, content_type: Optional[str] = None) -> dict:
+    _check_configured()
+    return s3.presign_upload(s3.document_key(filename, document_folder(loan_id)), content_type)
@@ -0,0 +1,110 @@
+# Streaming loan export (GET /api/v1/loans/export)
+#
+# Rows are read through a server-side cursor in batches of EXPORT_BATCH_SIZE,
+# and each batch is serialized and yielded before the next one is fetched.
+# Memory use stays constant no matter how many loans match.
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.db.models.loan import Loan
+from app.db.session import SessionLocal
+
+# Exported columns, in output order
+EXPORT_COLUMNS = [
+    "id", "user_id", "amount", "term_months", "interest_rate",
+    "status", "approved_by", "created_at", "monthly_payment", "total_cost",
+]
+
+
+# ---------------------------------------------------------
+# Read matching loans batch by batch
+# ---------------------------------------------------------
+def iter_loan_batches(
+    db: Session,
+    status: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    batch_size: int = 5000,
+) -> Iterator[list]:
+    filters = []
+    if user_id is not None:
+        filters.append(Loan.user_id == user_id)
+    if status:
+        filters.append(Loan.status == status)
+    if created_after:
+        filters.append(Loan.created_at >= created_after)
+    if created_before:
+        filters.append(Loan.created_at <= created_before)
+
+    # Plain column tuples (no ORM objects / identity map), ordered by primary key
+    query = (
+        select(
+            Loan.id, Loan.user_id, Loan.amount, Loan.term_months, Loan.interest_rate,
+            Loan.status, Loan.approved_by, Loan.created_at, Loan.monthly_payment, Loan.total_cost,
+        )
+        .where(*filters)
+        .order_by(Loan.id)
+        .execution_options(yield_per=batch_size)  # server-side cursor
+    )
+
+    for rows in db.execute(query).partitions():
+        yield rows
+
+
+# ---------------------------------------------------------
+# Serializers: one string per batch
+# ---------------------------------------------------------
+def _ndjson_batch(rows: list) -> str:
+    lines = []
+    for row in rows:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        if record["created_at"] is not None:
+            record["created_at"] = record["created_at"].isoformat()
+        lines.append(json.dumps(record))
+    return "\n".join(lines) + "\n"
+
+
+def _csv_batch(rows: list, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(
+        [*row[:7], row[7].isoformat() if row[7] else "", *("" if value is None else value for value in row[8:])]
+        for row in rows
+    )
+    return buffer.getvalue()
+
+
+# ---------------------------------------------------------
+# Full export as a stream of text chunks
+# ---------------------------------------------------------
+# Opens its own session (from `session_factory`, e.g. a replica's) because the
+# response body is produced after the request handler (and its DB dependency)
+# has returned. This is a plain generator: StreamingResponse iterates it in
+# the threadpool, so the blocking cursor reads never run on the event loop (in
+# either DB_ASYNC mode).
+def stream_loan_export(fmt: str = "ndjson", session_factory: sessionmaker = SessionLocal, **filters) -> Iterator[str]:
+    db = session_factory()
+    try:
+        if fmt == "csv":
+            # Header is sent even when nothing matches
+            first = True
+            for rows in iter_loan_batches(db, batch_size=settings.EXPORT_BATCH_SIZE, **filters):
+                yield _csv_batch(rows, header=first)
+                first = False
+            if first:
+                yield _csv_batch([], header=True)
+        else:
+            for rows in iter_loan_batches(db, batch_size=settings.EXPORT_BATCH_SIZE, **filters):
+                yield _ndjson_batch(rows)
+    finally:
+        db.close()
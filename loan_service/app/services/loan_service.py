@@ -0,0 +1,295 @@
+# FastAPI exception for HTTP error responses
+from fastapi import HTTPException
+
+# SQLAlchemy tools to interact with the database
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy import and_, insert, select, update
+
+# Typing and time libraries
+from typing import List, Optional
+from datetime import datetime
+
+# Import local modules and functions
+from app.db.models.loan import Loan
+from app.db.models.loan_audit_log import LoanAuditLog
+from app.services.outbox import decision_messages, enqueue
+from app.services.loan_cache import remember_loans
+from app.services.loan_stats import apply_stats_deltas, stats_deltas
+from app.schemas.loan import LoanCreate, LoanOut
+from app.core.loan_logic import build_repayment_schedule, calculate_stored_costs
+from app.core.pagination import encode_cursor, decode_cursor, keyset_filter
+
+
+# ---------------------------------------------------------
+# Create a new loan application for a user
+# ---------------------------------------------------------
+# The portfolio stats are updated in the same transaction
+def create_loan(db: Session, user_id: int, loan: LoanCreate) -> LoanOut:
+    new_loan = Loan(user_id=user_id, **loan.dict())
+    db.add(new_loan)
+    db.flush()  # sets created_at
+    apply_stats_deltas(db, stats_deltas([new_loan], "pending"))
+    db.commit()
+    db.refresh(new_loan)
+    return LoanOut.from_orm(new_loan)
+
+
+# ---------------------------------------------------------
+# Only the loan owner or admin can view a loan
+# ---------------------------------------------------------
+def check_loan_access(owner_id: int, current_user: dict):
+    if owner_id != current_user["user_id"] and current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+
+# ---------------------------------------------------------
+# Load a loan the current user is allowed to see
+# ---------------------------------------------------------
+def get_visible_loan(db: Session, loan_id: int, current_user: dict) -> Loan:
+    loan = db.query(Loan).filter(Loan.id == loan_id).first()
+    if not loan:
+        raise HTTPException(status_code=404, detail="Loan not found")
+
+    check_loan_access(loan.user_id, current_user)
+    return loan
+
+
+# ---------------------------------------------------------
+# Access check before work done outside the database
+# ---------------------------------------------------------
+# Ends the read transaction so the connection goes back to the pool before a
+# long-running step (e.g. a document upload) starts; returns the loan's owner
+def check_loan_visible(db: Session, loan_id: int, current_user: dict) -> int:
+    owner_id = get_visible_loan(db, loan_id, current_user).user_id
+    db.rollback()
+    return owner_id
+
+
+# ---------------------------------------------------------
+# A single loan (monthly payment and total cost are stored)
+# ---------------------------------------------------------
+def get_loan_out(db: Session, loan_id: int, current_user: dict) -> LoanOut:
+    return LoanOut.from_orm(get_visible_loan(db, loan_id, current_user))
+
+
+# ---------------------------------------------------------
+# Full repayment schedule for a loan
+# ---------------------------------------------------------
+# The stored costs are NULL for rows written outside the ORM until
+# `backfill --missing` runs: those are computed here instead. A loan with no
+# defined payment (missing or zero term) has no schedule.
+def get_loan_schedule(db: Session, loan_id: int, current_user: dict) -> dict:
+    loan = get_visible_loan(db, loan_id, current_user)
+
+    monthly_payment, total_cost = loan.monthly_payment, loan.total_cost
+    if monthly_payment is None or total_cost is None:
+        monthly_payment, total_cost = calculate_stored_costs(
+            [loan.amount], [loan.term_months or 0], [loan.interest_rate or 0]
+        )[0]
+    if monthly_payment is None:
+        raise HTTPException(status_code=404, detail="Loan has no repayment schedule")
+
+    return {
+        "loan_id": loan.id,
+        "monthly_payment": monthly_payment,
+        "total_interest": round(total_cost - loan.amount, 2),
+        "total_cost": total_cost,
+        "items": build_repayment_schedule(loan.amount, loan.term_months, loan.interest_rate),
+    }
+
+
+# ---------------------------------------------------------
+# Record an admin decision on a pending loan
+# ---------------------------------------------------------
+# Sets the new status and writes the audit log entry and the outbox messages
+# for its side effects (email, disbursement) in one transaction. The outbox
+# worker delivers them, so the request only waits for the DB write.
+# The row version check turns a concurrent decision on the same loan into a
+# 409, and the decided loan replaces any cached response for it.
+def decide_loan(db: Session, loan_id: int, actor_id: int, action: str, reason: Optional[str] = None) -> Loan:
+    loan = db.query(Loan).filter(Loan.id == loan_id).first()
+    if not loan:
+        raise HTTPException(status_code=404, detail="Loan not found")
+    if loan.status != "pending":
+        raise HTTPException(status_code=400, detail="Loan is not in pending status")
+
+    # Move the loan from the pending bucket of the stats to the decided one
+    apply_stats_deltas(db, stats_deltas([loan], "pending", -1) + stats_deltas([loan], action))
+
+    loan.status = action
+    loan.approved_by = actor_id
+
+    db.add(LoanAuditLog(
+        loan_id=loan.id,
+        action=action,
+        actor_id=actor_id,
+        reason=reason
+    ))
+    enqueue(db, decision_messages(action, loan.id, loan.user_id, loan.amount, reason))
+
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Loan was modified by another request, please retry")
+    db.refresh(loan)
+    remember_loans([LoanOut.from_orm(loan)])
+    return loan
+
+
+# ---------------------------------------------------------
+# Record an admin decision on many pending loans at once
+# ---------------------------------------------------------
+# Set-based equivalent of `decide_loan`:
+# - one UPDATE ... WHERE id IN (...) AND status = 'pending' RETURNING
+# - one multi-row INSERT into the audit log and one into the outbox
+# - one SELECT to tell missing loans apart from non-pending ones
+# - a single commit
+# Bumps the row versions like the ORM does and writes the decided loans
+# through to the response cache. Returns per-loan outcomes in request order.
+def decide_loans(db: Session, loan_ids: List[int], actor_id: int, action: str, reason: Optional[str] = None):
+    loan_ids = list(dict.fromkeys(loan_ids))  # de-duplicate, keep order
+
+    decided = db.execute(
+        update(Loan)
+        .where(Loan.id.in_(loan_ids), Loan.status == "pending")
+        .values(status=action, approved_by=actor_id, version=Loan.version + 1)
+        .returning(*Loan.__table__.columns)
+        .execution_options(synchronize_session=False)
+    ).mappings().all()
+    decided = [dict(row) for row in decided]
+    decided_ids = {row["id"] for row in decided}
+
+    if decided:
+        apply_stats_deltas(db, stats_deltas(decided, "pending", -1) + stats_deltas(decided, action))
+        db.execute(insert(LoanAuditLog), [
+            {"loan_id": row["id"], "action": action, "actor_id": actor_id, "reason": reason}
+            for row in decided
+        ])
+        enqueue(db, [
+            message
+            for row in decided
+            for message in decision_messages(action, row["id"], row["user_id"], row["amount"], reason)
+        ])
+
+    # Anything not updated either doesn't exist or isn't pending
+    remaining = [loan_id for loan_id in loan_ids if loan_id not in decided_ids]
+    existing = set()
+    if remaining:
+        existing = set(db.execute(select(Loan.id).where(Loan.id.in_(remaining))).scalars())
+
+    db.commit()
+    remember_loans(LoanOut(**row) for row in decided)
+
+    results = []
+    for loan_id in loan_ids:
+        if loan_id in decided_ids:
+            outcome = action
+        elif loan_id in existing:
+            outcome = "not_pending"
+        else:
+            outcome = "not_found"
+        results.append({"loan_id": loan_id, "outcome": outcome})
+
+    return results
+
+
+# ---------------------------------------------------------
+# Estimate the number of rows a query would return
+# ---------------------------------------------------------
+# On PostgreSQL this reads the planner's row estimate from EXPLAIN, which
+# costs about as much as planning the query and never touches the table.
+# Other databases fall back to an exact COUNT(*).
+def estimate_count(db: Session, query) -> int:
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql":
+        return query.count()
+
+    compiled = query.statement.compile(dialect=bind.dialect)
+    params = compiled.params
+    if compiled.positional:  # e.g. asyncpg uses $1, $2 ... placeholders
+        params = tuple(params[name] for name in compiled.positiontup)
+    plan = db.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", params
+    ).scalar()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+# ---------------------------------------------------------
+# List loans with filtering, sorting and pagination
+# ---------------------------------------------------------
+# Two pagination modes are supported:
+# - offset: `skip` rows are skipped (classic, cost grows with page depth)
+# - cursor: pass the `next_cursor` of the previous page; `skip` is ignored
+#           and each page is an index range scan from the cursor position
+# `total_mode` controls how the total is produced:
+# - "exact" runs COUNT(*), "approximate" uses the planner estimate,
+#   "none" skips counting entirely (total is returned as null)
+def list_loans(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 10,
+    status: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    min_monthly_payment: Optional[float] = None,
+    max_monthly_payment: Optional[float] = None,
+    sort_by: str = "created_at",
+    sort_order: str = "desc",
+    cursor: Optional[str] = None,
+    total_mode: str = "exact",
+) -> dict:
+    filters = [Loan.user_id == user_id]
+    if status:
+        filters.append(Loan.status == status)
+    if created_after:
+        filters.append(Loan.created_at >= created_after)
+    if created_before:
+        filters.append(Loan.created_at <= created_before)
+    if min_monthly_payment is not None:
+        filters.append(Loan.monthly_payment >= min_monthly_payment)
+    if max_monthly_payment is not None:
+        filters.append(Loan.monthly_payment <= max_monthly_payment)
+    if sort_by == "monthly_payment":
+        # Loans without a payment (NULL) have no place in a payment ordering, and
+        # a NULL sort value can't be a keyset position: they are left out, as
+        # with the payment range filters
+        filters.append(Loan.monthly_payment.isnot(None))
+
+    query = db.query(Loan).filter(and_(*filters))
+
+    # Count before the cursor condition is applied so the total covers all pages
+    total = None
+    if total_mode == "exact":
+        total = query.count()
+    elif total_mode == "approximate":
+        total = estimate_count(db, query)
+
+    # Sort by the requested column with the id as a unique tie-breaker,
+    # matching the (user_id, <sort column>, id) composite indexes on Loan
+    sort_column = getattr(Loan, sort_by)
+    if sort_order == "desc":
+        query = query.order_by(sort_column.desc(), Loan.id.desc())
+    else:
+        query = query.order_by(sort_column.asc(), Loan.id.asc())
+
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor, sort_by, sort_order)
+        query = query.filter(keyset_filter(sort_column, Loan.id, sort_value, last_id, sort_order))
+    elif skip:
+        query = query.offset(skip)
+
+    # Fetch one extra row to know whether another page exists
+    loans = query.limit(limit + 1).all()
+    has_more = len(loans) > limit
+    loans = loans[:limit]
+
+    next_cursor = None
+    if has_more and loans:
+        last = loans[-1]
+        next_cursor = encode_cursor(sort_by, sort_order, getattr(last, sort_by), last.id)
+
+    items = [LoanOut.from_orm(loan) for loan in loans]
+    return {"total": total, "items": items, "next_cursor": next_cursor}
@@ -0,0 +1,169 @@
+# Loan portfolio stats (GET /api/v1/loans/stats)
+#
+# Aggregates come from the loan_daily_stats summary table, which the write
+# paths (create_loan, decide_loan, decide_loans) update incrementally:
+# `stats_deltas` describes how loans move between (day, status) buckets and
+# `apply_stats_deltas` adds them with one multi-row upsert, in the caller's
+# transaction. Reads are then a scan of at most (days x statuses) rows.
+# Per-user stats read the user's loans directly through the (user_id, ...)
+# indexes, since one user only has a handful of loans.
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.db.models.loan import Loan
+from app.db.models.loan_stats import LoanDailyStats
+
+STAT_COLUMNS = ["loan_count", "amount_total", "interest_rate_total", "interest_rate_count"]
+
+
+# ---------------------------------------------------------
+# Incremental maintenance
+# ---------------------------------------------------------
+# `loans` are mappings or objects with created_at, amount and interest_rate.
+# sign=+1 adds them to (day, status), sign=-1 removes them.
+# Loans without created_at (old rows) have no day bucket: migration 0005 left
+# them out of the table, so they are skipped here too, consistently.
+def stats_deltas(loans: Iterable, status: str, sign: int = 1) -> List[dict]:
+    deltas = []
+    for loan in loans:
+        get = loan.get if isinstance(loan, dict) else lambda key: getattr(loan, key)
+        if get("created_at") is None:
+            continue
+        rate = get("interest_rate")
+        deltas.append({
+            "day": get("created_at").date(),
+            "status": status,
+            "loan_count": sign,
+            "amount_total": sign * get("amount"),
+            "interest_rate_total": sign * rate if rate is not None else 0.0,
+            "interest_rate_count": sign if rate is not None else 0,
+        })
+    return deltas
+
+
+def apply_stats_deltas(db: Session, deltas: List[dict]):
+    # Merge deltas per bucket, then upsert every bucket in one statement.
+    # Buckets are written in key order so concurrent writers lock rows in the
+    # same order and can't deadlock.
+    merged = defaultdict(lambda: dict.fromkeys(STAT_COLUMNS, 0))
+    for delta in deltas:
+        bucket = merged[(delta["day"], delta["status"])]
+        for column in STAT_COLUMNS:
+            bucket[column] += delta[column]
+    rows = [{"day": day, "status": status, **values} for (day, status), values in sorted(merged.items())]
+    if not rows:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = (postgresql if dialect == "postgresql" else sqlite).insert
+        stmt = insert(LoanDailyStats).values(rows)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["day", "status"],
+            set_={column: getattr(LoanDailyStats, column) + stmt.excluded[column] for column in STAT_COLUMNS},
+        ))
+        return
+
+    # No ON CONFLICT support: update, or insert buckets that don't exist yet
+    for row in rows:
+        stats = db.get(LoanDailyStats, (row["day"], row["status"]), with_for_update=True)
+        if stats is None:
+            db.add(LoanDailyStats(**row))
+        else:
+            for column in STAT_COLUMNS:
+                setattr(stats, column, getattr(stats, column) + row[column])
+    db.flush()
+
+
+# ---------------------------------------------------------
+# Reading
+# ---------------------------------------------------------
+def _group_key(day: date, status: str, group_by: str) -> Optional[str]:
+    if group_by == "status":
+        return status
+    if group_by == "week":
+        return (day - timedelta(days=day.weekday())).isoformat()  # Monday of the week
+    if group_by == "day":
+        return day.isoformat()
+    return None
+
+
+def _empty_bucket(key: Optional[str]) -> dict:
+    return {
+        "key": key,
+        "loan_count": 0, "total_amount": 0.0,
+        "pending_count": 0, "pending_amount": 0.0,
+        "approved_count": 0, "approved_amount": 0.0,
+        "rejected_count": 0, "rejected_amount": 0.0,
+        "_rate_total": 0.0, "_rate_count": 0,
+    }
+
+
+def _add(bucket: dict, status: str, count: int, amount: float, rate_total: float, rate_count: int):
+    bucket["loan_count"] += count
+    bucket["total_amount"] += amount
+    if status in ("pending", "approved", "rejected"):
+        bucket[f"{status}_count"] += count
+        bucket[f"{status}_amount"] += amount
+    bucket["_rate_total"] += rate_total
+    bucket["_rate_count"] += rate_count
+
+
+def _finish(bucket: dict) -> dict:
+    rate_total, rate_count = bucket.pop("_rate_total"), bucket.pop("_rate_count")
+    bucket["average_interest_rate"] = round(rate_total / rate_count, 4) if rate_count else None
+    for key in ("total_amount", "pending_amount", "approved_amount", "rejected_amount"):
+        bucket[key] = round(bucket[key], 2)
+    return bucket
+
+
+def get_loan_stats(
+    db: Session,
+    group_by: str = "status",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    user_id: Optional[int] = None,
+) -> dict:
+    if user_id is None:
+        query = select(
+            LoanDailyStats.day, LoanDailyStats.status, LoanDailyStats.loan_count, LoanDailyStats.amount_total,
+            LoanDailyStats.interest_rate_total, LoanDailyStats.interest_rate_count,
+        ).where(LoanDailyStats.loan_count != 0)
+        if date_from:
+            query = query.where(LoanDailyStats.day >= date_from)
+        if date_to:
+            query = query.where(LoanDailyStats.day <= date_to)
+        rows = db.execute(query).all()
+    else:
+        # Same shape, aggregated from the user's loans
+        query = select(Loan.created_at, Loan.status, Loan.amount, Loan.interest_rate).where(Loan.user_id == user_id)
+        if date_from:
+            query = query.where(Loan.created_at >= date_from)
+        if date_to:
+            query = query.where(Loan.created_at < date_to + timedelta(days=1))
+        rows = [
+            (created_at.date(), status, 1, amount, rate or 0.0, int(rate is not None))
+            for created_at, status, amount, rate in db.execute(query)
+        ]
+
+    totals = _empty_bucket(None)
+    groups = {}
+    for day, status, count, amount, rate_total, rate_count in rows:
+        if isinstance(day, str):  # SQLite may hand back dates as text
+            day = date.fromisoformat(day)
+        key = _group_key(day, status, group_by)
+        if key not in groups:
+            groups[key] = _empty_bucket(key)
+        _add(groups[key], status, count, amount, rate_total, rate_count)
+        _add(totals, status, count, amount, rate_total, rate_count)
+
+    return {
+        "group_by": group_by,
+        "totals": _finish(totals),
+        "groups": [_finish(groups[key]) for key in sorted(groups)],
+    }
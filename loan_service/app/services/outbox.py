@@ -0,0 +1,45 @@
+# SQLAlchemy tools to interact with the database
+from sqlalchemy.orm import Session
+from sqlalchemy import insert
+
+# Typing helpers
+from typing import List, Optional
+
+# Outbox model
+from app.db.models.outbox import OutboxMessage
+
+
+# ---------------------------------------------------------
+# Side effects of an admin decision, as outbox messages
+# ---------------------------------------------------------
+# Approvals notify the borrower and disburse the funds; rejections only
+# notify. The idempotency key is unique per loan and side effect.
+def decision_messages(action: str, loan_id: int, user_id: int, amount: float, reason: Optional[str] = None) -> List[dict]:
+    if action == "approved":
+        return [
+            {
+                "topic": "notify_approval",
+                "payload": {"user_id": user_id, "loan_id": loan_id},
+                "idempotency_key": f"notify_approval:{loan_id}",
+            },
+            {
+                "topic": "disburse",
+                "payload": {"user_id": user_id, "loan_id": loan_id, "amount": amount},
+                "idempotency_key": f"disburse:{loan_id}",
+            },
+        ]
+    return [
+        {
+            "topic": "notify_rejection",
+            "payload": {"user_id": user_id, "loan_id": loan_id, "reason": reason},
+            "idempotency_key": f"notify_rejection:{loan_id}",
+        },
+    ]
+
+
+# ---------------------------------------------------------
+# Add messages to the outbox (caller commits)
+# ---------------------------------------------------------
+def enqueue(db: Session, messages: List[dict]):
+    if messages:
+        db.execute(insert(OutboxMessage), messages)
@@ -0,0 +1,208 @@
+# Outbox worker: delivers the side effects of loan decisions
+#
+# Runs as its own process next to the API:
+#   python -m app.workers.outbox_worker          # run forever
+#   python -m app.workers.outbox_worker --once   # drain one batch and exit
+#
+# Each cycle claims a batch of due messages (FOR UPDATE SKIP LOCKED, so several
+# workers can run side by side), marks them "processing" with a lease, delivers
+# them concurrently, then records the outcome:
+# - success                  -> done
+# - failure, attempts left   -> pending again, retried with exponential backoff
+# - failure, no attempts left -> dead (kept for inspection / manual replay)
+# - permanent failure        -> dead right away (e.g. the user doesn't exist)
+# A worker that dies mid-batch leaves its messages "processing"; they are
+# claimed again once the lease expires.
+# User emails for a batch's notifications are looked up together (one
+# POST /api/v1/users/batch per batch, see common_libs/users.py), and the emails
+# go through the notification dispatcher (common_libs/notifications.py), which
+# sends them in batches over pooled connections; a handler waits for its
+# email's delivery so failed sends are retried like any other outbox message.
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.models.outbox import OutboxMessage
+from common_libs import http_client
+from common_libs.notifications import PermanentDeliveryError, send_email_async, shutdown_notifications
+from common_libs.disbursement import disburse_funds_async
+from common_libs.users import UserNotFound, get_user_email_async, user_loader_scope
+
+# Failures that retrying can't fix: the message goes straight to "dead"
+PERMANENT_ERRORS = (UserNotFound, PermanentDeliveryError)
+
+# Emails get one dispatcher attempt (the outbox owns retries) and must finish
+# well inside the lease, so an expired lease never overlaps a send in progress.
+# A send that times out before it started is dropped by the dispatcher; one
+# already under way is waited for. The outbox idempotency key goes along (as
+# the Message-ID), so a resend after a send whose outcome wasn't recorded can
+# be recognised.
+EMAIL_TIMEOUT = settings.OUTBOX_LEASE_SECONDS / 2
+
+
+# ----------------------------------------
+# Handlers, one per outbox topic
+# ----------------------------------------
+# A handler succeeds or raises. User lookups raise too (user_service down,
+# 5xx -> retried; unknown user -> UserNotFound, permanent), so an email is
+# never sent to a placeholder address and the message marked done.
+async def notify_approval(payload: dict, idempotency_key: str):
+    email = await get_user_email_async(payload["user_id"])
+    await send_email_async(
+        to=email,
+        subject="Loan Approved",
+        body=f"Your loan #{payload['loan_id']} has been approved.",
+        max_attempts=1,
+        timeout=EMAIL_TIMEOUT,
+        idempotency_key=idempotency_key,
+    )
+
+
+async def notify_rejection(payload: dict, idempotency_key: str):
+    email = await get_user_email_async(payload["user_id"])
+    await send_email_async(
+        to=email,
+        subject="Loan Rejected",
+        body=f"Unfortunately, your loan #{payload['loan_id']} was rejected. Reason: {payload['reason']}",
+        max_attempts=1,
+        timeout=EMAIL_TIMEOUT,
+        idempotency_key=idempotency_key,
+    )
+
+
+async def disburse(payload: dict, idempotency_key: str):
+    await disburse_funds_async(
+        user_id=payload["user_id"],
+        loan_id=payload["loan_id"],
+        amount=payload["amount"],
+        idempotency_key=idempotency_key,
+    )
+
+
+HANDLERS = {
+    "notify_approval": notify_approval,
+    "notify_rejection": notify_rejection,
+    "disburse": disburse,
+}
+
+
+# ----------------------------------------
+# Claiming and completing batches
+# ----------------------------------------
+def claim_batch(batch_size: int) -> list:
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        messages = (
+            db.query(OutboxMessage)
+            .filter(
+                OutboxMessage.status.in_(("pending", "processing")),
+                OutboxMessage.next_attempt_at <= now,
+            )
+            .order_by(OutboxMessage.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        for message in messages:
+            message.status = "processing"
+            message.attempts += 1
+            message.next_attempt_at = now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+        claimed = [
+            {
+                "id": m.id,
+                "topic": m.topic,
+                "payload": m.payload,
+                "idempotency_key": m.idempotency_key,
+                "attempts": m.attempts,
+            }
+            for m in messages
+        ]
+        db.commit()
+        return claimed
+    finally:
+        db.close()
+
+
+def complete_batch(outcomes: list):
+    # outcomes: (claimed message, error message or None, permanent failure?)
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        for message, error, permanent in outcomes:
+            values = {"last_error": error}
+            if error is None:
+                values.update(status="done", processed_at=now)
+            elif permanent or message["attempts"] >= settings.OUTBOX_MAX_ATTEMPTS:
+                values.update(status="dead")
+            else:
+                delay = settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (message["attempts"] - 1)
+                values.update(status="pending", next_attempt_at=now + timedelta(seconds=delay))
+            # Only the current lease holder may record the outcome: if our lease
+            # expired and another worker claimed the message again, `attempts`
+            # has moved on and this update matches nothing
+            updated = (
+                db.query(OutboxMessage)
+                .filter(
+                    OutboxMessage.id == message["id"],
+                    OutboxMessage.status == "processing",
+                    OutboxMessage.attempts == message["attempts"],
+                )
+                .update(values, synchronize_session=False)
+            )
+            if not updated:
+                print(f"Outbox message {message['id']}: lease lost, outcome not recorded")
+        db.commit()
+    finally:
+        db.close()
+
+
+async def deliver(message: dict):
+    handler = HANDLERS.get(message["topic"])
+    if handler is None:
+        return message, f"Unknown topic: {message['topic']}", True
+    try:
+        await handler(message["payload"], message["idempotency_key"])
+        return message, None, False
+    except PERMANENT_ERRORS as e:
+        return message, f"{type(e).__name__}: {e}"[:1000], True
+    except Exception as e:
+        return message, (str(e) or type(e).__name__)[:1000], False
+
+
+async def process_batch(batch_size: int) -> int:
+    # Returns the number of messages handled in this cycle
+    messages = await asyncio.to_thread(claim_batch, batch_size)
+    if not messages:
+        return 0
+    # One loader per batch: the notification handlers' user lookups are
+    # coalesced into batched user_service requests instead of one per message
+    with user_loader_scope():
+        outcomes = await asyncio.gather(*(deliver(message) for message in messages))
+    await asyncio.to_thread(complete_batch, outcomes)
+    for message, error, permanent in outcomes:
+        if error:
+            print(f"Outbox message {message['id']} ({message['topic']}) failed{' permanently' if permanent else ''}: {error}")
+    return len(messages)
+
+
+async def run(once: bool = False):
+    try:
+        while True:
+            handled = await process_batch(settings.OUTBOX_BATCH_SIZE)
+            if once:
+                return
+            if not handled:
+                await asyncio.sleep(settings.OUTBOX_POLL_INTERVAL)
+    finally:
+        await http_client.aclose()
+        await asyncio.to_thread(shutdown_notifications)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deliver loan outbox messages")
+    parser.add_argument("--once", action="store_true", help="process a single batch and exit")
+    args = parser.parse_args()
+    asyncio.run(run(once=args.once))
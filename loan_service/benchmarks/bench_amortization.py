@@ -0,0 +1,62 @@
+# Benchmark: scalar vs vectorized monthly payment calculation
+#
+# Run from the loan_service directory:
+#   python -m benchmarks.bench_amortization --loans 500000
+import argparse
+import time
+
+import numpy as np
+
+from app.core.loan_logic import (
+    calculate_monthly_payment,
+    calculate_monthly_payments,
+    calculate_total_interest,
+)
+
+
+def make_portfolio(n: int, seed: int = 42):
+    # Random but realistic portfolio: R500 - R500k, 1-360 months, 0-30% APR
+    rng = np.random.default_rng(seed)
+    amounts = rng.uniform(500, 500_000, n).round(2)
+    terms = rng.integers(1, 361, n)
+    rates = rng.choice([0.0, 9.5, 12.0, 15.0, 22.5, 29.9], n)
+    return amounts, terms, rates
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def scalar_payments(amounts, terms, rates):
+    # The per-row loop the list endpoints used to run
+    return [
+        calculate_monthly_payment(a, t, r)
+        for a, t, r in zip(amounts.tolist(), terms.tolist(), rates.tolist())
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scalar vs vectorized amortization benchmark")
+    parser.add_argument("--loans", type=int, default=200_000)
+    args = parser.parse_args()
+
+    amounts, terms, rates = make_portfolio(args.loans)
+
+    scalar, scalar_time = timed(scalar_payments, amounts, terms, rates)
+    vector, vector_time = timed(calculate_monthly_payments, amounts, terms, rates)
+    _, interest_time = timed(calculate_total_interest, amounts, terms, rates)
+
+    # Sanity check: both paths must agree
+    max_diff = float(np.max(np.abs(np.asarray(scalar) - vector))) if args.loans else 0.0
+
+    print(f"loans:                 {args.loans:,}")
+    print(f"scalar payments:       {scalar_time * 1000:9.1f} ms")
+    print(f"vectorized payments:   {vector_time * 1000:9.1f} ms  ({scalar_time / vector_time:.0f}x)")
+    print(f"vectorized interest:   {interest_time * 1000:9.1f} ms")
+    print(f"max abs difference:    {max_diff}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# Benchmark: authentication overhead per request
+#
+# 1. Token decode cost: python-jose vs PyJWT, and a verified-claims cache hit
+# 2. Per-request overhead of the auth dependencies on a minimal FastAPI app:
+#    an open route vs get_current_user vs require_role("admin"), with the
+#    claims cache on and off
+#
+# Run from the loan_service directory:
+#   python -m benchmarks.bench_auth --iterations 20000
+#
+# The PyJWT rows are skipped when PyJWT isn't installed.
+import argparse
+import asyncio
+import time
+
+from fastapi import Depends, FastAPI
+
+from common_libs.auth import jwt as auth_jwt
+from common_libs.auth.dependencies import get_current_user
+from common_libs.auth.roles import require_role
+
+
+def per_call_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def bench_decode(token: str, iterations: int):
+    print("decode cost per token (µs)")
+    print(f"  jose (uncached):   {per_call_us(lambda: auth_jwt._decode_jose(token), iterations):8.1f}")
+    try:
+        import jwt  # noqa: F401  PyJWT
+        print(f"  pyjwt (uncached):  {per_call_us(lambda: auth_jwt._decode_pyjwt(token), iterations):8.1f}")
+    except ImportError:
+        print("  pyjwt (uncached):   skipped (PyJWT not installed)")
+    auth_jwt.decode_token(token)  # warm the cache
+    print(f"  cache hit:         {per_call_us(lambda: auth_jwt.decode_token(token), iterations):8.1f}")
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/open")
+    async def open_route():
+        return {}
+
+    @app.get("/user")
+    async def user_route(current_user: dict = Depends(get_current_user)):
+        return {}
+
+    @app.get("/admin")
+    async def admin_route(current_user: dict = Depends(require_role("admin"))):
+        return {}
+
+    return app
+
+
+async def bench_requests(token: str, requests_total: int):
+    import httpx
+
+    transport = httpx.ASGITransport(app=build_app())
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def run(path: str) -> float:
+            start = time.perf_counter()
+            for _ in range(requests_total):
+                response = await client.get(path, headers=headers)
+                response.raise_for_status()
+            return (time.perf_counter() - start) / requests_total * 1e6
+
+        await run("/open")  # warm-up
+        baseline = await run("/open")
+        print(f"\nper-request latency (µs), {requests_total} sequential requests")
+        print(f"  open route:        {baseline:8.1f}")
+        for cache_size, label in ((0, "cache off"), (auth_jwt.JWT_CACHE_SIZE or 10000, "cache on")):
+            auth_jwt.JWT_CACHE_SIZE = cache_size
+            auth_jwt.claims_cache.clear()
+            for path in ("/user", "/admin"):
+                elapsed = await run(path)
+                print(f"  {path:<7} {label:<10} {elapsed:8.1f}  (auth +{elapsed - baseline:6.1f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auth overhead benchmark")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    token = auth_jwt.create_access_token({"sub": "1", "role": "admin"})
+    bench_decode(token, args.iterations)
+    asyncio.run(bench_requests(token, args.requests))
+
+
+if __name__ == "__main__":
+    main()
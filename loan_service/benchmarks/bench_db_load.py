@@ -0,0 +1,102 @@
+# Benchmark: requests/sec of the loan read endpoints on the sync vs async DB path
+#
+# Each mode runs in its own subprocess (DB_ASYNC is read at import time) and
+# drives the ASGI app in-process with concurrent httpx requests.
+#
+# Run from the loan_service directory:
+#   python -m benchmarks.bench_db_load                                   # SQLite stand-in
+#   python -m benchmarks.bench_db_load --database-url postgresql://u:p@localhost/loans
+#
+# The SQLite stand-in needs `aiosqlite` for the async path.
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Settings that must exist for app.core.config to load outside a deployment
+BENCH_ENV = {
+    "DB_HOST": "localhost",
+    "DB_USER": "bench",
+    "DB_PASSWORD": "bench",
+    "DB_NAME": "bench",
+    "SECRET_KEY": "bench",
+    "aws_region": "local",
+    "aws_secret_name": "local",
+    "user_service_url": "http://localhost",
+}
+
+
+async def drive(requests_total: int, concurrency: int, loans: int) -> float:
+    import httpx
+    from app.main import app
+    from app.db.migrate import upgrade
+    from app.db.session import SessionLocal
+    from app.db.models.loan import Loan
+    from common_libs.auth.jwt import create_access_token
+
+    # The schema is normally migrated by the app's startup hook, which the ASGI
+    # transport doesn't run
+    upgrade()
+
+    # Seed one borrower with a page-worth of loans
+    db = SessionLocal()
+    if not db.query(Loan).filter(Loan.user_id == 1).count():
+        db.add_all(Loan(user_id=1, amount=1000 + i, term_months=12, interest_rate=15.0) for i in range(loans))
+        db.commit()
+    db.close()
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': '1', 'role': 'admin'})}"}
+    transport = httpx.ASGITransport(app=app)
+    queue = asyncio.Queue()
+    for i in range(requests_total):
+        queue.put_nowait("/api/v1/loans/me?limit=20" if i % 2 else "/api/v1/loans/1")
+
+    async def worker(client):
+        while not queue.empty():
+            path = queue.get_nowait()
+            response = await client.get(path, headers=headers)
+            response.raise_for_status()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return requests_total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async DB load benchmark")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--loans", type=int, default=200)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--mode", choices=["sync", "async"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Child process: run one mode and print its throughput
+    if args.mode:
+        rps = asyncio.run(drive(args.requests, args.concurrency, args.loans))
+        print(f"{args.mode:>5}: {rps:8.1f} req/s")
+        return
+
+    # Parent process: run both modes against the same database
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{tmp}/bench.db"
+        print(f"{args.requests} requests, concurrency {args.concurrency}, db {database_url.split('@')[-1]}")
+        for mode in ("sync", "async"):
+            env = {**BENCH_ENV, **os.environ, "DATABASE_URL": database_url, "DB_ASYNC": str(mode == "async")}
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_db_load", "--mode", mode,
+                 "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+                 "--loans", str(args.loans)],
+                env=env,
+                check=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# Benchmark: document upload to S3, old path vs streaming multipart pipeline
+#
+# 1. blocking `upload_fileobj` of a spooled file (what the sync upload_to_s3 does)
+# 2. upload_stream() with parallel parts (common_libs/s3.py), at a few
+#    concurrency levels
+# For each: wall time, throughput and peak Python memory (tracemalloc), and
+# for the pipeline whether the event loop stayed responsive during the transfer
+# (largest gap between 10 ms ticks of a concurrent task).
+#
+# Run from the loan_service directory against an S3-compatible stand-in:
+#   python -m benchmarks.bench_upload --size-mb 50 --endpoint-url http://localhost:9000   # MinIO, ...
+#   python -m benchmarks.bench_upload --size-mb 50                                        # moto server
+#
+# Without --endpoint-url a moto server is started as a child process (pip
+# install "moto[server]"). The bucket is created if missing.
+import argparse
+import asyncio
+import atexit
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+def start_stand_in(port: int) -> str:
+    # Separate process, so the objects it keeps don't count in our memory peak
+    import requests
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "moto.server", "-p", str(port)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    atexit.register(process.kill)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            requests.get(url, timeout=1)
+            return url
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("moto server did not start")
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def report(name: str, size: int, seconds: float, peak: int, extra: str = ""):
+    print(f"  {name:<28} {seconds:6.2f} s  {size / seconds / 2**20:7.1f} MiB/s  peak {peak / 2**20:6.1f} MiB  {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="S3 upload benchmark")
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument("--endpoint-url", default=None)
+    parser.add_argument("--bucket", default="bench-documents")
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    os.environ.setdefault("S3_REGION", "us-east-1")
+    os.environ["S3_ENDPOINT_URL"] = args.endpoint_url or start_stand_in(args.port)
+    os.environ["S3_BUCKET_NAME"] = args.bucket
+    os.environ["S3_MAX_UPLOAD_BYTES"] = str((args.size_mb + 1) * 2**20)
+
+    from common_libs import s3
+
+    client = s3.get_s3_client()
+    try:
+        client.create_bucket(Bucket=args.bucket)
+    except client.exceptions.BucketAlreadyOwnedByYou:
+        pass
+
+    size = args.size_mb * 2**20
+    spooled = tempfile.SpooledTemporaryFile(max_size=2**20)
+    spooled.write(os.urandom(size))
+    print(f"Uploading {args.size_mb} MiB to {os.environ['S3_ENDPOINT_URL']}/{args.bucket}")
+
+    def old_path():
+        spooled.seek(0)
+        client.upload_fileobj(spooled, args.bucket, "bench/old")
+
+    seconds, peak, _ = measure(old_path)
+    report("upload_fileobj (blocking)", size, seconds, peak)
+
+    async def chunks():
+        spooled.seek(0)
+        while True:
+            chunk = spooled.read(2**20)
+            if not chunk:
+                return
+            yield chunk
+            await asyncio.sleep(0)
+
+    async def pipeline(concurrency: int):
+        max_gap = 0.0
+
+        async def ticker():
+            nonlocal max_gap
+            last = time.perf_counter()
+            while True:
+                await asyncio.sleep(0.01)
+                now = time.perf_counter()
+                max_gap = max(max_gap, now - last - 0.01)
+                last = now
+
+        tick = asyncio.ensure_future(ticker())
+        result = await s3.upload_stream(chunks(), f"bench/new-{concurrency}", concurrency=concurrency)
+        tick.cancel()
+        return result, max_gap
+
+    for concurrency in (1, 4, 8):
+        seconds, peak, (result, max_gap) = measure(lambda: asyncio.run(pipeline(concurrency)))
+        report(f"upload_stream x{concurrency}", size, seconds, peak,
+               f"{result['parts']} parts, loop stalled max {max_gap * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# Check: every index added by the migrations is used by the query it exists for
+#
+# Migrates a fresh database to head, seeds loans and audit entries, runs
+# ANALYZE, then EXPLAINs the list/admin/audit queries and checks the plan uses
+# the expected index. Exits non-zero if any query doesn't.
+#
+# Run from the loan_service directory:
+#   python -m benchmarks.explain_indexes                                  # SQLite stand-in
+#   python -m benchmarks.explain_indexes --database-url postgresql://u:p@localhost/loans_check
+#
+# Use an empty, throwaway database: it is migrated and filled with test rows.
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from benchmarks.bench_db_load import BENCH_ENV
+
+
+def seed(loans: int, users: int):
+    from sqlalchemy import insert
+    from app.db.session import engine
+    from app.db.models.loan import Loan
+    from app.db.models.loan_audit_log import LoanAuditLog
+    from app.core.loan_logic import calculate_stored_costs
+
+    rng = random.Random(7)
+    start = datetime(2024, 1, 1)
+    loan_rows = [
+        {
+            "user_id": rng.randrange(users),
+            "amount": rng.uniform(500, 50_000),
+            "term_months": rng.choice([6, 12, 24, 36]),
+            "interest_rate": 15.0,
+            "status": rng.choices(["pending", "approved", "rejected"], [1, 6, 3])[0],
+            "created_at": start + timedelta(minutes=i),
+        }
+        for i in range(loans)
+    ]
+    # Core inserts skip the ORM events that fill in the stored payment columns
+    costs = calculate_stored_costs(
+        [row["amount"] for row in loan_rows], [row["term_months"] for row in loan_rows], [15.0] * loans
+    )
+    for row, (payment, total_cost) in zip(loan_rows, costs):
+        row["monthly_payment"], row["total_cost"] = payment, total_cost
+    audit_rows = [
+        {
+            "loan_id": i + 1,
+            "action": "approved",
+            "actor_id": rng.randrange(20),
+            "timestamp": start + timedelta(minutes=i, seconds=30),
+        }
+        for i in range(loans)
+    ]
+    with engine.begin() as connection:
+        connection.execute(insert(Loan), loan_rows)
+        connection.execute(insert(LoanAuditLog), audit_rows)
+        connection.exec_driver_sql("ANALYZE")
+
+
+def checks():
+    # (description, query, index the plan should use)
+    from sqlalchemy import select
+    from app.db.models.loan import Loan
+    from app.db.models.loan_audit_log import LoanAuditLog
+
+    since = datetime(2024, 1, 10)
+    return [
+        (
+            "user's loans, newest first (default /me page)",
+            select(Loan).where(Loan.user_id == 7).order_by(Loan.created_at.desc(), Loan.id.desc()).limit(20),
+            "ix_loans_user_id_created_at_id",
+        ),
+        (
+            "user's loans by amount",
+            select(Loan).where(Loan.user_id == 7).order_by(Loan.amount.asc(), Loan.id.asc()).limit(20),
+            "ix_loans_user_id_amount_id",
+        ),
+        (
+            "user's loans by monthly payment",
+            select(Loan).where(Loan.user_id == 7).order_by(Loan.monthly_payment.desc(), Loan.id.desc()).limit(20),
+            "ix_loans_user_id_monthly_payment_id",
+        ),
+        (
+            "user's loans with a status, newest first",
+            select(Loan)
+            .where(Loan.user_id == 7, Loan.status == "pending")
+            .order_by(Loan.created_at.desc(), Loan.id.desc())
+            .limit(20),
+            "ix_loans_user_id_status_created_at_id",
+        ),
+        (
+            "pending loans created after a date (admin queue)",
+            select(Loan).where(Loan.status == "pending", Loan.created_at >= since).order_by(Loan.created_at).limit(50),
+            "ix_loans_status_created_at",
+        ),
+        (
+            "audit history of one loan",
+            select(LoanAuditLog).where(LoanAuditLog.loan_id == 123).order_by(LoanAuditLog.timestamp),
+            "ix_loan_audit_log_loan_id_timestamp",
+        ),
+        (
+            "recent actions of one admin",
+            select(LoanAuditLog).where(LoanAuditLog.actor_id == 3).order_by(LoanAuditLog.timestamp.desc()).limit(50),
+            "ix_loan_audit_log_actor_id_timestamp",
+        ),
+    ]
+
+
+def explain(connection, query) -> str:
+    sql = str(query.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN QUERY PLAN " if connection.dialect.name == "sqlite" else "EXPLAIN "
+    rows = connection.exec_driver_sql(prefix + sql).fetchall()
+    return "\n".join(str(row[-1]) for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN-based index check")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--loans", type=int, default=50_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    for key, value in BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tmp.name}/explain.db"
+
+    from app.db.migrate import upgrade
+    from app.db.session import engine
+
+    upgrade()
+    seed(args.loans, args.users)
+
+    failures = 0
+    with engine.connect() as connection:
+        for description, query, index in checks():
+            plan = explain(connection, query)
+            ok = index in plan
+            failures += not ok
+            print(f"{'OK  ' if ok else 'FAIL'} {description}: expects {index}")
+            if not ok:
+                print("     " + plan.replace("\n", "\n     "))
+
+    engine.dispose()
+    tmp.cleanup()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
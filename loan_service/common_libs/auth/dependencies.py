@@ -5,7 +5,9 @@ from common_libs.auth.jwt import decode_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")  # tokenUrl is required by FastAPI
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+# async so FastAPI calls it on the event loop instead of the threadpool:
+# decoding is a cache lookup for tokens seen before (see auth/jwt.py)
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
         payload = decode_token(token)
         user_id = payload.get("sub")
@@ -1,10 +1,27 @@
+import hashlib
+import os
+import time
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
+from common_libs.cache import InMemoryCache
 
 SECRET_KEY = "your-secret-key"  # use env variable in real deployment
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# JWT library used to verify tokens:
+# - "jose"  (default) python-jose
+# - "pyjwt" PyJWT, noticeably cheaper per decode; imported only when selected
+JWT_BACKEND = os.getenv("JWT_BACKEND", "jose").lower()
+
+# Verified-claims cache: a token is fully verified once, then its claims are
+# served from memory (keyed by the token's SHA-256) until the token expires.
+# JWT_CACHE_MAX_TTL caps how long an entry lives; JWT_CACHE_SIZE=0 disables it.
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+JWT_CACHE_MAX_TTL = float(os.getenv("JWT_CACHE_MAX_TTL", "300"))
+
+claims_cache = InMemoryCache(max_size=JWT_CACHE_SIZE)
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
@@ -12,5 +29,35 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def decode_token(token: str):
+def _decode_jose(token: str) -> dict:
     return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+def _decode_pyjwt(token: str) -> dict:
+    import jwt as pyjwt  # optional dependency (PyJWT)
+
+    try:
+        return pyjwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except pyjwt.PyJWTError as e:
+        # Callers only handle jose's error type, whichever backend is used
+        raise JWTError(str(e))
+
+_BACKENDS = {"jose": _decode_jose, "pyjwt": _decode_pyjwt}
+if JWT_BACKEND not in _BACKENDS:
+    raise ValueError(f"Unknown JWT_BACKEND: {JWT_BACKEND}")
+verify_token = _BACKENDS[JWT_BACKEND]
+
+def decode_token(token: str):
+    if JWT_CACHE_SIZE <= 0:
+        return verify_token(token)
+
+    key = hashlib.sha256(token.encode()).hexdigest()
+    claims = claims_cache.get(key)
+    if claims is None:
+        claims = verify_token(token)  # raises JWTError; failures are never cached
+        exp = claims.get("exp")
+        if exp is not None:
+            ttl = min(float(exp) - time.time(), JWT_CACHE_MAX_TTL)
+            if ttl > 0:
+                claims_cache.set(key, claims, ttl)
+    # Copy so callers can't alter the cached claims
+    return dict(claims)
@@ -2,7 +2,7 @@ from fastapi import Depends, HTTPException, status
 from common_libs.auth.dependencies import get_current_user
 
 def require_role(required_role: str):
-    def role_checker(current_user: dict = Depends(get_current_user)):
+    async def role_checker(current_user: dict = Depends(get_current_user)):
         if current_user.get("role") != required_role:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -12,7 +12,7 @@ def require_role(required_role: str):
     return role_checker
 
 def require_roles(*allowed_roles: str):
-    def role_checker(current_user: dict = Depends(get_current_user)):
+    async def role_checker(current_user: dict = Depends(get_current_user)):
         if current_user.get("role") not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
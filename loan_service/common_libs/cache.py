@@ -0,0 +1,101 @@
+# common_libs/cache.py
+# Small key/value caches with per-entry TTL.
+#
+# Backends share one interface (get / set / delete) so callers can swap the
+# in-process cache for a shared one (Redis) through configuration:
+# - InMemoryCache: TTL + LRU eviction, per process; also the stand-in for tests
+# - RedisCache:    shared across processes/pods, `redis` is imported lazily
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: float):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+
+class InMemoryCache(CacheBackend):
+    # Thread-safe TTL cache; the least recently used entry is evicted once
+    # `max_size` is reached
+    def __init__(self, max_size: int = 10_000, clock=time.monotonic):
+        self.max_size = max_size
+        self._clock = clock
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._data[key] = (self._clock() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCache(CacheBackend):
+    def __init__(self, url: str, prefix: str = "cache:"):
+        import redis  # optional dependency, only needed for the shared backend
+
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+        self._prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        return self._client.get(self._prefix + key)
+
+    def set(self, key: str, value: str, ttl: float):
+        self._client.set(self._prefix + key, value, px=max(int(ttl * 1000), 1))
+
+    def delete(self, key: str):
+        self._client.delete(self._prefix + key)
+
+    def clear(self):
+        for key in self._client.scan_iter(self._prefix + "*"):
+            self._client.delete(key)
+
+
+def cache_from_env(prefix: str, max_size: int = 10_000) -> CacheBackend:
+    # <PREFIX>_CACHE_BACKEND=memory (default) or redis, with <PREFIX>_CACHE_REDIS_URL
+    backend = os.getenv(f"{prefix}_CACHE_BACKEND", "memory").lower()
+    if backend == "redis":
+        url = os.getenv(f"{prefix}_CACHE_REDIS_URL", "redis://localhost:6379/0")
+        return RedisCache(url, prefix=f"{prefix.lower()}:")
+    return InMemoryCache(max_size=int(os.getenv(f"{prefix}_CACHE_MAX_SIZE", str(max_size))))
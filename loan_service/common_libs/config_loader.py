@@ -0,0 +1,237 @@
+# common_libs/config_loader.py
+# Shared loader for secrets/settings with a local on-disk cache.
+#
+# Providers (SETTINGS_PROVIDER):
+# - "aws"   AWS Secrets Manager; boto3 is imported on first fetch only
+# - "local" stand-in for Secrets Manager: a JSON file mapping secret names to
+#           their key/value pairs (LOCAL_SECRETS_FILE), for dev and tests
+# - "file"  one JSON file of key/value pairs (SETTINGS_FILE)
+# - "env"   nothing to fetch, settings come from the environment only
+#
+# Fetched values are cached on disk so a booting worker doesn't wait on the
+# network:
+# - fresh cache (younger than SETTINGS_CACHE_TTL): used as is
+# - stale cache: used immediately, refreshed in a background thread for the
+#   next worker that boots (this process keeps the values it started with)
+# - cache older than SETTINGS_CACHE_MAX_STALE, or no cache: fetched synchronously
+# The cache holds secrets, so it is only used when:
+# - SETTINGS_CACHE_KEY (a Fernet key, needs the cryptography package) is set:
+#   the file is always encrypted, and without a key there is no disk cache at
+#   all. A key that can't be used (malformed, cryptography missing) is
+#   reported once at startup and also means no disk cache
+# - its directory and file belong to the service user and nobody else can
+#   read or write them (0700 / 0600); anything else is ignored, never trusted
+# The default directory is under the service user's home (XDG_CACHE_HOME),
+# not the shared temp directory. Cache problems never stop a service from
+# booting: an unreadable or unwritable cache is logged and skipped.
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+_DEFAULT_CACHE_ROOT = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+CACHE_DIR = os.getenv("SETTINGS_CACHE_DIR", os.path.join(_DEFAULT_CACHE_ROOT, "cashloan-settings"))
+CACHE_TTL = float(os.getenv("SETTINGS_CACHE_TTL", "300"))  # 0 disables the disk cache
+CACHE_MAX_STALE = float(os.getenv("SETTINGS_CACHE_MAX_STALE", "86400"))  # oldest cache ever served
+CACHE_KEY = os.getenv("SETTINGS_CACHE_KEY")
+
+
+class InsecureCacheError(Exception):
+    pass
+
+
+def _check_private(path: str, mode_mask: int):
+    # Owned by us and no group/other permission bits (mode_mask: 0o077)
+    info = os.lstat(path)
+    if stat.S_ISLNK(info.st_mode):
+        raise InsecureCacheError(f"{path} is a symlink")
+    if hasattr(os, "getuid") and info.st_uid != os.getuid():
+        raise InsecureCacheError(f"{path} is owned by uid {info.st_uid}, not {os.getuid()}")
+    if info.st_mode & mode_mask:
+        raise InsecureCacheError(f"{path} has mode {stat.S_IMODE(info.st_mode):o}")
+
+
+# ----------------------------------------
+# Providers
+# ----------------------------------------
+class SettingsProvider(ABC):
+    name = "provider"
+
+    @abstractmethod
+    def fetch(self) -> dict:
+        ...
+
+
+class EnvProvider(SettingsProvider):
+    name = "env"
+
+    def fetch(self) -> dict:
+        return {}
+
+
+class FileProvider(SettingsProvider):
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def fetch(self) -> dict:
+        with open(self.path) as f:
+            return json.load(f)
+
+
+class LocalSecretsManagerProvider(SettingsProvider):
+    name = "local"
+
+    def __init__(self, secret_name: str, path: str):
+        self.secret_name = secret_name
+        self.path = path
+
+    def fetch(self) -> dict:
+        with open(self.path) as f:
+            secrets = json.load(f)
+        if self.secret_name not in secrets:
+            raise KeyError(f"Secret {self.secret_name} not found in {self.path}")
+        return secrets[self.secret_name]
+
+
+class AWSSecretsManagerProvider(SettingsProvider):
+    name = "aws"
+
+    def __init__(self, secret_name: str, region_name: str):
+        self.secret_name = secret_name
+        self.region_name = region_name
+
+    def fetch(self) -> dict:
+        import boto3  # heavy import, only paid when the secret is actually fetched
+
+        client = boto3.client("secretsmanager", region_name=self.region_name)
+        response = client.get_secret_value(SecretId=self.secret_name)
+        return json.loads(response["SecretString"])
+
+
+def provider_from_env(secret_name: Optional[str] = None, region_name: Optional[str] = None,
+                      default: str = "aws") -> SettingsProvider:
+    # AWS_SECRET_NAME / AWS_REGION override the service's defaults
+    secret_name = os.getenv("AWS_SECRET_NAME", secret_name)
+    region_name = os.getenv("AWS_REGION", region_name)
+    kind = os.getenv("SETTINGS_PROVIDER", default).lower()
+    if kind == "aws":
+        return AWSSecretsManagerProvider(secret_name, region_name)
+    if kind == "local":
+        return LocalSecretsManagerProvider(secret_name, os.getenv("LOCAL_SECRETS_FILE", "local_secrets.json"))
+    if kind == "file":
+        return FileProvider(os.getenv("SETTINGS_FILE", "settings.json"))
+    if kind == "env":
+        return EnvProvider()
+    raise ValueError(f"Unknown SETTINGS_PROVIDER: {kind}")
+
+
+# ----------------------------------------
+# Loader with disk cache and background refresh
+# ----------------------------------------
+class SettingsLoader:
+    def __init__(self, provider: SettingsProvider, cache_name: str, cache_dir: str = CACHE_DIR,
+                 ttl: float = CACHE_TTL, cache_key: Optional[str] = CACHE_KEY,
+                 max_stale: float = CACHE_MAX_STALE):
+        self.provider = provider
+        # One cache file per service and provider, so switching providers never reads old values
+        self.cache_path = os.path.join(cache_dir, f"{cache_name}-{provider.name}.json")
+        # Secrets never go to disk unencrypted: no (usable) key, no disk cache
+        self._cipher = self._make_cipher(cache_key) if cache_key else None
+        self.ttl = ttl if self._cipher is not None else 0
+        self.max_stale = max(max_stale, self.ttl)
+        self.values = {}
+        self.loaded_at = None
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+
+    # Values for the service, see the module comment for the cache rules
+    def load(self) -> dict:
+        if isinstance(self.provider, EnvProvider):
+            return self.values
+
+        cached = self._read_cache() if self.ttl > 0 else None
+        if cached is not None and cached[1] < self.max_stale:
+            values, age = cached
+            self.values = values
+            self.loaded_at = time.time() - age
+            if age >= self.ttl:
+                self.refresh_in_background()
+            return self.values
+
+        return self.refresh()
+
+    def get(self, key: str, default=None):
+        return self.values.get(key, default)
+
+    # Fetch from the provider now and update the cache
+    def refresh(self) -> dict:
+        values = self.provider.fetch()
+        with self._lock:
+            self.values = values
+            self.loaded_at = time.time()
+        if self.ttl > 0:
+            self._write_cache(values)
+        return values
+
+    def refresh_in_background(self):
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+        self._refresh_thread = threading.Thread(target=self._safe_refresh, name="settings-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def _safe_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            # Keep serving the last known values
+            print(f"Settings refresh from {self.provider.name} failed: {e}")
+
+    # -- disk cache --
+    def _make_cipher(self, cache_key: str):
+        # Checked once here, so a bad key can't fail a load() later on
+        try:
+            from cryptography.fernet import Fernet  # only imported when a cache key is set
+
+            return Fernet(cache_key.encode())
+        except ImportError:
+            print("SETTINGS_CACHE_KEY is set but cryptography is not installed: settings cache disabled")
+        except (ValueError, TypeError) as e:
+            print(f"SETTINGS_CACHE_KEY is not a valid Fernet key ({e}): settings cache disabled")
+        return None
+
+    def _read_cache(self):
+        try:
+            _check_private(os.path.dirname(self.cache_path), 0o077)
+            _check_private(self.cache_path, 0o077)
+            with open(self.cache_path, "rb") as f:
+                data = f.read()
+            age = time.time() - os.path.getmtime(self.cache_path)
+            # Decryption also authenticates the file: a planted cache fails here
+            data = self._cipher.decrypt(data)
+            return json.loads(data), age
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Ignoring unreadable settings cache {self.cache_path}: {str(e) or type(e).__name__}")
+            return None
+
+    def _write_cache(self, values: dict):
+        try:
+            directory = os.path.dirname(self.cache_path)
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            _check_private(directory, 0o077)  # don't write into a directory someone else controls
+            data = self._cipher.encrypt(json.dumps(values).encode())
+            # Write to a private temp file, then atomically replace the cache
+            fd, tmp_path = tempfile.mkstemp(dir=directory)  # created with mode 0600
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            # The fetched values are still used, there is just no cache for the next boot
+            print(f"Could not write settings cache {self.cache_path}: {str(e) or type(e).__name__}")
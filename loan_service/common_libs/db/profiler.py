@@ -0,0 +1,229 @@
+# common_libs/db/profiler.py
+# Per-request SQL profiler for development (SQL_PROFILE=true; off by default).
+#
+# Hooks before/after_cursor_execute on the service's engines, i.e. everything
+# run through the sessions that get_db / get_read_db hand out, and for every
+# request:
+# - records each statement with its duration (and where it came from: the
+#   first frame in the service's own code)
+# - flags N+1 patterns: the same statement run SQL_PROFILE_REPEAT_THRESHOLD
+#   times or more in one request, with different parameters (a query in a loop)
+#   or identical ones (a result that should have been reused)
+# - logs statements slower than SQL_PROFILE_SLOW_MS with their EXPLAIN plan
+#
+# Output:
+# - response headers: X-SQL-Queries, X-SQL-Time-Ms, X-SQL-Repeated, and
+#   Server-Timing (shown by the browser dev tools next to the request)
+# - a warning on stdout for requests with N+1 patterns or slow statements
+# - GET /internal/sql-profile: the last SQL_PROFILE_KEEP requests in full
+#   (statements, timings, flags; needs the internal service token like the
+#   other /internal endpoints), plus one JSON line per request in
+#   SQL_PROFILE_REPORT_FILE when it is set
+#
+# Statements run while a streaming response is being sent (e.g. the export)
+# are in the report but not in the headers, which are already gone by then.
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Dict, Optional
+
+from fastapi import Depends, FastAPI
+from sqlalchemy import event
+
+from common_libs.auth.internal import require_internal_token
+
+SQL_PROFILE = os.getenv("SQL_PROFILE", "false").lower() == "true"
+SLOW_MS = float(os.getenv("SQL_PROFILE_SLOW_MS", "100"))
+REPEAT_THRESHOLD = int(os.getenv("SQL_PROFILE_REPEAT_THRESHOLD", "3"))
+EXPLAIN_SLOW = os.getenv("SQL_PROFILE_EXPLAIN", "true").lower() == "true"
+KEEP = int(os.getenv("SQL_PROFILE_KEEP", "50"))
+REPORT_FILE = os.getenv("SQL_PROFILE_REPORT_FILE")
+
+# Frames in these paths (and generated code, "<...>") are skipped when looking
+# for the statement's origin
+_LIBRARY_PATHS = ("site-packages", "dist-packages", os.path.dirname(os.__file__), os.path.join("common_libs", "db"))
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.time()
+        self.statements = []  # dicts: sql, params, ms, origin, engine, plan
+        self._lock = threading.Lock()
+
+    def add(self, entry: dict):
+        with self._lock:
+            self.statements.append(entry)
+
+    def summary(self) -> dict:
+        with self._lock:
+            statements = list(self.statements)
+        by_sql = Counter(s["sql"] for s in statements)
+        by_call = Counter((s["sql"], s["params"]) for s in statements)
+        repeated = []
+        for sql, count in by_sql.items():
+            if count >= REPEAT_THRESHOLD:
+                identical = max(n for (other, _), n in by_call.items() if other == sql)
+                origins = sorted({s["origin"] for s in statements if s["sql"] == sql})
+                repeated.append({
+                    "sql": sql,
+                    "count": count,
+                    "kind": "identical" if identical >= REPEAT_THRESHOLD else "n+1",
+                    "origins": origins,
+                })
+        return {
+            "method": self.method,
+            "path": self.path,
+            "started": self.started,
+            "queries": len(statements),
+            "total_ms": round(sum(s["ms"] for s in statements), 3),
+            "repeated": repeated,
+            "slow": [s for s in statements if s["ms"] >= SLOW_MS],
+            "statements": statements,
+        }
+
+
+current_profile = contextvars.ContextVar("sql_profile", default=None)
+recent_profiles = deque(maxlen=KEEP)
+_report_lock = threading.Lock()
+
+
+def _origin() -> str:
+    # First frame outside SQLAlchemy, the stdlib and this module: the service
+    # code (service function, endpoint) that issued the statement
+    for frame in reversed(traceback.extract_stack(sys._getframe(2), limit=60)):
+        if not frame.filename.startswith("<") and not any(part in frame.filename for part in _LIBRARY_PATHS):
+            return f"{os.path.relpath(frame.filename)}:{frame.lineno} ({frame.name})"
+    return "?"
+
+
+def _explain(conn, statement: str, parameters) -> Optional[str]:
+    # EXPLAIN (without ANALYZE: the statement is planned, not run again) on
+    # the same connection, so it sees the same transaction
+    if not statement.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")):
+        return None
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return "\n".join(" ".join(str(col) for col in row) for row in cursor.fetchall())
+    except Exception as e:
+        return f"EXPLAIN failed: {e}"
+    finally:
+        cursor.close()
+
+
+def profile_engine(engine, name: str = "primary"):
+    # Pass `async_engine.sync_engine` for an async engine
+    if getattr(engine, "_sql_profiled", False):
+        return
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_profile.get() is not None:
+            conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = current_profile.get()
+        started = conn.info.get("profile_started")
+        if profile is None or not started:
+            return
+        ms = (time.perf_counter() - started.pop()) * 1000
+        entry = {
+            "sql": statement,
+            "params": repr(parameters)[:500],
+            "ms": round(ms, 3),
+            "engine": name,
+            "executemany": executemany,
+            "origin": _origin(),
+            "plan": None,
+        }
+        if ms >= SLOW_MS and EXPLAIN_SLOW and not executemany:
+            entry["plan"] = _explain(conn, statement, parameters)
+        profile.add(entry)
+
+    def handle_error(context):
+        # A failed statement never reaches after_cursor_execute
+        connection = context.connection
+        if connection is not None and connection.info.get("profile_started"):
+            connection.info["profile_started"].pop()
+
+    # Registered after the metrics listeners, so EXPLAIN isn't counted in the query time
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+    engine._sql_profiled = True
+
+
+def _report(summary: dict):
+    label = f"{summary['method']} {summary['path']}"
+    for item in summary["repeated"]:
+        print(f"🔁 SQL {item['kind']} on {label}: {item['count']}x from {', '.join(item['origins'])}\n    {item['sql']}")
+    for item in summary["slow"]:
+        print(f"🐢 Slow SQL on {label}: {item['ms']:.1f} ms from {item['origin']}\n    {item['sql']}")
+        if item["plan"]:
+            print("    " + item["plan"].replace("\n", "\n    "))
+    recent_profiles.append(summary)
+    if REPORT_FILE:
+        with _report_lock, open(REPORT_FILE, "a") as f:
+            f.write(json.dumps(summary, default=str) + "\n")
+
+
+class SQLProfilerMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(("/internal/", "/metrics")):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        token = current_profile.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                summary = profile.summary()
+                server_timing = f'db;dur={summary["total_ms"]:.1f};desc="{summary["queries"]} queries"'
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-sql-queries", str(summary["queries"]).encode()),
+                    (b"x-sql-time-ms", f'{summary["total_ms"]:.1f}'.encode()),
+                    (b"x-sql-repeated", str(len(summary["repeated"])).encode()),
+                    (b"server-timing", server_timing.encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+            _report(profile.summary())
+
+
+def install_sql_profiler(app: FastAPI, engines: Optional[Dict[str, object]] = None, replicas=None):
+    # No-op unless SQL_PROFILE=true: never enable it in production (it keeps
+    # statements and parameters in memory and exposes them on an endpoint)
+    if not SQL_PROFILE:
+        return
+    engines = dict(engines or {})
+    for i, replica in enumerate(replicas.replicas if replicas is not None else []):
+        engines[f"replica{i}"] = replica.engine
+        engines[f"replica{i}_async"] = replica.async_engine
+    for name, engine in engines.items():
+        if engine is not None:
+            profile_engine(getattr(engine, "sync_engine", engine), name)
+    app.add_middleware(SQLProfilerMiddleware)
+
+    @app.get("/internal/sql-profile", include_in_schema=False, dependencies=[Depends(require_internal_token)])
+    def get_sql_profiles(limit: int = 20, only_flagged: bool = False):
+        profiles = list(recent_profiles)
+        if only_flagged:
+            profiles = [p for p in profiles if p["repeated"] or p["slow"]]
+        return list(reversed(profiles))[:limit]
+
+    print("🔬 SQL profiler enabled (SQL_PROFILE=true): see /internal/sql-profile")
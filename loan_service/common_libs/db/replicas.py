@@ -0,0 +1,176 @@
+# common_libs/db/replicas.py
+# Read-replica routing shared by the services' session.py
+#
+# - ReplicaSet holds an engine (and session factory) per URL in DB_REPLICA_URLS
+# - a background thread checks every replica each DB_REPLICA_CHECK_INTERVAL
+#   seconds: it must answer, and on PostgreSQL replay lag must stay under
+#   DB_REPLICA_MAX_LAG; a replica whose connections fail is taken out at once
+# - reads are spread round-robin over the healthy replicas and fall back to the
+#   primary when there are none (or before the first check has passed)
+# - read-your-writes: a write request marks its client (Authorization header,
+#   else client address) for DB_READ_YOUR_WRITES_SECONDS, and that client's
+#   reads go to the primary meanwhile. Clients can also send
+#   `X-Read-Consistency: strong` to read from the primary.
+#   The marks live in the READ_YOUR_WRITES cache (common_libs/cache.py); use
+#   READ_YOUR_WRITES_CACHE_BACKEND=redis when a client's requests can land on
+#   different pods.
+import hashlib
+import itertools
+import threading
+import time
+from typing import Callable, List, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from common_libs.cache import cache_from_env
+from common_libs.db.pool import PoolMetrics, instrumented_pool_class
+
+# Methods that don't change anything; every other request counts as a write
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Seconds since the replica last replayed a transaction, or 0 when it has
+# replayed everything it received (an idle primary doesn't mean a lagging replica)
+PG_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+def replica_urls(value) -> List[str]:
+    # DB_REPLICA_URLS is a comma-separated list (empty = no replicas)
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [url.strip() for url in value if url.strip()]
+
+
+class Replica:
+    def __init__(self, url: str, engine_options: dict, async_url: Optional[Callable] = None):
+        self.url = url
+        self.healthy = False  # until the first check passes
+        self.lag = None
+        self.last_error = None
+        self.checked_at = None
+
+        self.metrics = PoolMetrics()
+        self.engine = create_engine(url, poolclass=instrumented_pool_class(self.metrics), **engine_options)
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        event.listen(self.engine, "handle_error", self._on_error)
+
+        self.async_metrics = None
+        self.async_engine = None
+        self.AsyncSessionLocal = None
+        if async_url is not None:
+            self.async_metrics = PoolMetrics()
+            self.async_engine = create_async_engine(
+                async_url(url),
+                poolclass=instrumented_pool_class(self.async_metrics, AsyncAdaptedQueuePool),
+                **engine_options,
+            )
+            self.AsyncSessionLocal = async_sessionmaker(bind=self.async_engine, autoflush=False, expire_on_commit=False)
+            event.listen(self.async_engine.sync_engine, "handle_error", self._on_error)
+
+    def _on_error(self, context):
+        # Lost connection: stop routing here until the next check succeeds
+        if context.is_disconnect:
+            self.healthy = False
+            self.last_error = str(context.original_exception)
+
+    def check(self, max_lag: float):
+        try:
+            with self.engine.connect() as connection:
+                if connection.dialect.name == "postgresql":
+                    self.lag = float(connection.exec_driver_sql(PG_LAG_SQL).scalar())
+                else:
+                    connection.exec_driver_sql("SELECT 1")
+                    self.lag = 0.0
+            self.healthy = self.lag <= max_lag
+            self.last_error = None if self.healthy else f"replication lag {self.lag:.1f}s > {max_lag}s"
+        except Exception as e:
+            self.healthy = False
+            self.last_error = str(e)
+        self.checked_at = time.time()
+
+    def status(self) -> dict:
+        status = {
+            "url": make_url(self.url).render_as_string(hide_password=True),
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "last_error": self.last_error,
+            "checked_at": self.checked_at,
+            "sync": self.metrics.snapshot(self.engine.pool),
+        }
+        if self.async_engine is not None:
+            status["async"] = self.async_metrics.snapshot(self.async_engine.sync_engine.pool)
+        return status
+
+
+class ReplicaSet:
+    def __init__(self, urls, engine_options: dict, async_url: Optional[Callable] = None,
+                 max_lag: float = 5.0, check_interval: float = 5.0, read_your_writes: float = 10.0):
+        self.replicas = [Replica(url, engine_options, async_url) for url in replica_urls(urls)]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.read_your_writes = read_your_writes
+        self.recent_writers = cache_from_env("READ_YOUR_WRITES")
+        self._counter = itertools.count()
+        self._thread = None
+
+    # -- health checks --
+    def check(self):
+        for replica in self.replicas:
+            replica.check(self.max_lag)
+
+    def start_health_checks(self):
+        if not self.replicas or self._thread is not None:
+            return
+
+        def loop():
+            while True:
+                self.check()
+                time.sleep(self.check_interval)
+
+        self._thread = threading.Thread(target=loop, name="replica-health", daemon=True)
+        self._thread.start()
+
+    # -- read-your-writes --
+    @staticmethod
+    def _client_key(request) -> Optional[str]:
+        credentials = request.headers.get("authorization")
+        if credentials:
+            return hashlib.sha256(credentials.encode()).hexdigest()
+        return f"addr:{request.client.host}" if request.client else None
+
+    def note_request(self, request):
+        # Called for every request that uses the primary session
+        if not self.replicas or self.read_your_writes <= 0 or request.method in SAFE_METHODS:
+            return
+        key = self._client_key(request)
+        if key:
+            self.recent_writers.set(key, "1", self.read_your_writes)
+
+    def _needs_primary(self, request) -> bool:
+        if request.headers.get("x-read-consistency", "").lower() == "strong":
+            return True
+        key = self._client_key(request)
+        return bool(key) and self.recent_writers.get(key) is not None
+
+    # -- routing --
+    def pick(self, request=None) -> Optional[Replica]:
+        # A healthy replica for this read, or None to use the primary
+        if not self.replicas or (request is not None and self._needs_primary(request)):
+            return None
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    def status(self) -> list:
+        return [replica.status() for replica in self.replicas]
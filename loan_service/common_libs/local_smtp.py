@@ -0,0 +1,126 @@
+# common_libs/local_smtp.py
+# Local stand-in for an SMTP server, for dev and tests (like the "local"
+# settings provider stands in for Secrets Manager).
+#
+# Speaks just enough SMTP for smtplib (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP,
+# QUIT), keeps every received message in memory and counts connections, so a
+# test can check what was sent and that sessions were reused:
+#
+#     server = LocalSMTPServer().start()           # random free port
+#     os.environ.update(NOTIFY_TRANSPORT="smtp", SMTP_HOST="127.0.0.1", SMTP_PORT=str(server.port))
+#     ...
+#     server.messages[0]["To"], server.connections
+#     server.stop()
+#
+# Recipients in `reject` get a 550 (permanent failure). For local runs:
+#   python -m common_libs.local_smtp --port 1025   # prints each message
+import argparse
+import email
+import socketserver
+import threading
+import time
+from email import policy
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server.owner
+        with server.lock:
+            server.connections += 1
+        self._reply("220 local-smtp ready")
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode(errors="replace").strip().partition(" ")
+            command = command.upper()
+            if command in ("EHLO", "HELO"):
+                self._reply("250 local-smtp")
+            elif command == "MAIL":
+                sender, recipients = argument.partition(":")[2].strip(" <>"), []
+                self._reply("250 OK")
+            elif command == "RCPT":
+                recipient = argument.partition(":")[2].strip(" <>")
+                if recipient in server.reject:
+                    self._reply("550 No such user")
+                else:
+                    recipients.append(recipient)
+                    self._reply("250 OK")
+            elif command == "DATA":
+                if not recipients:
+                    self._reply("503 Need RCPT first")
+                    continue
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for raw in iter(self.rfile.readline, b""):
+                    if raw in (b".\r\n", b".\n"):
+                        break
+                    data.append(raw[1:] if raw.startswith(b"..") else raw)
+                message = email.message_from_bytes(b"".join(data), policy=policy.default)
+                server.received(sender, recipients, message)
+                sender, recipients = None, []
+                self._reply("250 OK queued")
+            elif command == "RSET":
+                sender, recipients = None, []
+                self._reply("250 OK")
+            elif command == "NOOP":
+                self._reply("250 OK")
+            elif command == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class LocalSMTPServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, reject=(), echo: bool = False):
+        self.messages = []      # email.message.EmailMessage, in arrival order
+        self.envelopes = []     # (sender, [recipients]) per message
+        self.connections = 0
+        self.reject = set(reject)
+        self.echo = echo
+        self.lock = threading.Lock()
+        self._server = _ThreadingServer((host, port), _SMTPHandler)
+        self._server.owner = self
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = None
+
+    def received(self, sender: str, recipients: list, message):
+        with self.lock:
+            self.messages.append(message)
+            self.envelopes.append((sender, recipients))
+        if self.echo:
+            print(f"📬 {sender} -> {', '.join(recipients)}: {message['Subject']}")
+            print(message.get_content())
+
+    def start(self) -> "LocalSMTPServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="local-smtp", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local SMTP stand-in that prints received emails")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+    server = LocalSMTPServer(args.host, args.port, echo=True).start()
+    print(f"Local SMTP server listening on {server.host}:{server.port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
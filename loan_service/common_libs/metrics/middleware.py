@@ -0,0 +1,151 @@
+# common_libs/metrics/middleware.py
+# Request metrics for the FastAPI services, and the /metrics endpoint.
+#
+#     install_metrics(app, "loan_service", engines={"primary": engine}, replicas=replicas,
+#                     pool_status=pool_status)
+#
+# - http_request_duration_seconds  latency per method, route template and operation_id
+# - http_requests_total            responses per method, route and status code
+# - http_request_exceptions_total  unhandled exceptions per route and exception type
+# - http_request_db_queries / http_request_db_seconds
+#                                  SQL statements and SQL time per request (sql.py)
+# - db_pool                        connection pool usage, from the service's pool_status()
+# - http_client_*                  outbound calls, recorded by common_libs/http_client.py
+#
+# Routes are labelled with their template ("/api/v1/loans/{loan_id}"), never
+# the raw path, and requests that match no route share the "unmatched" label,
+# so label cardinality stays bounded. METRICS_ENABLED=false turns it all off.
+# The endpoint requires the shared service token (common_libs/auth/internal.py);
+# in a Prometheus scrape config, pass it as `authorization: {credentials: ...}`.
+import os
+import time
+from typing import Callable, Dict, Optional
+
+from fastapi import Depends, FastAPI
+from fastapi.responses import PlainTextResponse
+
+from common_libs.auth.internal import require_internal_token
+
+from common_libs.metrics.registry import Gauge, registry
+from common_libs.metrics.sql import RequestStats, current_request_stats, instrument_engine
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")
+
+REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "Request latency", ["service", "method", "route", "operation_id"]
+)
+REQUESTS = registry.counter("http_requests_total", "Requests handled", ["service", "method", "route", "status"])
+EXCEPTIONS = registry.counter(
+    "http_request_exceptions_total", "Unhandled exceptions", ["service", "route", "exception"]
+)
+REQUEST_QUERIES = registry.histogram(
+    "http_request_db_queries", "SQL statements per request", ["service", "route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+REQUEST_DB_SECONDS = registry.histogram("http_request_db_seconds", "SQL time per request", ["service", "route"])
+
+
+def _route_template(scope, route) -> str:
+    path, template = scope["path"], getattr(route, "path", "unmatched")
+    regex = getattr(route, "path_regex", None)
+    if regex is None or regex.match(path):
+        return template
+    # Newer FastAPI versions report routes of an included router relative to
+    # its prefix: put back the (static) prefix the route's pattern didn't match
+    for i, char in enumerate(path):
+        if char == "/" and i > 0 and regex.match(path[i:]):
+            return path[:i] + template
+    return template
+
+
+def _route_labels(scope) -> tuple:
+    route = scope.get("route")
+    if route is None:
+        return "unmatched", ""
+    operation_id = getattr(route, "operation_id", None) or getattr(route, "unique_id", None) or getattr(route, "name", "")
+    return _route_template(scope, route), operation_id
+
+
+class MetricsMiddleware:
+    # Plain ASGI middleware: times the whole request, streaming bodies included
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == METRICS_PATH:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            route, _ = _route_labels(scope)
+            EXCEPTIONS.inc(service=self.service, route=route, exception=type(e).__name__)
+            raise
+        finally:
+            current_request_stats.reset(token)
+            elapsed = time.perf_counter() - started
+            route, operation_id = _route_labels(scope)
+            method = scope["method"]
+            REQUEST_SECONDS.observe(elapsed, service=self.service, method=method, route=route, operation_id=operation_id)
+            REQUESTS.inc(service=self.service, method=method, route=route, status=str(status))
+            REQUEST_QUERIES.observe(stats.queries, service=self.service, route=route)
+            REQUEST_DB_SECONDS.observe(stats.query_seconds, service=self.service, route=route)
+
+
+def _pool_collector(service: str, pool_status: Callable[[], dict]):
+    # Flattens pool_status() ({"sync": {...}, "replicas": [{...}]}) into one gauge
+    def collect():
+        gauge = Gauge("db_pool", "Connection pool usage (see /internal/pool)", ["service", "pool", "stat"])
+
+        def add(prefix: str, values: dict):
+            for stat, value in values.items():
+                if isinstance(value, bool):
+                    gauge.set(int(value), service=service, pool=prefix, stat=stat)
+                elif isinstance(value, (int, float)):
+                    gauge.set(value, service=service, pool=prefix, stat=stat)
+                elif isinstance(value, dict):
+                    add(f"{prefix}.{stat}", value)
+
+        for pool, values in pool_status().items():
+            if isinstance(values, dict):
+                add(pool, values)
+            elif isinstance(values, list):
+                for i, replica in enumerate(values):
+                    add(f"{pool}.{i}", replica)
+        return [gauge]
+
+    return collect
+
+
+def install_metrics(app: FastAPI, service: str, engines: Optional[Dict[str, object]] = None,
+                    replicas=None, pool_status: Optional[Callable[[], dict]] = None):
+    if not METRICS_ENABLED:
+        return
+    engines = dict(engines or {})
+    for i, replica in enumerate(replicas.replicas if replicas is not None else []):
+        engines[f"replica{i}"] = replica.engine
+        engines[f"replica{i}_async"] = replica.async_engine
+    for name, engine in engines.items():
+        if engine is not None:
+            instrument_engine(getattr(engine, "sync_engine", engine), name)
+    if pool_status is not None:
+        registry.add_collector(_pool_collector(service, pool_status))
+    app.add_middleware(MetricsMiddleware, service=service)
+
+    @app.get(METRICS_PATH, include_in_schema=False, dependencies=[Depends(require_internal_token)])
+    def metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,13 +1,513 @@
+# common_libs/notifications.py
+# Email notifications, sent off the request path by a background dispatcher.
+#
+# - queue_email() puts a message on a bounded in-process queue and returns at
+#   once (a Future); a full queue raises NotificationQueueFull so callers can
+#   shed load instead of blocking
+# - NOTIFY_WORKERS threads each keep one transport connection open (an SMTP
+#   session, an SES client) and send the queue in batches of up to
+#   NOTIFY_BATCH_SIZE over it; idle connections are closed after NOTIFY_IDLE_SECONDS
+# - a token bucket caps the send rate across workers (NOTIFY_RATE_LIMIT
+#   messages/second, 0 = unlimited) to stay under the provider's quota
+# - transient failures are retried with exponential backoff (NOTIFY_MAX_ATTEMPTS,
+#   NOTIFY_RETRY_BASE_SECONDS); rejected recipients fail at once
+# - notification_stats() reports queued / sent / failed / retried counts
+# - a message can carry an idempotency key (the outbox message's): it becomes
+#   the Message-ID (SMTP) / a message tag (SES), so a resend can be recognised
+#   downstream, and the dispatcher skips a key it sent recently
+#   (NOTIFY_SENT_KEYS remembered per process)
+#
+# Transports (NOTIFY_TRANSPORT): "console" prints the message (the default
+# while USE_MOCK_EMAILS=true), "smtp" (SMTP_HOST, SMTP_PORT, SMTP_USERNAME,
+# SMTP_PASSWORD, SMTP_STARTTLS), "ses" (AWS SES, boto3 imported on first send).
+# For tests, point the smtp transport at common_libs/local_smtp.py.
+#
+# Callers that need to know the outcome wait on the Future:
+# `await send_email_async(...)`. The outbox worker retries failed messages
+# itself, so it asks for a single attempt and a bounded wait
+# (max_attempts=1, timeout below its lease): otherwise a message could still be
+# retrying here after the lease expired and another worker had sent it again.
+# When the wait times out, a message whose attempt hasn't started is never
+# sent; one already being sent is waited for (the transport has its own
+# timeout), so the caller never reports a failure for an email that went out.
+import asyncio
 import os
+import queue
+import re
+import smtplib
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future
+from email.message import EmailMessage
+from typing import Callable, Optional
 
 USE_MOCK = os.getenv("USE_MOCK_EMAILS", "true").lower() == "true"
+NOTIFY_TRANSPORT = os.getenv("NOTIFY_TRANSPORT", "console" if USE_MOCK else "smtp").lower()
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", "4"))
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "10000"))
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "50"))
+NOTIFY_RATE_LIMIT = float(os.getenv("NOTIFY_RATE_LIMIT", "0"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
+NOTIFY_RETRY_BASE_SECONDS = float(os.getenv("NOTIFY_RETRY_BASE_SECONDS", "1"))
+NOTIFY_IDLE_SECONDS = float(os.getenv("NOTIFY_IDLE_SECONDS", "30"))
+NOTIFY_SENT_KEYS = int(os.getenv("NOTIFY_SENT_KEYS", "10000"))
+EMAIL_FROM = os.getenv("EMAIL_FROM", "no-reply@cashloan.example")
 
-def send_email(to: str, subject: str, body: str):
-    if USE_MOCK:
-        print(f"📧 [MOCK EMAIL] To: {to}")
-        print(f"Subject: {subject}")
-        print(f"Body: {body}")
-    else:
-        # Later: real implementation using boto3 or SMTP
-        raise NotImplementedError("Real email sending not implemented")
 
+class NotificationQueueFull(Exception):
+    pass
+
+
+class PermanentDeliveryError(Exception):
+    # The provider rejected the message for good (bad recipient, ...); not retried
+    pass
+
+
+class Notification:
+    __slots__ = ("to", "subject", "body", "attempts", "max_attempts", "idempotency_key",
+                 "cancelled", "sending", "future")
+
+    def __init__(self, to: str, subject: str, body: str, max_attempts: Optional[int] = None,
+                 idempotency_key: Optional[str] = None):
+        self.to = to
+        self.subject = subject
+        self.body = body
+        self.attempts = 0
+        self.max_attempts = max_attempts  # None: the dispatcher's NOTIFY_MAX_ATTEMPTS
+        self.idempotency_key = idempotency_key
+        # Both changed under the dispatcher's lock: no attempt starts once
+        # cancelled, and a cancel can tell whether one is under way
+        self.cancelled = False
+        self.sending = False
+        self.future = Future()
+
+
+def message_id(idempotency_key: str, sender: str = EMAIL_FROM) -> str:
+    # Stable Message-ID for a key: every resend of the message carries the same one
+    local = re.sub(r"[^A-Za-z0-9._-]", "-", idempotency_key)
+    return f"<{local}@{sender.rpartition('@')[2] or 'localhost'}>"
+
+
+# ----------------------------------------
+# Transports (one instance per worker thread, so connections aren't shared)
+# ----------------------------------------
+class EmailTransport(ABC):
+    name = "transport"
+
+    @abstractmethod
+    def send(self, message: Notification):
+        ...
+
+    def close(self):
+        pass
+
+
+class ConsoleTransport(EmailTransport):
+    name = "console"
+
+    def send(self, message: Notification):
+        print(f"📧 [MOCK EMAIL] To: {message.to}")
+        if message.idempotency_key:
+            print(f"Message-ID: {message_id(message.idempotency_key)}")
+        print(f"Subject: {message.subject}")
+        print(f"Body: {message.body}")
+
+
+class SMTPTransport(EmailTransport):
+    name = "smtp"
+
+    def __init__(self, host: str, port: int, username: Optional[str] = None, password: Optional[str] = None,
+                 starttls: bool = False, timeout: float = 10.0, sender: str = EMAIL_FROM):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.sender = sender
+        self._smtp = None
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            smtp.starttls()
+        if self.username:
+            smtp.login(self.username, self.password)
+        self._smtp = smtp
+
+    def send(self, message: Notification):
+        email = EmailMessage()
+        email["From"] = self.sender
+        email["To"] = message.to
+        email["Subject"] = message.subject
+        if message.idempotency_key:
+            email["Message-ID"] = message_id(message.idempotency_key, self.sender)
+        email.set_content(message.body)
+        if self._smtp is None:
+            self._connect()
+        try:
+            try:
+                self._smtp.send_message(email)
+            except smtplib.SMTPServerDisconnected:
+                # The server dropped the pooled session: reconnect once and resend
+                # (errors from the resend are classified below like any other)
+                self._connect()
+                self._smtp.send_message(email)
+        except smtplib.SMTPRecipientsRefused as e:
+            raise PermanentDeliveryError(f"Recipient refused: {e.recipients}")
+        except (smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+            if 500 <= e.smtp_code < 600:
+                raise PermanentDeliveryError(f"{e.smtp_code} {e.smtp_error!r}")
+            raise
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+
+class SESTransport(EmailTransport):
+    name = "ses"
+
+    def __init__(self, region_name: str, sender: str = EMAIL_FROM):
+        self.region_name = region_name
+        self.sender = sender
+        self._client = None
+
+    def send(self, message: Notification):
+        if self._client is None:
+            import boto3  # heavy import, only paid by processes that send through SES
+
+            self._client = boto3.client("ses", region_name=self.region_name)
+        # SES assigns its own Message-ID; the key goes along as a message tag
+        # (reported in SES sending events)
+        extra = {}
+        if message.idempotency_key:
+            extra["Tags"] = [{"Name": "idempotency_key", "Value": re.sub(r"[^A-Za-z0-9_-]", "-", message.idempotency_key)}]
+        try:
+            self._client.send_email(
+                Source=self.sender,
+                Destination={"ToAddresses": [message.to]},
+                Message={"Subject": {"Data": message.subject}, "Body": {"Text": {"Data": message.body}}},
+                **extra,
+            )
+        except Exception as e:
+            code = getattr(e, "response", {}).get("Error", {}).get("Code")
+            if code in ("MessageRejected", "MailFromDomainNotVerifiedException"):
+                raise PermanentDeliveryError(f"{code}: {e}")
+            raise
+
+
+def transport_from_env(kind: str = NOTIFY_TRANSPORT) -> Callable[[], EmailTransport]:
+    # Returns a factory: every worker builds its own transport
+    if kind == "console":
+        return ConsoleTransport
+    if kind == "smtp":
+        return lambda: SMTPTransport(
+            host=os.getenv("SMTP_HOST", "localhost"),
+            port=int(os.getenv("SMTP_PORT", "25")),
+            username=os.getenv("SMTP_USERNAME") or None,
+            password=os.getenv("SMTP_PASSWORD") or None,
+            starttls=os.getenv("SMTP_STARTTLS", "false").lower() == "true",
+            timeout=float(os.getenv("SMTP_TIMEOUT", "10")),
+        )
+    if kind == "ses":
+        return lambda: SESTransport(os.getenv("SES_REGION", os.getenv("AWS_REGION", "eu-central-1")))
+    raise ValueError(f"Unknown NOTIFY_TRANSPORT: {kind}")
+
+
+# ----------------------------------------
+# Rate limiting
+# ----------------------------------------
+class RateLimiter:
+    # Token bucket shared by the workers; `rate` messages/second, bursts up to `burst`
+    def __init__(self, rate: float, burst: Optional[float] = None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst or max(rate, 1.0)
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# ----------------------------------------
+# Dispatcher: bounded queue + worker pool
+# ----------------------------------------
+_STOP = object()  # queued once per worker on shutdown, after the pending messages
+
+
+class NotificationDispatcher:
+    def __init__(self, transport_factory: Callable[[], EmailTransport], workers: int = NOTIFY_WORKERS,
+                 queue_size: int = NOTIFY_QUEUE_SIZE, batch_size: int = NOTIFY_BATCH_SIZE,
+                 rate_limit: float = NOTIFY_RATE_LIMIT, max_attempts: int = NOTIFY_MAX_ATTEMPTS,
+                 retry_base: float = NOTIFY_RETRY_BASE_SECONDS, idle_seconds: float = NOTIFY_IDLE_SECONDS,
+                 sent_keys: int = NOTIFY_SENT_KEYS):
+        self.transport_factory = transport_factory
+        self.workers = max(workers, 1)
+        self.batch_size = max(batch_size, 1)
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.idle_seconds = idle_seconds
+        self.limiter = RateLimiter(rate_limit)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.counters = {"queued": 0, "rejected": 0, "sent": 0, "failed": 0, "retried": 0, "batches": 0,
+                         "cancelled": 0, "duplicates": 0}
+        self.send_seconds = 0.0
+        self._lock = threading.Lock()
+        self._threads = []
+        self._retries = {}  # Timer -> Notification waiting for its next attempt
+        self._sent_keys = OrderedDict()  # idempotency keys sent recently (oldest first)
+        self.max_sent_keys = sent_keys
+
+    def _count(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] += value
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._threads = [
+                threading.Thread(target=self._run_worker, name=f"notify-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, to: str, subject: str, body: str, max_attempts: Optional[int] = None,
+               idempotency_key: Optional[str] = None) -> Future:
+        return self.enqueue(Notification(to, subject, body, max_attempts, idempotency_key))
+
+    def enqueue(self, message: Notification) -> Future:
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self._count("rejected")
+            raise NotificationQueueFull(f"Notification queue is full ({self.queue.maxsize} messages)")
+        self._count("queued")
+        return message.future
+
+    def cancel(self, message: Notification) -> bool:
+        # The caller stopped waiting: no attempt (or retry) starts after this.
+        # Returns False while an attempt is in progress, whose outcome still counts
+        with self._lock:
+            message.cancelled = True
+            return not message.sending
+
+    def stop(self, timeout: float = 10.0):
+        # Send what is queued, then stop the workers; pending retries are failed
+        threads, self._threads = self._threads, []
+        with self._lock:
+            retries, self._retries = self._retries, {}
+        for timer, message in retries.items():
+            timer.cancel()
+            self._fail(message, RuntimeError("Notification dispatcher stopped"))
+        deadline = time.monotonic() + timeout
+        for _ in threads:
+            try:
+                self.queue.put(_STOP, timeout=max(deadline - time.monotonic(), 0.01))
+            except queue.Full:
+                break
+        for thread in threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.counters)
+            stats["retry_waiting"] = len(self._retries)
+            send_seconds = self.send_seconds
+        stats["queue_depth"] = self.queue.qsize()
+        stats["workers"] = len(self._threads)
+        stats["avg_send_ms"] = round(send_seconds / stats["sent"] * 1000, 2) if stats["sent"] else None
+        return stats
+
+    # -- workers --
+    def _next_batch(self):
+        # Blocks for the first message, then takes whatever else is queued
+        first = self.queue.get(timeout=self.idle_seconds)
+        if first is _STOP:
+            return [], True
+        batch, stop = [first], False
+        while len(batch) < self.batch_size:
+            try:
+                message = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if message is _STOP:
+                stop = True
+                break
+            batch.append(message)
+        return batch, stop
+
+    def _run_worker(self):
+        transport = self.transport_factory()
+        try:
+            while True:
+                try:
+                    batch, stop = self._next_batch()
+                except queue.Empty:
+                    transport.close()  # idle: don't hold the connection open
+                    continue
+                if batch:
+                    self._send_batch(transport, batch)
+                if stop:
+                    return
+        finally:
+            transport.close()
+
+    def _send_batch(self, transport: EmailTransport, batch: list):
+        self._count("batches")
+        for message in batch:
+            self.limiter.acquire()
+            if not self._begin(message):
+                self._count("cancelled")
+                continue  # the caller gave up waiting (send_email_async timeout)
+            try:
+                self._attempt(transport, message)
+            finally:
+                with self._lock:
+                    message.sending = False
+
+    def _begin(self, message: Notification) -> bool:
+        with self._lock:
+            if message.cancelled or message.future.cancelled():
+                return False
+            message.sending = True
+            return True
+
+    def _attempt(self, transport: EmailTransport, message: Notification):
+        key = message.idempotency_key
+        with self._lock:
+            duplicate = key is not None and key in self._sent_keys
+        if duplicate:
+            # Already sent by this process (e.g. the caller's bookkeeping failed after the send)
+            self._count("duplicates")
+            if not message.future.done():
+                message.future.set_result(None)
+            return
+        message.attempts += 1
+        started = time.perf_counter()
+        try:
+            transport.send(message)
+        except PermanentDeliveryError as e:
+            self._fail(message, e)
+        except Exception as e:
+            transport.close()  # start the next message on a fresh connection
+            self._retry(message, e)
+        else:
+            with self._lock:
+                self.counters["sent"] += 1
+                self.send_seconds += time.perf_counter() - started
+                if key is not None and self.max_sent_keys > 0:
+                    self._sent_keys[key] = None
+                    while len(self._sent_keys) > self.max_sent_keys:
+                        self._sent_keys.popitem(last=False)
+            if not message.future.done():
+                message.future.set_result(None)
+
+    def _fail(self, message: Notification, error: Exception):
+        self._count("failed")
+        print(f"📧 Email to {message.to} failed after {message.attempts} attempt(s): {error}")
+        if not message.future.done():
+            message.future.set_exception(error)
+
+    def _retry(self, message: Notification, error: Exception):
+        if message.attempts >= (message.max_attempts or self.max_attempts) or message.cancelled:
+            self._fail(message, error)
+            return
+        self._count("retried")
+        timer = threading.Timer(self.retry_base * 2 ** (message.attempts - 1), lambda: self._requeue(timer, message))
+        timer.daemon = True
+        with self._lock:
+            self._retries[timer] = message
+        timer.start()
+
+    def _requeue(self, timer, message: Notification):
+        with self._lock:
+            if self._retries.pop(timer, None) is None:
+                return  # stopped meanwhile
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self._fail(message, NotificationQueueFull("Notification queue is full, retry dropped"))
+
+
+# ----------------------------------------
+# Process-wide dispatcher (started on first use)
+# ----------------------------------------
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> NotificationDispatcher:
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = NotificationDispatcher(transport_from_env())
+            _dispatcher.start()
+        return _dispatcher
+
+
+def queue_email(to: str, subject: str, body: str, max_attempts: Optional[int] = None,
+                idempotency_key: Optional[str] = None) -> Future:
+    # Returns immediately; the Future completes once the email is sent (or has failed)
+    return get_dispatcher().submit(to, subject, body, max_attempts, idempotency_key)
+
+
+async def send_email_async(to: str, subject: str, body: str, max_attempts: Optional[int] = None,
+                           timeout: Optional[float] = None, idempotency_key: Optional[str] = None):
+    # Waits for delivery without blocking the event loop; raises if it failed.
+    # After `timeout` seconds the message is cancelled (never sent if no attempt
+    # has started, no further retries) and asyncio.TimeoutError is raised; an
+    # attempt already in progress is waited for and its outcome returned.
+    dispatcher = get_dispatcher()
+    message = Notification(to, subject, body, max_attempts, idempotency_key)
+    future = dispatcher.enqueue(message)
+    try:
+        await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+    except asyncio.TimeoutError:
+        # future.cancel() fails when the attempt finished in between: use its result
+        if dispatcher.cancel(message) and future.cancel():
+            raise
+        await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        # The caller itself was cancelled: don't start the send for nobody
+        dispatcher.cancel(message)
+        future.cancel()
+        raise
+
+
+def send_email(to: str, subject: str, body: str, timeout: Optional[float] = None):
+    # Blocking variant for scripts; request handlers should use queue_email
+    queue_email(to, subject, body).result(timeout)
+
+
+def notification_stats() -> dict:
+    return _dispatcher.stats() if _dispatcher is not None else {"workers": 0}
+
+
+def shutdown_notifications(timeout: float = 10.0):
+    global _dispatcher
+    with _dispatcher_lock:
+        dispatcher, _dispatcher = _dispatcher, None
+    if dispatcher is not None:
+        dispatcher.stop(timeout)
@@ -0,0 +1,224 @@
+# common_libs/s3.py
+# Document uploads to S3, streamed and in parallel parts.
+#
+# upload_stream() takes the body as an async iterator of chunks (e.g.
+# `request.stream()`) and never holds more than a few parts in memory:
+# - chunks are collected into parts of S3_PART_SIZE bytes (min 5 MiB, the S3
+#   limit for every part but the last)
+# - up to S3_UPLOAD_CONCURRENCY parts of one upload are in flight at a time;
+#   reading waits while they are, so memory stays around
+#   (concurrency + 1) x part size per upload
+# - the blocking boto3 calls run on a dedicated pool of S3_UPLOAD_THREADS
+#   threads (shared by all uploads, matched by the client's connection pool),
+#   never on the event loop or the request threadpool
+# - each part is sent with its Content-MD5, so S3 rejects corrupted parts; the
+#   SHA-256 of the whole body is returned with the result
+# - bodies over S3_MAX_UPLOAD_BYTES are aborted with UploadTooLarge, and a failed
+#   upload is aborted so no orphaned parts are left behind
+# - bodies smaller than one part go up with a single PutObject
+#
+# presign_upload() is the direct mode: the client POSTs the file straight to
+# S3 with the returned URL and form fields (size limit enforced by S3).
+#
+# upload_to_s3() keeps its original blocking upload_fileobj behaviour for
+# existing (sync) callers; upload_to_s3_async() is the same upload through the
+# streaming pipeline, for async code.
+#
+# S3_ENDPOINT_URL points the client at an S3-compatible stand-in (MinIO, moto
+# server, LocalStack) for local runs and tests.
+import asyncio
+import base64
+import functools
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Optional
+from uuid import uuid4
+
+from fastapi import UploadFile
+
+BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
+S3_REGION = os.getenv("S3_REGION", os.getenv("AWS_REGION"))
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+MIN_PART_SIZE = 5 * 1024 * 1024
+S3_PART_SIZE = max(int(os.getenv("S3_PART_SIZE", str(8 * 1024 * 1024))), MIN_PART_SIZE)
+S3_UPLOAD_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", "4"))
+S3_UPLOAD_THREADS = int(os.getenv("S3_UPLOAD_THREADS", "16"))
+S3_MAX_UPLOAD_BYTES = int(os.getenv("S3_MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+S3_PRESIGN_EXPIRES = int(os.getenv("S3_PRESIGN_EXPIRES", "900"))
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+# Created on first use: importing boto3 and building a client costs hundreds
+# of milliseconds, which shouldn't be paid at import time by every worker.
+# One client per region (S3_REGION unless the caller passes its own)
+_s3_clients = {}
+_executor = None
+
+def get_s3_client(region_name: Optional[str] = None):
+    region_name = region_name or S3_REGION
+    if region_name not in _s3_clients:
+        import boto3
+        from botocore.config import Config
+
+        _s3_clients[region_name] = boto3.client(
+            "s3",
+            region_name=region_name,
+            endpoint_url=S3_ENDPOINT_URL,
+            config=Config(max_pool_connections=S3_UPLOAD_THREADS, retries={"mode": "standard"}),
+        )
+    return _s3_clients[region_name]
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=S3_UPLOAD_THREADS, thread_name_prefix="s3-upload")
+    return _executor
+
+async def _call(method: str, body: Optional[bytes] = None, region_name: Optional[str] = None, **kwargs):
+    # Runs a (blocking) client call on the upload threads; a body is sent with
+    # its Content-MD5, computed there too rather than on the event loop
+    client = get_s3_client(region_name)
+
+    def call():
+        if body is not None:
+            kwargs.update(Body=body, ContentMD5=_md5(body))
+        return getattr(client, method)(**kwargs)
+
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), call)
+
+def object_url(key: str, bucket: Optional[str] = None) -> str:
+    bucket = bucket or BUCKET_NAME
+    if S3_ENDPOINT_URL:
+        return f"{S3_ENDPOINT_URL.rstrip('/')}/{bucket}/{key}"
+    return f"https://{bucket}.s3.amazonaws.com/{key}"
+
+def document_key(filename: Optional[str], folder: str = "documents") -> str:
+    # Unique key; the client's file name is reduced to a safe base name
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", os.path.basename(filename or "")) or "upload"
+    return f"{folder}/{uuid4()}_{name[-100:]}"
+
+def _md5(data: bytes) -> str:
+    return base64.b64encode(hashlib.md5(data).digest()).decode()
+
+
+# ----------------------------------------
+# Streaming multipart upload
+# ----------------------------------------
+async def upload_stream(chunks: AsyncIterator[bytes], key: str, content_type: Optional[str] = None,
+                        bucket: Optional[str] = None, part_size: int = S3_PART_SIZE,
+                        concurrency: int = S3_UPLOAD_CONCURRENCY, max_bytes: int = S3_MAX_UPLOAD_BYTES,
+                        region_name: Optional[str] = None) -> dict:
+    bucket = bucket or BUCKET_NAME
+    call = functools.partial(_call, region_name=region_name)
+    part_size = max(part_size, MIN_PART_SIZE)
+    extra = {"ContentType": content_type} if content_type else {}
+    sha256 = hashlib.sha256()
+    buffer = bytearray()
+    size = 0
+    upload_id = None
+    part_number = 0
+    parts = []        # {"PartNumber", "ETag"} of the finished parts
+    in_flight = set()
+
+    async def send_part(number: int, data: bytes):
+        response = await call(
+            "upload_part", data, Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=number,
+        )
+        parts.append({"PartNumber": number, "ETag": response["ETag"]})
+
+    async def start_part(data: bytes):
+        nonlocal upload_id, part_number
+        if upload_id is None:
+            response = await call("create_multipart_upload", Bucket=bucket, Key=key, **extra)
+            upload_id = response["UploadId"]
+        while len(in_flight) >= concurrency:
+            # Bounded memory: wait for a slot before reading further
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            in_flight.difference_update(done)
+            for task in done:
+                task.result()  # raise the part's error, if any
+        part_number += 1
+        in_flight.add(asyncio.ensure_future(send_part(part_number, data)))
+
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+            sha256.update(chunk)
+            buffer += chunk
+            while len(buffer) >= part_size:
+                data = bytes(buffer[:part_size])
+                del buffer[:part_size]
+                await start_part(data)
+
+        if upload_id is None:
+            # Smaller than one part: a single request does it
+            await call("put_object", bytes(buffer), Bucket=bucket, Key=key, **extra)
+        else:
+            if buffer:
+                await start_part(bytes(buffer))
+            if in_flight:
+                await asyncio.gather(*in_flight)
+            in_flight.clear()
+            await call(
+                "complete_multipart_upload", Bucket=bucket, Key=key, UploadId=upload_id,
+                MultipartUpload={"Parts": sorted(parts, key=lambda part: part["PartNumber"])},
+            )
+    except BaseException:
+        for task in in_flight:
+            task.cancel()
+        if upload_id is not None:
+            try:
+                await call("abort_multipart_upload", Bucket=bucket, Key=key, UploadId=upload_id)
+            except Exception as e:
+                print(f"Could not abort multipart upload {upload_id} of {key}: {e}")
+        raise
+
+    return {
+        "key": key,
+        "url": object_url(key, bucket),
+        "size": size,
+        "sha256": sha256.hexdigest(),
+        "parts": part_number or 1,
+    }
+
+async def iter_upload_file(file: UploadFile, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+# Blocking upload of a multipart-form file (unchanged API for sync callers)
+def upload_to_s3(file: UploadFile, folder: str = "documents") -> str:
+    key = document_key(file.filename, folder)
+    get_s3_client().upload_fileobj(file.file, BUCKET_NAME, key)
+    return object_url(key)
+
+async def upload_to_s3_async(file: UploadFile, folder: str = "documents") -> str:
+    # Multipart-form uploads (the body is already spooled by the framework);
+    # prefer upload_stream(request.stream(), ...) for large raw bodies
+    result = await upload_stream(iter_upload_file(file), document_key(file.filename, folder), file.content_type)
+    return result["url"]
+
+
+# ----------------------------------------
+# Presigned uploads (the client sends the file to S3 directly)
+# ----------------------------------------
+def presign_upload(key: str, content_type: Optional[str] = None, bucket: Optional[str] = None,
+                   max_bytes: int = S3_MAX_UPLOAD_BYTES, expires_in: int = S3_PRESIGN_EXPIRES) -> dict:
+    # POST policy: S3 itself refuses bodies over max_bytes or another key
+    fields, conditions = {}, [["content-length-range", 1, max_bytes]]
+    if content_type:
+        fields["Content-Type"] = content_type
+        conditions.append({"Content-Type": content_type})
+    post = get_s3_client().generate_presigned_post(
+        Bucket=bucket or BUCKET_NAME, Key=key, Fields=fields, Conditions=conditions, ExpiresIn=expires_in,
+    )
+    return {"key": key, "url": post["url"], "fields": post["fields"], "expires_in": expires_in, "max_bytes": max_bytes}
@@ -0,0 +1,51 @@
+# Alembic environment for loan_service
+# Uses the app's engine and models, so migrations run against the same
+# database the service is configured for.
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import text
+
+from app.db.session import Base, engine
+from app.db.models.loan import Loan  # noqa: F401  (register models on Base.metadata)
+from app.db.models.loan_audit_log import LoanAuditLog  # noqa: F401
+from app.db.models.outbox import OutboxMessage  # noqa: F401
+from app.db.models.loan_stats import LoanDailyStats  # noqa: F401
+
+config = context.config
+
+# Skip logging setup when called from the running app (see app/db/migrate.py)
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Arbitrary key for the PostgreSQL advisory lock that serializes migrations
+# when several pods start at once
+MIGRATION_LOCK_ID = 727001
+
+
+def run_migrations_offline():
+    # Emit SQL to stdout instead of running it (alembic upgrade head --sql)
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        literal_binds=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            if connection.dialect.name == "postgresql":
+                connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
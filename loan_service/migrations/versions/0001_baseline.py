@@ -0,0 +1,85 @@
+"""Baseline schema: loans, loan_audit_log, loan_outbox
+
+Matches what `create_all` produced before migrations existed. Tables and
+indexes that are already there are left alone, so databases created by
+`create_all` can be upgraded in place.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _existing_indexes(inspector, table):
+    return {index["name"] for index in inspector.get_indexes(table)}
+
+
+def _create_index(inspector, name, table, columns, unique=False):
+    if name not in _existing_indexes(inspector, table):
+        op.create_index(name, table, columns, unique=unique)
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table("loans"):
+        op.create_table(
+            "loans",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer),
+            sa.Column("amount", sa.Float, nullable=False),
+            sa.Column("term_months", sa.Integer),
+            sa.Column("interest_rate", sa.Float),
+            sa.Column("status", sa.String, default="pending"),
+            sa.Column("approved_by", sa.Integer, nullable=True),
+            sa.Column("created_at", sa.DateTime, default=datetime.utcnow),
+        )
+    _create_index(inspector, "ix_loans_id", "loans", ["id"])
+    _create_index(inspector, "ix_loans_user_id", "loans", ["user_id"])
+    _create_index(inspector, "ix_loans_user_id_created_at_id", "loans", ["user_id", "created_at", "id"])
+    _create_index(inspector, "ix_loans_user_id_amount_id", "loans", ["user_id", "amount", "id"])
+    _create_index(inspector, "ix_loans_user_id_status_id", "loans", ["user_id", "status", "id"])
+
+    if not inspector.has_table("loan_audit_log"):
+        op.create_table(
+            "loan_audit_log",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("loan_id", sa.Integer, sa.ForeignKey("loans.id")),
+            sa.Column("action", sa.String),
+            sa.Column("actor_id", sa.Integer),
+            sa.Column("reason", sa.String, nullable=True),
+            sa.Column("timestamp", sa.DateTime, default=datetime.utcnow),
+        )
+    _create_index(inspector, "ix_loan_audit_log_id", "loan_audit_log", ["id"])
+
+    if not inspector.has_table("loan_outbox"):
+        op.create_table(
+            "loan_outbox",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("topic", sa.String, nullable=False),
+            sa.Column("payload", sa.JSON, nullable=False),
+            sa.Column("idempotency_key", sa.String, nullable=False, unique=True),
+            sa.Column("status", sa.String, nullable=False),
+            sa.Column("attempts", sa.Integer, nullable=False),
+            sa.Column("next_attempt_at", sa.DateTime, nullable=False),
+            sa.Column("last_error", sa.String, nullable=True),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("processed_at", sa.DateTime, nullable=True),
+        )
+    _create_index(inspector, "ix_loan_outbox_id", "loan_outbox", ["id"])
+    _create_index(inspector, "ix_loan_outbox_status_next_attempt_at", "loan_outbox", ["status", "next_attempt_at"])
+
+
+def downgrade():
+    op.drop_table("loan_outbox")
+    op.drop_table("loan_audit_log")
+    op.drop_table("loans")
@@ -0,0 +1,37 @@
+"""Performance indexes for loan listing and the audit log
+
+- ix_loans_user_id_status_created_at_id: /me and /user/{id} filtered by
+  status, in the default created_at order (keyset pagination needs the id)
+- ix_loans_status_created_at: admin queries across users by status and date
+  (pending queue, export)
+- ix_loan_audit_log_loan_id_timestamp: a loan's history; loan_id had no index
+- ix_loan_audit_log_actor_id_timestamp: an admin's actions over time
+
+(user_id, created_at) is already served by ix_loans_user_id_created_at_id
+from the baseline, so no separate index is added for it.
+Check the plans with `python -m benchmarks.explain_indexes`.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_loans_user_id_status_created_at_id", "loans", ["user_id", "status", "created_at", "id"])
+    op.create_index("ix_loans_status_created_at", "loans", ["status", "created_at"])
+    op.create_index("ix_loan_audit_log_loan_id_timestamp", "loan_audit_log", ["loan_id", "timestamp"])
+    op.create_index("ix_loan_audit_log_actor_id_timestamp", "loan_audit_log", ["actor_id", "timestamp"])
+
+
+def downgrade():
+    op.drop_index("ix_loan_audit_log_actor_id_timestamp", table_name="loan_audit_log")
+    op.drop_index("ix_loan_audit_log_loan_id_timestamp", table_name="loan_audit_log")
+    op.drop_index("ix_loans_status_created_at", table_name="loans")
+    op.drop_index("ix_loans_user_id_status_created_at_id", table_name="loans")
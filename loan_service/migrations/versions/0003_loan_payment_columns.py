@@ -0,0 +1,42 @@
+"""Stored monthly_payment and total_cost columns on loans
+
+Both were computed on every read; storing them (set by ORM events on Loan)
+lets reads skip the calculation and lets queries sort and filter on the
+payment. ix_loans_user_id_monthly_payment_id backs keyset pagination of
+/me?sort_by=monthly_payment and payment range filters.
+
+Existing rows are backfilled in batches (app/db/backfill.py). In offline
+mode (--sql) the backfill can't run; run `python -m app.db.backfill`
+after applying the generated SQL.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+from app.db.backfill import backfill_costs
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("loans", sa.Column("monthly_payment", sa.Float, nullable=True))
+    op.add_column("loans", sa.Column("total_cost", sa.Float, nullable=True))
+
+    if not context.is_offline_mode():
+        backfill_costs(op.get_bind())
+
+    # Built after the backfill, so the batched updates don't also maintain it
+    op.create_index("ix_loans_user_id_monthly_payment_id", "loans", ["user_id", "monthly_payment", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_loans_user_id_monthly_payment_id", table_name="loans")
+    with op.batch_alter_table("loans") as batch:
+        batch.drop_column("total_cost")
+        batch.drop_column("monthly_payment")
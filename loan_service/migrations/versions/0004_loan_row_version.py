@@ -0,0 +1,26 @@
+"""Row version column on loans
+
+Incremented on every update of a loan; the loan read endpoints derive their
+ETags from it, so polling clients get 304 Not Modified while a loan is
+unchanged. Existing rows start at version 1.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("loans", sa.Column("version", sa.Integer, nullable=False, server_default="1"))
+
+
+def downgrade():
+    with op.batch_alter_table("loans") as batch:
+        batch.drop_column("version")
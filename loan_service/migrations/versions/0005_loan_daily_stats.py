@@ -0,0 +1,52 @@
+"""Loan portfolio summary table (loan_daily_stats)
+
+One row per application day and status with loan count, amount total and
+interest rate total/count. The loan service keeps it up to date on every
+apply/approve/reject; this migration fills it from the existing loans with
+one INSERT ... SELECT ... GROUP BY.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    stats = op.create_table(
+        "loan_daily_stats",
+        sa.Column("day", sa.Date, primary_key=True),
+        sa.Column("status", sa.String, primary_key=True),
+        sa.Column("loan_count", sa.Integer, nullable=False),
+        sa.Column("amount_total", sa.Float, nullable=False),
+        sa.Column("interest_rate_total", sa.Float, nullable=False),
+        sa.Column("interest_rate_count", sa.Integer, nullable=False),
+    )
+
+    loans = sa.table(
+        "loans", sa.column("created_at"), sa.column("status"), sa.column("amount"), sa.column("interest_rate"),
+    )
+    day = sa.func.date(loans.c.created_at)
+    op.execute(stats.insert().from_select(
+        ["day", "status", "loan_count", "amount_total", "interest_rate_total", "interest_rate_count"],
+        sa.select(
+            day,
+            loans.c.status,
+            sa.func.count(),
+            sa.func.coalesce(sa.func.sum(loans.c.amount), 0.0),
+            sa.func.coalesce(sa.func.sum(loans.c.interest_rate), 0.0),
+            sa.func.count(loans.c.interest_rate),
+        )
+        .where(loans.c.created_at.is_not(None))
+        .group_by(day, loans.c.status),
+    ))
+
+
+def downgrade():
+    op.drop_table("loan_daily_stats")
@@ -1,156 +1,143 @@
+from typing import List
+
 # FastAPI and SQLAlchemy dependencies
 from fastapi import APIRouter, Depends, HTTPException, Request, Body
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
 
-# Database and models
-from app.db.session import SessionLocal
+# Database session dependencies (primary / read replica) and sync/async runner
+from app.db.session import get_db, get_read_db, run_db
 from app.db.models.user import User
 
 # Schemas for request/response models
-from app.schemas.user import UserCreate, UserOut, UserUpdate
+from app.schemas.user import UserBatchRequest, UserCreate, UserOut, UserUpdate
 
 # User service and utilities
 from app.services.user_service import (
-    create_user, 
-    get_password_hash, 
-    verify_email_token, 
+    register_user as register_new_user,
+    get_user_by_id,
+    get_users_by_ids,
+    get_user_by_email_or_404,
+    update_user as apply_user_update,
+    delete_user as remove_user,
+    reset_password as apply_password_reset,
+    decode_reset_token,
+    verify_email_token,
     generate_reset_token
 )
 
+# Background email dispatcher (queue + worker pool, see common_libs/notifications.py)
+from common_libs.notifications import NotificationQueueFull, queue_email
+
+# Shared user-lookup cache used by the other services (invalidated on changes)
+from common_libs.users import invalidate_user
+
+# Service-to-service auth (shared INTERNAL_SERVICE_TOKEN)
+from common_libs.auth.internal import require_internal_token
+
 # Auth handling
-from app.core.auth import authenticate_user, create_access_token, get_current_user
-from app.core.config import settings
+from app.core.auth import authenticate_user, create_access_token, get_current_user, token_claims
+from app.core.passwords import hash_password
 
-# JWT-related utilities
-from jose import jwt, JWTError
+# Pydantic models for request bodies
 from pydantic import BaseModel, EmailStr
 
 # Create router for user-related API endpoints
+# Handlers are async; DB work goes through `run_db`, which uses the async
+# engine or the threadpool depending on the DB_ASYNC setting
 router = APIRouter()
 
-# Dependency to get a database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # Schema for password reset request body
 class PasswordReset(BaseModel):
     token: str
     new_password: str
 
 # Endpoint to reset user password using a valid token
+# (bcrypt work in this file goes through the hashing pool, see core/passwords.py)
 @router.post("/reset-password")
-def reset_password(data: PasswordReset, db: Session = Depends(get_db)):
-    try:
-        # Decode the reset token to extract the user's email
-        payload = jwt.decode(data.token, settings.SECRET_KEY, algorithms=["HS256"])
-        email = payload.get("sub")
-    except JWTError:
-        raise HTTPException(status_code=400, detail="Invalid or expired token")
-    
-    # Find user by email
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Hash the new password and update the user record
-    user.hashed_password = get_password_hash(data.new_password)
-    db.commit()
+async def reset_password(data: PasswordReset, db: Session = Depends(get_db)):
+    email = decode_reset_token(data.token)  # reject bad tokens before hashing
+    hashed_password = await hash_password(data.new_password)
+    await run_db(db, apply_password_reset, email, hashed_password)
     return {"message": "Password reset successful"}
 
 # Endpoint to request a password reset link
 @router.post("/forgot-password")
-def forgot_password(request: Request, email: EmailStr = Body(...), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
+async def forgot_password(request: Request, email: EmailStr = Body(...), db: Session = Depends(get_db)):
+    await run_db(db, get_user_by_email_or_404, email)
+
     # Generate a password reset token and reset URL
     token = generate_reset_token(email)
     reset_url = f"{request.base_url}reset-password?token={token}"
-    
-    # TODO: Send this reset_url via email
-    print("🔗 Reset Link:", reset_url)
-    
+
+    # 📧 Queue the email and return right away; the dispatcher sends it in the background
+    try:
+        queue_email(
+            to=email,
+            subject="Reset your password",
+            body=f"Use this link to reset your password (valid for 30 minutes):\n{reset_url}",
+        )
+    except NotificationQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many emails queued, please retry",
+            headers={"Retry-After": "5"},
+        )
+
     return {"message": "Password reset link has been generated. Check your email."}
 
 # Endpoint to register a new user
 @router.post("/register", response_model=UserOut)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-
-    hashed_pw = pwd_context.hash(user.password)
-    new_user = User(
-        full_name=user.full_name,
-        email=user.email,
-        hashed_password=hashed_pw,
-        role=user.role  # 👈 Assign role
-    )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
-
-# Get a user by ID
+async def register_user(user: UserCreate, db: Session = Depends(get_db)):
+    hashed_password = await hash_password(user.password)
+    return await run_db(db, register_new_user, user, hashed_password)
+
+# Endpoint to get details of the currently authenticated user
+# (declared before "/{user_id}" so "me" isn't parsed as a user ID)
+@router.get("/me", response_model=UserOut)
+async def read_users_me(current_user: User = Depends(get_current_user)):
+    return current_user
+
+# Get many users by ID in one query (used by the other services' batched
+# lookups in common_libs/users.py). A POST only to carry the ID list; it is a
+# read, so it goes to a replica like GET /{user_id}
+# 🔒 Internal only: callers must send the shared service token (X-Internal-Token)
+@router.post("/batch", response_model=List[UserOut], dependencies=[Depends(require_internal_token)])
+async def get_users_batch(data: UserBatchRequest, db: Session = Depends(get_read_db)):
+    return await run_db(db, get_users_by_ids, data.ids)
+
+# Get a user by ID (read-only: served by a replica when one is healthy)
 @router.get("/{user_id}", response_model=UserOut)
-def get_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+async def get_user(user_id: int, db: Session = Depends(get_read_db)):
+    return await run_db(db, get_user_by_id, user_id)
 
 # Update an existing user by ID
 @router.put("/{user_id}", response_model=UserOut)
-def update_user(user_id: int, updated_data: UserUpdate, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Update only the provided fields
-    if updated_data.full_name:
-        user.full_name = updated_data.full_name
-    if updated_data.email:
-        user.email = updated_data.email
-    if updated_data.password:
-        user.hashed_password = get_password_hash(updated_data.password)
-
-    db.commit()
-    db.refresh(user)
+async def update_user(user_id: int, updated_data: UserUpdate, db: Session = Depends(get_db)):
+    hashed_password = await hash_password(updated_data.password) if updated_data.password else None
+    user = await run_db(db, apply_user_update, user_id, updated_data, hashed_password)
+    invalidate_user(user_id)
     return user
 
 # Delete a user by ID
 @router.delete("/{user_id}")
-def delete_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    db.delete(user)
-    db.commit()
+async def delete_user(user_id: int, db: Session = Depends(get_db)):
+    await run_db(db, remove_user, user_id)
+    invalidate_user(user_id)
     return {"message": "User deleted successfully"}
 
 # Endpoint to verify a user's email using a token
 @router.get("/verify/{token}")
-def verify_email(token: str, db: Session = Depends(get_db)):
-    return verify_email_token(token, db)
+async def verify_email(token: str, db: Session = Depends(get_db)):
+    return await run_db(db, lambda session: verify_email_token(token, session))
 
 # Login endpoint to authenticate user and return JWT token
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
 
-    access_token = create_access_token(data={"sub": user.email})
+    # The token carries the profile claims used by stateless auth (see core/auth.py)
+    access_token = create_access_token(data=token_claims(user))
     return {"access_token": access_token, "token_type": "bearer"}
-
-# Endpoint to get details of the currently authenticated user
-@router.get("/me", response_model=UserOut)
-def read_users_me(current_user: User = Depends(get_current_user)):
-    return current_user
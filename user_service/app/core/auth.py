@@ -1,12 +1,12 @@
 # Standard library for handling time
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Union
 
 # JWT handling with JOSE
 from jose import jwt, JWTError
 
-# Password hashing
-from passlib.context import CryptContext
+# Password hashing (process pool, see core/passwords.py)
+from app.core.passwords import verify_password
 
 # FastAPI tools for handling security and dependency injection
 from fastapi import Depends, HTTPException, status
@@ -16,32 +16,77 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
 # Local project imports
-from app.db.session import get_db
+from app.db.session import get_db, run_db
 from app.db.models.user import User
+from app.schemas.user import UserOut
 from app.core.config import settings
 
-# Password hashing context using bcrypt algorithm
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Shared cache backends (in-memory by default, Redis to share across pods)
+from common_libs.cache import cache_from_env
 
 # Define the OAuth2 scheme for bearer token (e.g., Authorization: Bearer <token>)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-# 🔐 Verifies if the provided plain password matches the stored hashed password
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# 🔎 Looks up a user by email, returns None if there is no such user
+def get_user_by_email(db: Session, email: str) -> Optional[User]:
+    return db.query(User).filter(User.email == email).first()
 
-# 🔐 Hashes a new password using bcrypt
-def get_password_hash(password):
-    return pwd_context.hash(password)
+# 🔐 Replaces a user's password hash (same password, e.g. a new bcrypt cost)
+def save_password_hash(db: Session, user: User, hashed_password: str):
+    user.hashed_password = hashed_password
+    db.commit()
+    db.refresh(user)
 
 # 🔐 Authenticates user based on email and password
-# Returns user if credentials are correct, else returns None
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.hashed_password):
+# Returns user if credentials are correct, else returns None.
+# The bcrypt check runs in the hashing pool; a hash made with an outdated
+# cost (BCRYPT_ROUNDS changed) is replaced on a successful login.
+async def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
+    user = await run_db(db, get_user_by_email, email)
+    if not user:
         return None
+    valid, new_hash = await verify_password(password, user.hashed_password)
+    if not valid:
+        return None
+    if new_hash:
+        await run_db(db, save_password_hash, user, new_hash)
     return user
 
+# 🏷️ Cache of user ID -> current token version (User.token_version).
+# Set USER_VERSION_CACHE_BACKEND=redis so every pod sees a bump immediately;
+# with the in-memory default another pod may serve old claims for up to
+# USER_VERSION_CACHE_TTL seconds.
+user_versions = cache_from_env("USER_VERSION")
+
+def remember_user_version(user_id: int, version: int):
+    user_versions.set(f"user_version:{user_id}", str(version), settings.USER_VERSION_CACHE_TTL)
+
+def forget_user_version(user_id: int):
+    user_versions.delete(f"user_version:{user_id}")
+
+# 🔎 Reads a user's token version, None if the user doesn't exist
+def get_token_version(db: Session, user_id: int) -> Optional[int]:
+    return db.query(User.token_version).filter(User.id == user_id).scalar()
+
+async def current_token_version(db: Session, user_id: int) -> Optional[int]:
+    cached = user_versions.get(f"user_version:{user_id}")
+    if cached is not None:
+        return int(cached)
+    version = await run_db(db, get_token_version, user_id)
+    if version is not None:
+        remember_user_version(user_id, version)
+    return version
+
+# 🏷️ Claims put in access tokens: everything UserOut needs, plus the version
+def token_claims(user: User) -> dict:
+    return {
+        "sub": user.email,
+        "uid": user.id,
+        "name": user.full_name,
+        "role": user.role,
+        "ver": user.token_version or 0,
+    }
+
 # 🔐 Creates a JWT token with expiration
 # `data` should include user info (e.g., {"sub": user.email})
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(hours=1)):
@@ -50,7 +95,10 @@ def create_access_token(data: dict, expires_delta: timedelta = timedelta(hours=1
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
 
 # 🔐 Retrieves the current authenticated user based on the JWT token
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+# With STATELESS_AUTH, a token whose version matches the user's current
+# version is answered from its claims (a UserOut, no DB round trip on a
+# cache hit); older tokens and tokens without claims fall back to the DB.
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Union[User, UserOut]:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid authentication credentials",
@@ -65,8 +113,13 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
 
-    # Query user by email
-    user = db.query(User).filter(User.email == email).first()
+    if settings.STATELESS_AUTH and "uid" in payload:
+        version = await current_token_version(db, payload["uid"])
+        if version is not None and version == payload.get("ver"):
+            return UserOut(id=payload["uid"], full_name=payload["name"], email=email, role=payload["role"])
+
+    # Query user by email (async engine or threadpool, depending on DB_ASYNC)
+    user = await run_db(db, get_user_by_email, email)
     if user is None:
         raise credentials_exception
 
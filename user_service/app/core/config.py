@@ -1,32 +1,24 @@
-# Import AWS SDK for Python to interact with AWS Secrets Manager
-import boto3
-
-# Standard libraries for parsing JSON and accessing environment variables
-import json
+# Standard library for accessing environment variables
 import os
 
 # Load environment variables from a .env file
 from dotenv import load_dotenv
 load_dotenv()
 
-#  Function to retrieve secrets from AWS Secrets Manager
-def get_secret():
-    # Retrieve the secret name and AWS region from environment variables (with defaults)
-    secret_name = os.getenv("AWS_SECRET_NAME", "cashloan/user_service/config2")
-    region_name = os.getenv("AWS_REGION", "eu-central-1")
-
-    # Create a Secrets Manager client
-    client = boto3.client("secretsmanager", region_name=region_name)
-
-    # Fetch the secret value using the secret name
-    get_secret_value_response = client.get_secret_value(SecretId=secret_name)
+# Shared secrets loader (AWS Secrets Manager, local stand-in, file or env)
+from common_libs.config_loader import SettingsLoader, provider_from_env
 
-    # Extract and parse the secret string as JSON
-    secret = get_secret_value_response["SecretString"]
-    return json.loads(secret)
-
-#  Load secrets from AWS Secrets Manager when the module is imported
-aws_secret = get_secret()
+#  Load secrets when the module is imported.
+#  AWS Secrets Manager by default (SETTINGS_PROVIDER changes it); values are
+#  served from the local settings cache when possible so workers boot without
+#  waiting on AWS, and refreshed in the background once stale. The Settings
+#  below are read once, so refreshed values are picked up by the next worker
+#  that boots (restart the service to apply a rotated secret).
+secrets_loader = SettingsLoader(
+    provider_from_env(secret_name="cashloan/user_service/config2", region_name="eu-central-1"),
+    cache_name="user_service",
+)
+aws_secret = secrets_loader.load()
 
 #  Configuration class for storing application settings
 class Settings:
@@ -40,10 +32,37 @@ class Settings:
     # Secret key used for JWT and other cryptographic functions
     SECRET_KEY: str = aws_secret.get("SECRET_KEY", "fallback-key")
 
+    # Use the asyncio database stack (asyncpg) instead of the sync driver
+    DB_ASYNC: bool = os.getenv("DB_ASYNC", "false").lower() == "true"
+
+    # Create missing tables on startup (disable when the schema is migrated separately)
+    DB_CREATE_TABLES: bool = os.getenv("DB_CREATE_TABLES", "true").lower() == "true"
+
+    # Connection pool tuning (applies to the sync and async engines)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+    # Read replicas: comma-separated URLs (empty = primary only), max replication
+    # lag and health check interval in seconds, and how long a client's reads
+    # stay on the primary after it writes (see common_libs/db/replicas.py)
+    DB_REPLICA_URLS: str = os.getenv("DB_REPLICA_URLS", "")
+    DB_REPLICA_MAX_LAG: float = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+    DB_REPLICA_CHECK_INTERVAL: float = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5"))
+    DB_READ_YOUR_WRITES_SECONDS: float = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "10"))
+
+    # Answer token-authenticated routes (e.g. /me) from the token's claims,
+    # checked against the cached user version, instead of loading the user
+    STATELESS_AUTH: bool = os.getenv("STATELESS_AUTH", "false").lower() == "true"
+    USER_VERSION_CACHE_TTL: float = float(os.getenv("USER_VERSION_CACHE_TTL", "60"))
+
     #  Construct the full database connection URL
+    #  (a DATABASE_URL environment variable, e.g. sqlite for local runs, takes precedence)
     @property
     def DATABASE_URL(self):
-        return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+        return os.getenv("DATABASE_URL") or f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
 #  Instantiate a global settings object to be reused across the app
 settings = Settings()
@@ -0,0 +1,108 @@
+# 🔐 Password hashing off the request path
+#
+# bcrypt is slow on purpose (100-300 ms of CPU per hash at the default cost), so:
+# - hashing and verification run in a dedicated process pool, never on the
+#   event loop or the request threadpool
+# - a limiter caps the hashes in flight per process; a request that can't get a
+#   slot within PASSWORD_HASH_QUEUE_TIMEOUT gets a 503 instead of queueing
+#   forever, so login storms can't starve the other endpoints
+# - the bcrypt cost is configurable; hashes made with a different cost are
+#   re-hashed transparently on the next successful login
+#
+# Settings (environment variables):
+#   BCRYPT_ROUNDS                bcrypt cost factor (default 12)
+#   PASSWORD_HASH_WORKERS        processes in the pool (default: CPU count; 0 = threadpool)
+#   PASSWORD_HASH_CONCURRENCY    hashes in flight per process (default: 2 x workers)
+#   PASSWORD_HASH_QUEUE_TIMEOUT  seconds to wait for a free slot (default 5)
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", str(max(HASH_WORKERS, 1) * 2)))
+HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "5"))
+
+_pool = None
+_limiter = None
+
+
+# 🧂 Password context for a given cost; hashes with any other cost "need update".
+# passlib is imported here, so only the processes that actually hash load it
+@lru_cache(maxsize=None)
+def _context(rounds: int):
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+
+# Executed in the pool's worker processes (module-level so they can be pickled;
+# the warm-up returns nothing, a CryptContext can't be sent back)
+def _warm_up(rounds: int):
+    _context(rounds)
+
+
+def _hash(password: str, rounds: int) -> str:
+    return _context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return _context(rounds).verify_and_update(password, hashed_password)
+
+
+# ⚙️ Pool lifecycle (started on app startup, created on first use otherwise)
+def start_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if _pool is None and HASH_WORKERS > 0:
+        # "spawn" so workers don't inherit the server's threads, sockets or DB pools
+        _pool = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        # Start every worker now rather than on the first logins
+        for _ in range(HASH_WORKERS):
+            _pool.submit(_warm_up, BCRYPT_ROUNDS)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+async def _run(fn, *args):
+    global _limiter
+    if _limiter is None:
+        _limiter = asyncio.Semaphore(HASH_CONCURRENCY)
+    try:
+        await asyncio.wait_for(_limiter.acquire(), HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password checks in progress, please retry",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        pool = start_pool()
+        if pool is None:
+            return await run_in_threadpool(fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+    finally:
+        _limiter.release()
+
+
+# 🔐 Hashes a new password with the configured cost
+async def hash_password(password: str) -> str:
+    return await _run(_hash, password, BCRYPT_ROUNDS)
+
+
+# 🔐 Checks a password against its stored hash.
+# Returns (valid, new_hash); new_hash is set when the stored hash uses an
+# outdated cost and should be saved in its place
+async def verify_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await _run(_verify_and_update, password, hashed_password, BCRYPT_ROUNDS)
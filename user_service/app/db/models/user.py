@@ -30,4 +30,8 @@ class User(Base):
     # Role field added
     role = Column(String, nullable=False, default="customer")
 
+    # Bumped whenever the profile or password changes; access tokens carry the
+    # version they were issued with, so stale token claims can be detected
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
+
 
@@ -0,0 +1,30 @@
+# Additive schema changes for existing databases
+#
+# user_service has no migration tool: tables come from `create_all`, which
+# creates missing tables but never alters an existing one. Columns added to the
+# models after a table exists are listed here and added on startup, so an
+# existing database gets them without a manual ALTER TABLE.
+# Only add nullable columns or ones with a server default (existing rows need a value).
+from sqlalchemy import inspect, text
+
+# (table, column, column definition)
+ADDED_COLUMNS = [
+    # 🏷️ Token version for stateless auth (app/core/auth.py)
+    ("users", "token_version", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+
+# 🛠 Add the columns above where they are missing (safe to run on every startup)
+def upgrade_schema(engine):
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        tables = set(inspector.get_table_names())
+        for table, column, definition in ADDED_COLUMNS:
+            if table not in tables:
+                continue  # create_all creates it with every column
+            if column in {c["name"] for c in inspector.get_columns(table)}:
+                continue
+            # IF NOT EXISTS (PostgreSQL) covers another pod adding it at the same time
+            if_not_exists = "IF NOT EXISTS " if conn.dialect.name == "postgresql" else ""
+            print(f"🔧 Adding column {table}.{column}...")
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {if_not_exists}{column} {definition}"))
@@ -1,27 +1,125 @@
 # Import SQLAlchemy engine and session-related tools
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Runs blocking (sync) code in FastAPI's worker threadpool
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
 
 # Import settings containing database credentials and connection info
 from app.core.config import settings
 
+# Pool tuning options and checkout/wait/overflow instrumentation
+from common_libs.db.pool import PoolMetrics, instrumented_pool_class, pool_options
+
+# 📖 Read-replica engines, health checks and read-your-writes routing
+from common_libs.db.replicas import ReplicaSet
+
 #  Construct the full database connection URL using credentials from AWS Secrets Manager
-SQLALCHEMY_DATABASE_URL = f"postgresql://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}/{settings.DB_NAME}"
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
 #  Create a SQLAlchemy engine which manages the connection pool to the PostgreSQL database
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# - pool size/overflow/timeout/recycle/pre-ping come from the DB_POOL_* settings
+# - the instrumented pool records checkouts, wait time and overflow events
+pool_metrics = PoolMetrics()
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    poolclass=instrumented_pool_class(pool_metrics),
+    **pool_options(settings),
+)
 
 # 🛠️ Create a configurable session factory bound to the engine
 # - autocommit=False: changes must be explicitly committed
 # - autoflush=False: changes are not automatically flushed to DB until committed
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 🔁 Swap the sync driver for its asyncio counterpart
+# (postgresql -> postgresql+asyncpg, sqlite -> sqlite+aiosqlite)
+def to_async_url(url: str):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    driver = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}.get(backend)
+    return url.set(drivername=f"{backend}+{driver}") if driver else url
+
+# ⚡ Async engine and session factory, only created when DB_ASYNC is enabled
+# - expire_on_commit=False: loaded attributes stay usable after commit
+async_pool_metrics = PoolMetrics()
+async_engine = create_async_engine(
+    to_async_url(SQLALCHEMY_DATABASE_URL),
+    poolclass=instrumented_pool_class(async_pool_metrics, AsyncAdaptedQueuePool),
+    **pool_options(settings),
+) if settings.DB_ASYNC else None
+AsyncSessionLocal = (
+    async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+    if settings.DB_ASYNC else None
+)
+
+# 📖 Read replicas from DB_REPLICA_URLS (none by default: everything uses the primary)
+# Health checks start with the app; until a replica passes one, reads stay on the primary
+replicas = ReplicaSet(
+    settings.DB_REPLICA_URLS,
+    engine_options=pool_options(settings),
+    async_url=to_async_url if settings.DB_ASYNC else None,
+    max_lag=settings.DB_REPLICA_MAX_LAG,
+    check_interval=settings.DB_REPLICA_CHECK_INTERVAL,
+    read_your_writes=settings.DB_READ_YOUR_WRITES_SECONDS,
+)
+
+# 📊 Current pool metrics for the /internal/pool endpoint
+def pool_status() -> dict:
+    status = {"sync": pool_metrics.snapshot(engine.pool)}
+    if async_engine is not None:
+        status["async"] = async_pool_metrics.snapshot(async_engine.sync_engine.pool)
+    if replicas.replicas:
+        status["replicas"] = replicas.status()
+    return status
+
 #  Dependency function to get a database session
 # - Used in FastAPI routes/services via `Depends(get_db)`
 # - Ensures proper session management (open → use → close)
-def get_db() -> Session:
+# - Always the primary; write requests also send the client's next reads there
+def get_sync_db(request: Request) -> Session:
+    replicas.note_request(request)
     db = SessionLocal()
     try:
         yield db  # provide the session for use in API route
     finally:
         db.close()  # ensure the session is closed after request is handled
+
+#  Async variant of the dependency, yields an AsyncSession
+async def get_async_db(request: Request) -> AsyncSession:
+    replicas.note_request(request)
+    async with AsyncSessionLocal() as db:
+        yield db
+
+#  The dependency used by the routers, selected by the DB_ASYNC setting
+get_db = get_async_db if settings.DB_ASYNC else get_sync_db
+
+# 📖 Read-only variants for endpoints that never write: a healthy replica, or
+# the primary when there is none or the client needs its own recent writes
+def get_sync_read_db(request: Request) -> Session:
+    replica = replicas.pick(request)
+    db = (replica.SessionLocal if replica else SessionLocal)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db(request: Request) -> AsyncSession:
+    replica = replicas.pick(request)
+    async with (replica.AsyncSessionLocal if replica else AsyncSessionLocal)() as db:
+        yield db
+
+get_read_db = get_async_read_db if settings.DB_ASYNC else get_sync_read_db
+
+#  Run a sync function `fn(session, *args, **kwargs)` against whichever session
+#  `get_db` provided, without blocking the event loop:
+# - AsyncSession: runs on the async connection via `run_sync`
+# - Session: runs in the threadpool
+async def run_db(db, fn, *args, **kwargs):
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
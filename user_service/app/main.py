@@ -1,25 +1,101 @@
+# Startup profiling (STARTUP_PROFILE=true); imported first so it times every import below
+from common_libs.startup_profile import profiler
+
 # FastAPI framework import for building the web application
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
+
+# 🔒 Internal endpoints (/internal/*, /metrics) require the shared service token
+from common_libs.auth.internal import require_internal_token
 
 # Import API route definitions from the user module
 from app.api.v1 import user_routes
 
 # Import SQLAlchemy base class and database engine
 from app.db.models.user import Base
-from app.db.session import engine
+from app.db.session import async_engine, engine, pool_status, replicas
+from app.db.schema import upgrade_schema
+from app.core.config import settings
 
-# 🛠 Automatically create database tables based on SQLAlchemy models
-# This is useful in development; in production, use Alembic for migrations
-print("🔧 Creating tables if they don't exist...")
-Base.metadata.create_all(bind=engine)
-print("✅ Tables ready.")
+# Background email dispatcher (started on first use, drained on shutdown)
+from common_libs.notifications import notification_stats, shutdown_notifications
+
+# 📊 Request latency, DB and outbound-call metrics served at /metrics
+from common_libs.metrics.middleware import install_metrics
+
+# 🔬 Per-request SQL profiler (SQL_PROFILE=true, development only)
+from common_libs.db.profiler import install_sql_profiler
+
+# Process pool used for bcrypt hashing
+from app.core.passwords import start_pool, shutdown_pool
 
 # Initialize the FastAPI app instance
 app = FastAPI()
 
+# 🛠 Automatically create database tables based on SQLAlchemy models
+# This is useful in development; in production, use Alembic for migrations
+# (or create_db.py) and set DB_CREATE_TABLES=false. Runs on startup, not at import.
+@app.on_event("startup")
+def create_tables():
+    if settings.DB_CREATE_TABLES:
+        print("🔧 Creating tables if they don't exist...")
+        with profiler.phase("db: create_all"):
+            Base.metadata.create_all(bind=engine)
+        print("✅ Tables ready.")
+
+# 🛠 Add columns introduced since the tables were created (create_all won't).
+# Runs even with DB_CREATE_TABLES=false: the models already select these columns
+@app.on_event("startup")
+def upgrade_tables():
+    with profiler.phase("db: upgrade schema"):
+        upgrade_schema(engine)
+
 # Include user-related routes with a common prefix and tag for API docs
 app.include_router(user_routes.router, prefix="/api/v1/users", tags=["Users"])
 
+# 📊 Per-route latency, SQL count and time per request, pool usage (Prometheus format)
+install_metrics(
+    app, "user_service", engines={"primary": engine, "primary_async": async_engine},
+    replicas=replicas, pool_status=pool_status,
+)
+
+# 🔬 Development only: statements per request, N+1 and slow-query warnings,
+# X-SQL-* / Server-Timing headers and /internal/sql-profile (no-op unless SQL_PROFILE=true)
+install_sql_profiler(app, engines={"primary": engine, "primary_async": async_engine}, replicas=replicas)
+
+# Start the hashing workers with the app (and stop them on shutdown)
+@app.on_event("startup")
+def start_password_pool():
+    start_pool()
+
+@app.on_event("shutdown")
+def stop_password_pool():
+    shutdown_pool()
+
+# 📧 Send the queued emails before the process exits
+@app.on_event("shutdown")
+def stop_notifications():
+    shutdown_notifications()
+
+# 📖 Start checking the read replicas (no-op without DB_REPLICA_URLS)
+@app.on_event("startup")
+def start_replica_health_checks():
+    replicas.start_health_checks()
+
+# ⏱ Print the startup profile once everything above has run
+@app.on_event("startup")
+def report_startup_profile():
+    profiler.report()
+
+# Internal endpoint exposing connection pool metrics
+@app.get("/internal/pool", include_in_schema=False, dependencies=[Depends(require_internal_token)])
+def get_pool_status():
+    return pool_status()
+
+# Internal endpoint exposing the email dispatcher counters (queued, sent, failed, ...)
+@app.get("/internal/notifications", include_in_schema=False, dependencies=[Depends(require_internal_token)])
+def get_notification_stats():
+    return notification_stats()
+
 # Simple root endpoint to confirm the service is running
 @app.get("/")
 def root():
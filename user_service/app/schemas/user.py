@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, Literal
+from pydantic import BaseModel, EmailStr, Field
+from typing import List, Optional, Literal
 
 # Schema used for incoming user registration data
 class UserCreate(BaseModel):
@@ -15,6 +15,13 @@ class UserOut(BaseModel):
     email: EmailStr
     role: Literal["admin", "agent", "customer"]  # ✅ Add role to output schema
 
+# Maximum number of IDs accepted by one batch lookup (POST /batch)
+MAX_BATCH_USERS = 1000
+
+# Schema for a batch lookup: unknown IDs are simply left out of the response
+class UserBatchRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_USERS)
+
 # Schema used for updating user data
 class UserUpdate(BaseModel):
     full_name: Optional[str] = None
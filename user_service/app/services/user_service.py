@@ -1,15 +1,12 @@
 # Import required modules for ORM, password hashing, JWTs, and config
 from sqlalchemy.orm import Session
-from app.schemas.user import UserCreate
+from app.schemas.user import UserCreate, UserUpdate
 from app.db.models.user import User
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from fastapi import HTTPException
 from jose import jwt, JWTError
 from app.core.config import settings
-
-# Create a password context for hashing using bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core.auth import remember_user_version, forget_user_version
 
 # Token expiration time for password reset tokens (in minutes)
 RESET_TOKEN_EXPIRE_MINUTES = 30
@@ -20,23 +17,89 @@ def generate_reset_token(email: str):
     payload = {"sub": email, "exp": expire}  # "sub" holds the email as the subject
     return jwt.encode(payload, settings.SECRET_KEY, algorithm="HS256")
 
-# 🧂 Hash a plain-text password using bcrypt
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
 # 🧑‍💻 Create a new user in the database from a UserCreate schema object
-def create_user(db: Session, user: UserCreate):
-    hashed_pw = get_password_hash(user.password)  # Securely hash the user's password
+# (the password is hashed beforehand with app.core.passwords.hash_password)
+def create_user(db: Session, user: UserCreate, hashed_password: str):
     db_user = User(
         full_name=user.full_name,
         email=user.email,
-        hashed_password=hashed_pw
+        hashed_password=hashed_password,
+        role=user.role  # 👈 Assign role
     )
     db.add(db_user)     # Add new user to the session
     db.commit()         # Commit changes to the DB
     db.refresh(db_user) # Refresh instance with DB-generated fields (like ID)
     return db_user
 
+# 🧑‍💻 Register a new user, rejecting duplicate email addresses
+def register_user(db: Session, user: UserCreate, hashed_password: str):
+    db_user = db.query(User).filter(User.email == user.email).first()
+    if db_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    return create_user(db, user, hashed_password)
+
+# 🔎 Get a user by ID or raise 404
+def get_user_by_id(db: Session, user_id: int):
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+# 🔎 Get all users with the given IDs in one `IN` query (missing IDs are skipped)
+def get_users_by_ids(db: Session, ids: list):
+    unique_ids = sorted(set(ids))
+    return db.query(User).filter(User.id.in_(unique_ids)).order_by(User.id).all()
+
+# 🔎 Get a user by email or raise 404
+def get_user_by_email_or_404(db: Session, email: str):
+    user = db.query(User).filter(User.email == email).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+# ✏️ Update an existing user, changing only the provided fields
+# (`hashed_password` is the already hashed `updated_data.password`, if any)
+def update_user(db: Session, user_id: int, updated_data: UserUpdate, hashed_password: str = None):
+    user = get_user_by_id(db, user_id)
+
+    if updated_data.full_name:
+        user.full_name = updated_data.full_name
+    if updated_data.email:
+        user.email = updated_data.email
+    if hashed_password:
+        user.hashed_password = hashed_password
+
+    # Outdate the claims in tokens issued before this change
+    user.token_version = (user.token_version or 0) + 1
+
+    db.commit()
+    db.refresh(user)
+    remember_user_version(user.id, user.token_version)
+    return user
+
+# 🗑️ Delete a user by ID
+def delete_user(db: Session, user_id: int):
+    user = get_user_by_id(db, user_id)
+    db.delete(user)
+    db.commit()
+    forget_user_version(user_id)
+
+# 🔒 Get the email a password reset token was issued for, or raise 400
+def decode_reset_token(token: str) -> str:
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+        return payload.get("sub")
+    except JWTError:
+        raise HTTPException(status_code=400, detail="Invalid or expired token")
+
+# 🔒 Set a new (already hashed) password for the user with this email
+def reset_password(db: Session, email: str, hashed_password: str):
+    user = get_user_by_email_or_404(db, email)
+    user.hashed_password = hashed_password
+    user.token_version = (user.token_version or 0) + 1
+    db.commit()
+    remember_user_version(user.id, user.token_version)
+
 # ✉️ Generate a token to confirm a user's email address (24-hour expiry)
 def generate_email_token(email: str):
     return jwt.encode(
@@ -0,0 +1,59 @@
+# Benchmark: password verification (login) throughput vs number of hashing processes
+#
+# Runs the same burst of concurrent logins through app.core.passwords with the
+# threadpool (PASSWORD_HASH_WORKERS=0) and with process pools of 1, 2, 4, ...
+# workers up to the CPU count, and reports logins/sec for each.
+#
+# Run from the user_service directory:
+#   python -m benchmarks.bench_login --logins 200 --rounds 12
+import argparse
+import asyncio
+import os
+import time
+
+from app.core import passwords
+
+
+async def burst(logins: int, hashed: str) -> float:
+    start = time.perf_counter()
+    results = await asyncio.gather(*(passwords.verify_password("correct horse", hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    assert all(valid for valid, _ in results)
+    return logins / elapsed
+
+
+def run(workers: int, logins: int, hashed: str) -> float:
+    # Reconfigure the module as if started with PASSWORD_HASH_WORKERS=<workers>
+    passwords.shutdown_pool()
+    passwords.HASH_WORKERS = workers
+    passwords.HASH_CONCURRENCY = logins  # measure raw throughput, not the limiter
+    passwords.HASH_QUEUE_TIMEOUT = 3600
+    passwords._limiter = None
+    passwords.start_pool()
+    try:
+        asyncio.run(burst(max(workers, 1), hashed))  # warm-up: workers started
+        passwords._limiter = None
+        return asyncio.run(burst(logins, hashed))
+    finally:
+        passwords.shutdown_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login (bcrypt verify) throughput vs core count")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=passwords.BCRYPT_ROUNDS)
+    args = parser.parse_args()
+
+    passwords.BCRYPT_ROUNDS = args.rounds
+    hashed = passwords._hash("correct horse", args.rounds)
+    cores = os.cpu_count() or 1
+    counts = sorted({1, cores, *(2 ** i for i in range(1, cores.bit_length()) if 2 ** i < cores)})
+
+    print(f"{args.logins} concurrent logins, bcrypt cost {args.rounds}, {cores} CPUs")
+    print(f"  threadpool:        {run(0, args.logins, hashed):8.1f} logins/s")
+    for workers in counts:
+        print(f"  {workers:>2} process(es):    {run(workers, args.logins, hashed):8.1f} logins/s")
+
+
+if __name__ == "__main__":
+    main()
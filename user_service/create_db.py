@@ -4,6 +4,9 @@ from app.db.session import engine
 # Import the base class that holds metadata about all database models
 from app.db.models.user import Base
 
+# Additive column changes for tables that already exist
+from app.db.schema import upgrade_schema
+
 # Log that the table creation process has started
 print("Creating tables...")
 
@@ -11,6 +14,9 @@ print("Creating tables...")
 # It checks the metadata and creates tables in the DB if they don't already exist
 Base.metadata.create_all(bind=engine)
 
+# create_all never alters an existing table: add the newer columns to it
+upgrade_schema(engine)
+
 # Log that the process is finished
 print("Done.")
 